@@ -0,0 +1,95 @@
+import os
+import numpy as np
+import pandas as pd
+from .data import get_expense_ratios, get_price_data
+from .kernels import chunk_stats, net_returns
+from .parallel import map_chunks
+from .performance import horizon_windows
+
+# Portfolios evaluated per matrix product. Each chunk holds about ten
+# (days x chunk) float arrays at once (net returns, masks, prefix sums and one
+# drawdown buffer), independent of the number of trailing horizons
+BATCH_CHUNK_SIZE = int(os.environ.get("BATCH_CHUNK_SIZE", 1000))
+
+
+def _normalize_weights(weights):
+    """Return a (portfolios x tickers) weight frame whose rows sum to 1."""
+    weights = pd.DataFrame(weights).fillna(0.0).astype(float)
+    totals = weights.sum(axis=1)
+    if (totals <= 0).any():
+        raise ValueError(f"Portfolios without holdings: {list(weights.index[totals <= 0])}")
+    return weights.div(totals, axis=0)
+
+
+def _shared_returns(prices):
+    """Daily returns with gaps zero-filled, plus a 0/1 matrix marking the gaps."""
+    returns = prices.pct_change().iloc[1:]
+    values = returns.to_numpy()
+    missing = np.isnan(values)
+    return returns.index, np.where(missing, 0.0, values), missing.astype(float)
+
+
+def _expense_log_drag(tickers, expense_ratios):
+    return np.log1p(-np.clip([(expense_ratios or {}).get(t, 0.0) for t in tickers], 0, None))
+
+
+def batch_portfolio_returns(prices, weights, advisory_fees=0.0, expense_ratios=None):
+    """Daily net returns for many portfolios over one shared price matrix.
+
+    weights is a (portfolios x tickers) frame of weights or dollar amounts;
+    advisory_fees is one rate or one per portfolio. Returns a (days x
+    portfolios) DataFrame computed with a single returns x weights.T
+    product. A portfolio's return is NaN on days where any of its holdings
+    has no return, as when analysing it on its own.
+    """
+    weights = _normalize_weights(weights).reindex(columns=prices.columns, fill_value=0.0)
+    index, returns, missing = _shared_returns(prices)
+    fees = np.broadcast_to(np.asarray(advisory_fees, dtype=float), len(weights))
+    net = net_returns(returns, missing, weights.to_numpy(), fees,
+                      _expense_log_drag(weights.columns, expense_ratios))
+    return pd.DataFrame(net, index=index, columns=weights.index)
+
+
+def analyze_portfolio_batch(weights, start_date, end_date, advisory_fees=0.0, expense_ratios=None,
+                            risk_free=0.02, chunk_size=BATCH_CHUNK_SIZE, workers=None, horizons=None):
+    """Historical performance statistics for a whole book of portfolios.
+
+    Prices for the union of all tickers are loaded once and shared; expense
+    ratios are looked up once per ticker unless given. Portfolios are
+    processed in chunks of chunk_size so memory stays bounded, spread over
+    the process pool (see analytics.parallel) with the returns matrix in
+    shared memory. Returns a DataFrame indexed like weights with the
+    performance_stats columns plus each portfolio's first and last return
+    date and number of days. With horizons (e.g. (1, 3, 5, 10)), trailing
+    statistics are added as "3Y Annualized Return" style columns.
+    """
+    weights = _normalize_weights(weights)
+    tickers = [t for t in weights.columns if weights[t].any()]
+    weights = weights[tickers]
+
+    # Each portfolio starts when all of its own holdings have data
+    prices = get_price_data(tickers, start_date, end_date, align_start=False)
+    if expense_ratios is None:
+        expense_ratios = get_expense_ratios(tickers)
+    fees = np.broadcast_to(np.asarray(advisory_fees, dtype=float), len(weights))
+    log_er = _expense_log_drag(tickers, expense_ratios)
+
+    index, returns, missing = _shared_returns(prices[tickers])
+    weights_array = weights.to_numpy()
+    windows = None
+    if horizons:
+        windows = ([f"{years}Y" for years in horizons],) + horizon_windows(index, horizons)
+    chunks = [(weights_array[begin:begin + chunk_size], fees[begin:begin + chunk_size], log_er, risk_free, windows)
+              for begin in range(0, len(weights), chunk_size)]
+    results = map_chunks(chunk_stats, chunks, {'returns': returns, 'missing': missing}, workers)
+
+    stats = pd.DataFrame({key: np.concatenate([r[key] for r in results]) for key in results[0]},
+                         index=weights.index)
+    dates = np.append(index.strftime('%Y-%m-%d').to_numpy(dtype=object), None)
+    # Row -1 (no data) picks the trailing None
+    stats['Start Date'] = dates[stats.pop('first').to_numpy()]
+    stats['End Date'] = dates[stats.pop('last').to_numpy()]
+    # Keep the full-period columns first, trailing ones last
+    stats['Days'] = stats.pop('Days')
+    trailing = [column for column in stats.columns if column[0].isdigit()]
+    return stats[[c for c in stats.columns if c not in trailing] + trailing]
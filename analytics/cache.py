@@ -1,61 +1,323 @@
-
-import yfinance as yf
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
 from functools import wraps
+import os
+import threading
 import time
+from .cache_backends import DiskCache, SQLiteCache, TieredCache, TTLCache
+from .metrics import metrics
+from .providers import get_provider, in_provider_executor, provider_executor
+from .security_master import security_master
+from .throttle import ProviderUnavailable
+
+# Optional shared L2 tier ("sqlite" or "disk") so every worker process on the
+# host reuses the same fetched data and it survives restarts
+CACHE_L2 = os.environ.get("ANALYTICS_CACHE_L2", "").lower()
+CACHE_DIR = os.environ.get(
+    "ANALYTICS_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "portfolio-analysis")
+)
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key onto a single execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is still running wait on the same future and share its result or error.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+def _default_backend():
+    if CACHE_L2 == "sqlite":
+        return TieredCache(TTLCache(), SQLiteCache(os.path.join(CACHE_DIR, "cache.sqlite3")))
+    if CACHE_L2 == "disk":
+        return TieredCache(TTLCache(), DiskCache(os.path.join(CACHE_DIR, "entries")))
+    return TTLCache()
+
+
+# Process-wide cache shared by every decorated function
+_cache = _default_backend()
+_flights = SingleFlight()
+
+# Background refreshes for stale-while-revalidate entries
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def configure_cache(backend):
+    """Replace the shared cache backend, e.g. with a custom TieredCache."""
+    global _cache
+    _cache = backend
 
-# Simple in-memory cache with TTL
-_cache = {}
-_cache_timestamps = {}
 
-def cache_with_ttl(ttl_seconds=3600):
-    """Decorator to cache function results with time-to-live."""
+def _is_fresh(entry, stale_ttl_seconds, negative_ttl_seconds):
+    value, expires_at = entry
+    if value is None and negative_ttl_seconds is not None:
+        # Negative results are never served stale; they simply expire
+        return True
+    return time.time() < expires_at - stale_ttl_seconds
+
+
+def _load(namespace, key, loader, ttl_seconds, stale_ttl_seconds, negative_ttl_seconds):
+    # Re-check: another caller may have refreshed it while we queued
+    entry = _cache.get_entry(namespace, key)
+    if entry is not None and _is_fresh(entry, stale_ttl_seconds, negative_ttl_seconds):
+        return entry[0]
+    started = time.perf_counter()
+    try:
+        value = loader()
+    except Exception:
+        metrics.incr('cache_load_errors', namespace=namespace)
+        raise
+    finally:
+        metrics.observe('cache_load', time.perf_counter() - started, namespace=namespace)
+    if value is None and negative_ttl_seconds is not None:
+        _cache.set(namespace, key, None, negative_ttl_seconds)
+    else:
+        # Entries are kept until their hard expiry; the last stale_ttl_seconds
+        # of that lifetime they are served stale while being refreshed
+        _cache.set(namespace, key, value, ttl_seconds + stale_ttl_seconds)
+    return value
+
+
+def _schedule_refresh(namespace, key, loader, ttl_seconds, stale_ttl_seconds, negative_ttl_seconds):
+    with _refreshing_lock:
+        if (namespace, key) in _refreshing:
+            return
+        _refreshing.add((namespace, key))
+
+    def refresh():
+        try:
+            _flights.do((namespace, key), lambda: _load(namespace, key, loader, ttl_seconds,
+                                                        stale_ttl_seconds, negative_ttl_seconds))
+        except Exception as e:
+            # Keep serving the stale value until its hard expiry
+            print(f"Background refresh failed for {namespace}: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard((namespace, key))
+
+    _refresh_executor.submit(refresh)
+
+
+def get_or_load(namespace, key, loader, ttl_seconds, stale_ttl_seconds=0, negative_ttl_seconds=None):
+    """Return the cached value for key, calling loader() to fill it on a miss.
+
+    Values are fresh for ttl_seconds. For a further stale_ttl_seconds they
+    are still returned immediately while a background thread refreshes
+    them; after that hard expiry the next caller loads synchronously.
+    With negative_ttl_seconds, a None result (e.g. an unknown ticker) is
+    cached for that, usually shorter, time instead. Concurrent loads for
+    the same key run loader() only once.
+    """
+    entry = _cache.get_entry(namespace, key)
+    if entry is not None:
+        if _is_fresh(entry, stale_ttl_seconds, negative_ttl_seconds):
+            metrics.incr('cache_hits', namespace=namespace)
+        else:
+            metrics.incr('cache_stale_serves', namespace=namespace)
+            _schedule_refresh(namespace, key, loader, ttl_seconds, stale_ttl_seconds, negative_ttl_seconds)
+        return entry[0]
+
+    metrics.incr('cache_misses', namespace=namespace)
+    # Concurrent misses for the same key share one call
+    return _flights.do((namespace, key), lambda: _load(namespace, key, loader, ttl_seconds,
+                                                        stale_ttl_seconds, negative_ttl_seconds))
+
+
+def cache_with_ttl(ttl_seconds=3600, namespace=None, stale_ttl_seconds=0, negative_ttl_seconds=None):
+    """Decorator to cache function results with time-to-live.
+
+    Results are stored in the shared bounded cache under a per-function
+    namespace; the wrapper's cache_clear() empties just that namespace.
+    Concurrent misses for the same arguments run the function only once.
+    With stale_ttl_seconds, expired results keep being served for that long
+    while they are refreshed in the background (stale-while-revalidate).
+    With negative_ttl_seconds, None results are cached only for that long.
+    """
     def decorator(func):
+        ns = namespace or f"{func.__module__}.{func.__qualname__}"
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Create cache key from function name and arguments
-            cache_key = f"{func.__name__}:{str(args)}:{str(sorted(kwargs.items()))}"
-            
-            # Check if cached and not expired
-            if cache_key in _cache:
-                cached_time = _cache_timestamps.get(cache_key, 0)
-                if time.time() - cached_time < ttl_seconds:
-                    return _cache[cache_key]
-            
-            # Call function and cache result
-            result = func(*args, **kwargs)
-            _cache[cache_key] = result
-            _cache_timestamps[cache_key] = time.time()
-            
-            return result
+            # Create cache key from function arguments
+            cache_key = f"{str(args)}:{str(sorted(kwargs.items()))}"
+            return get_or_load(ns, cache_key, lambda: func(*args, **kwargs), ttl_seconds,
+                               stale_ttl_seconds, negative_ttl_seconds)
+
+        wrapper.cache_namespace = ns
+        wrapper.cache_clear = lambda: _cache.clear(ns)
         return wrapper
     return decorator
 
+
+def _memory_tier():
+    return _cache.l1 if isinstance(_cache, TieredCache) else _cache
+
+
+def _cache_usage(field):
+    tier = _memory_tier()
+    if not isinstance(tier, TTLCache):
+        return {}
+    return {(('namespace', namespace),): usage[field] for namespace, usage in tier.usage().items()}
+
+
+metrics.register_gauge('cache_entries', lambda: _cache_usage(0))
+metrics.register_gauge('cache_bytes', lambda: _cache_usage(1))
+
+
+def cache_stats():
+    """Per-namespace cache statistics: hits, misses, stale serves, hit rate, bytes and load latency.
+
+    Counts cover this process since start-up; entries and bytes describe
+    the in-memory tier. Latencies are in seconds.
+    """
+    tier = _memory_tier()
+    usage = tier.usage() if isinstance(tier, TTLCache) else {}
+    snapshot = metrics.snapshot()
+    namespaces = set(usage)
+    namespaces.update(m['labels']['namespace'] for m in snapshot['counters'] if 'namespace' in m['labels'])
+
+    stats = {}
+    for namespace in sorted(namespaces):
+        entry = {name: metrics.counter(f'cache_{name}', namespace=namespace)
+                 for name in ('hits', 'misses', 'stale_serves', 'evictions', 'load_errors', 'l2_hits', 'l2_errors')}
+        lookups = entry['hits'] + entry['misses'] + entry['stale_serves']
+        entry['hit_rate'] = (entry['hits'] + entry['stale_serves']) / lookups if lookups else None
+        entry['entries'], entry['bytes'] = usage.get(namespace, (0, 0))
+        latency = metrics.latency('cache_load', namespace=namespace) or {}
+        for quantile in ('p50', 'p95', 'p99'):
+            entry[f'load_{quantile}'] = latency.get(quantile)
+        stats[namespace] = entry
+    return stats
+
+
 def clear_cache():
     """Clear all cached data."""
     _cache.clear()
-    _cache_timestamps.clear()
 
-def get_ticker_info_batch(tickers):
-    """Fetch ticker info for multiple tickers with parallel processing."""
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    
+
+def get_cached(namespace, key, default=None):
+    """Read an entry from the shared cache."""
+    entry = _cache.get_entry(namespace, key)
+    metrics.incr('cache_hits' if entry is not None else 'cache_misses', namespace=namespace)
+    return default if entry is None else entry[0]
+
+
+def set_cached(namespace, key, value, ttl_seconds):
+    """Write an entry to the shared cache."""
+    _cache.set(namespace, key, value, ttl_seconds)
+
+
+def cached_keys(namespace):
+    """List the keys of the live entries of a namespace in the shared cache."""
+    return _cache.keys(namespace)
+
+
+# Shared ticker metadata lives in its own namespace; stale info is served
+# for most of a day while it refreshes in the background. Unknown tickers
+# are remembered for a shorter time so typos and delisted symbols cost no
+# network calls on every rerun, yet new listings are picked up soon.
+TICKER_INFO_TTL = 3600
+TICKER_INFO_STALE_TTL = 23 * 3600
+TICKER_INFO_NEGATIVE_TTL = int(os.environ.get("TICKER_INFO_NEGATIVE_TTL", 600))
+TICKER_INFO_NAMESPACE = "ticker_info"
+
+
+def _fetch_ticker_info(ticker):
+    """Fetch the info payload for one ticker from the provider, or None if the ticker is unknown.
+
+    Raises ProviderUnavailable when the provider could not be reached.
+    """
+    try:
+        info = get_provider().get_ticker_info(ticker)
+    except ProviderUnavailable:
+        # Throttled or offline: the answer is unknown, so it must not be
+        # cached as if the ticker did not exist
+        raise
+    except Exception as e:
+        print(f"Error fetching {ticker}: {e}")
+        return None
+
+    # Unknown symbols come back as a stub payload without a symbol
+    if not info or 'symbol' not in info:
+        return None
+    return info
+
+
+def get_ticker_info_batch(tickers, ttl_seconds=TICKER_INFO_TTL):
+    """Fetch ticker info for multiple tickers with parallel processing.
+
+    Each ticker's info is fetched at most once per TTL and shared by every
+    caller; tickers already being fetched by another thread are waited on
+    rather than requested again. Fetches run on the provider's shared,
+    bounded pool.
+    """
+    def fetch(ticker):
+        return get_ticker_info(ticker, ttl_seconds)
+
     info_dict = {}
-    
-    def fetch_ticker_info(ticker):
-        try:
-            stock = yf.Ticker(ticker)
-            return ticker, stock.info
-        except Exception as e:
-            print(f"Error fetching {ticker}: {e}")
-            return ticker, None
-    
-    # Use ThreadPoolExecutor for parallel API calls
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(fetch_ticker_info, ticker): ticker for ticker in tickers}
-        
-        for future in as_completed(futures):
-            ticker, info = future.result()
-            info_dict[ticker] = info
-    
+    missing = []
+
+    for ticker in dict.fromkeys(tickers):
+        local = security_master.get_info(ticker)
+        if local is not None:
+            metrics.incr('security_master_hits')
+            info_dict[ticker] = local
+        elif _cache.get_entry(TICKER_INFO_NAMESPACE, ticker) is None:
+            missing.append(ticker)
+        else:
+            info_dict[ticker] = fetch(ticker)
+
+    if len(missing) == 1 or in_provider_executor():
+        info_dict.update((ticker, fetch(ticker)) for ticker in missing)
+    elif missing:
+        executor = provider_executor(get_provider())
+        info_dict.update(zip(missing, executor.map(fetch, missing)))
+
     return info_dict
+
+
+def get_ticker_info(ticker, ttl_seconds=TICKER_INFO_TTL):
+    """Return the info payload for a single ticker.
+
+    Symbols in the local security master are answered from it without any
+    network call; everything else comes from the shared cache or the provider.
+    """
+    local = security_master.get_info(ticker)
+    if local is not None:
+        metrics.incr('security_master_hits')
+        return local
+    return get_or_load(TICKER_INFO_NAMESPACE, ticker, lambda: _fetch_ticker_info(ticker),
+                       ttl_seconds, TICKER_INFO_STALE_TTL, TICKER_INFO_NEGATIVE_TTL)
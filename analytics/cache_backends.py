@@ -0,0 +1,476 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from .metrics import metrics
+
+# Default bounds for the shared cache, overridable per deployment
+DEFAULT_MAX_ENTRIES = int(os.environ.get("ANALYTICS_CACHE_MAX_ENTRIES", 2048))
+DEFAULT_MAX_BYTES = int(os.environ.get("ANALYTICS_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Persistent tiers hold more than a single process should keep in memory
+DEFAULT_DISK_MAX_BYTES = int(os.environ.get("ANALYTICS_CACHE_DISK_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+
+# Persistent tiers record a read's access time only if the stored one is
+# older than this, so reads rarely have to write
+ACCESS_TIME_RESOLUTION = 60
+
+
+def estimate_size(value):
+    """Roughly estimate the memory held by a cached value, in bytes."""
+    if hasattr(value, 'memory_usage'):
+        # pandas DataFrame / Series
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _canonical(key):
+    if isinstance(key, (set, frozenset)):
+        return {'set': sorted((_canonical(k) for k in key), key=repr)}
+    if isinstance(key, (list, tuple)):
+        return [_canonical(k) for k in key]
+    if key is None or isinstance(key, (str, int, float, bool)):
+        return key
+    return repr(key)
+
+
+def encode_key(namespace, key):
+    """Canonical text form of a (namespace, key) pair, stable across processes."""
+    return json.dumps([namespace, _canonical(key)], sort_keys=True)
+
+
+class CacheBackend:
+    """Interface shared by every cache tier.
+
+    Entries are addressed by (namespace, key) and carry an absolute expiry
+    time, so tiers can be stacked and pass entries between each other.
+    """
+
+    def get_entry(self, namespace, key):
+        """Return (value, expires_at) for a live entry, or None."""
+        raise NotImplementedError
+
+    def set_entry(self, namespace, key, value, expires_at):
+        raise NotImplementedError
+
+    def delete(self, namespace, key):
+        raise NotImplementedError
+
+    def clear(self, namespace=None):
+        """Clear one namespace, or everything if namespace is None."""
+        raise NotImplementedError
+
+    def keys(self, namespace):
+        """List the keys of the live entries in a namespace."""
+        raise NotImplementedError
+
+    def get(self, namespace, key, default=None):
+        entry = self.get_entry(namespace, key)
+        return default if entry is None else entry[0]
+
+    def set(self, namespace, key, value, ttl_seconds):
+        self.set_entry(namespace, key, value, time.time() + ttl_seconds)
+
+
+class TTLCache(CacheBackend):
+    """Thread-safe in-memory LRU cache with per-entry TTL, bounded by entry count and bytes.
+
+    Entries live in namespaces (one per cached function by default) that
+    share the same LRU order and bounds but can be cleared independently.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # (namespace, key) -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    def get_entry(self, namespace, key):
+        """Return a live entry and mark it recently used, or None."""
+        with self._lock:
+            entry = self._entries.get((namespace, key))
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                self._remove((namespace, key))
+                return None
+            self._entries.move_to_end((namespace, key))
+            return entry[0], entry[1]
+
+    def set_entry(self, namespace, key, value, expires_at):
+        """Store a value until expires_at, evicting least recently used entries as needed."""
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            # Never let a single value flush the whole cache
+            return
+        with self._lock:
+            if (namespace, key) in self._entries:
+                self._remove((namespace, key))
+            self._entries[(namespace, key)] = (value, expires_at, size)
+            self._bytes += size
+            self._evict()
+
+    def delete(self, namespace, key):
+        with self._lock:
+            if (namespace, key) in self._entries:
+                self._remove((namespace, key))
+
+    def clear(self, namespace=None):
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            for entry_key in [k for k in self._entries if k[0] == namespace]:
+                self._remove(entry_key)
+
+    def purge_expired(self):
+        """Drop every expired entry."""
+        with self._lock:
+            now = time.time()
+            for entry_key in [k for k, e in self._entries.items() if e[1] <= now]:
+                self._remove(entry_key)
+
+    def keys(self, namespace):
+        """Keys of the live entries in a namespace, most recently used first."""
+        with self._lock:
+            now = time.time()
+            return [k[1] for k, e in reversed(self._entries.items())
+                    if k[0] == namespace and e[1] > now]
+
+    def nbytes(self, namespace=None):
+        with self._lock:
+            if namespace is None:
+                return self._bytes
+            return sum(e[2] for k, e in self._entries.items() if k[0] == namespace)
+
+    def usage(self):
+        """Return {namespace: (entries, bytes)} for everything currently held."""
+        with self._lock:
+            usage = {}
+            for (namespace, _), entry in self._entries.items():
+                count, size = usage.get(namespace, (0, 0))
+                usage[namespace] = (count + 1, size + entry[2])
+            return usage
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, entry_key):
+        _, _, size = self._entries.pop(entry_key)
+        self._bytes -= size
+
+    def _evict(self):
+        if len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            # Expired entries go first, then least recently used ones
+            self.purge_expired()
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            entry_key = next(iter(self._entries))
+            self._remove(entry_key)
+            metrics.incr('cache_evictions', namespace=entry_key[0])
+
+
+class SQLiteCache(CacheBackend):
+    """Cache stored in a local SQLite database shared by every process on the host.
+
+    Values are pickled. The database runs in WAL mode so several Streamlit
+    workers can read while one writes; least recently used rows are evicted
+    once the entry or byte bound is exceeded. Access times are kept to
+    within ACCESS_TIME_RESOLUTION seconds, so most reads do not write.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES * 8, max_bytes=DEFAULT_DISK_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                key BLOB NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_namespace ON entries (namespace)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+
+    def get_entry(self, namespace, key):
+        entry_id = encode_key(namespace, key)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, accessed_at FROM entries WHERE id = ? AND expires_at > ?",
+                (entry_id, now)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[2] > ACCESS_TIME_RESOLUTION:
+                self._conn.execute("UPDATE entries SET accessed_at = ? WHERE id = ?", (now, entry_id))
+        return pickle.loads(row[0]), row[1]
+
+    def set_entry(self, namespace, key, value, expires_at):
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (encode_key(namespace, key), namespace, pickle.dumps(key), payload,
+                 len(payload), expires_at, time.time())
+            )
+            self._evict()
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE id = ?", (encode_key(namespace, key),))
+
+    def clear(self, namespace=None):
+        with self._lock:
+            if namespace is None:
+                self._conn.execute("DELETE FROM entries")
+            else:
+                self._conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+
+    def keys(self, namespace):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM entries WHERE namespace = ? AND expires_at > ? ORDER BY accessed_at DESC",
+                (namespace, time.time())
+            ).fetchall()
+        return [pickle.loads(row[0]) for row in rows]
+
+    def _evict(self):
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # Expired entries go first, then least recently used ones
+        self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        rows = self._conn.execute("SELECT id, size FROM entries ORDER BY accessed_at").fetchall()
+        count, total = len(rows), sum(size for _, size in rows)
+        doomed = []
+        for entry_id, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((entry_id,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE id = ?", doomed)
+
+
+class DiskCache(CacheBackend):
+    """Cache stored as one pickle file per entry under a directory.
+
+    Each file holds the key and expiry followed by the value, so listing a
+    namespace does not have to load the values. File modification times
+    track recency for LRU eviction. The directory is only scanned when a
+    running total of the bytes written goes over max_bytes; files written
+    by other processes are counted at that scan.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_DISK_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes = None  # Unknown until the first scan
+
+    def _namespace_dir(self, namespace):
+        safe = re.sub(r'[^A-Za-z0-9_.-]', '_', namespace)
+        return os.path.join(self.root, safe)
+
+    def _entry_path(self, namespace, key):
+        digest = hashlib.sha256(encode_key(namespace, key).encode()).hexdigest()
+        return os.path.join(self._namespace_dir(namespace), f"{digest}.pkl")
+
+    def _read_header(self, path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def get_entry(self, namespace, key):
+        path = self._entry_path(namespace, key)
+        try:
+            with open(path, 'rb') as f:
+                _, expires_at = pickle.load(f)
+                if expires_at <= time.time():
+                    return None
+                value = pickle.load(f)
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        return value, expires_at
+
+    def set_entry(self, namespace, key, value, expires_at):
+        path = self._entry_path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((key, expires_at), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = f.tell()
+        with self._lock:
+            replaced = self._file_size(path)
+            os.replace(tmp_path, path)
+            if self._bytes is not None:
+                self._bytes += size - replaced
+            if self._bytes is None or self._bytes > self.max_bytes:
+                self._evict()
+
+    def delete(self, namespace, key):
+        path = self._entry_path(namespace, key)
+        with self._lock:
+            size = self._file_size(path)
+            try:
+                os.remove(path)
+            except OSError:
+                return
+            if self._bytes is not None:
+                self._bytes -= size
+
+    def clear(self, namespace=None):
+        with self._lock:
+            for path in self._entry_files(None if namespace is None else self._namespace_dir(namespace)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            # Recounted at the next write
+            self._bytes = None
+
+    def _file_size(self, path):
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            return 0
+
+    def keys(self, namespace):
+        now = time.time()
+        entries = []
+        for path in self._entry_files(self._namespace_dir(namespace)):
+            try:
+                key, expires_at = self._read_header(path)
+                if expires_at > now:
+                    entries.append((os.path.getmtime(path), key))
+            except (OSError, EOFError, pickle.UnpicklingError):
+                continue
+        return [key for _, key in sorted(entries, key=lambda e: e[0], reverse=True)]
+
+    def _entry_files(self, directory=None):
+        if directory is not None:
+            directories = [directory]
+        elif os.path.isdir(self.root):
+            directories = [os.path.join(self.root, d) for d in os.listdir(self.root)]
+        else:
+            directories = []
+        for d in directories:
+            if not os.path.isdir(d):
+                continue
+            for name in os.listdir(d):
+                if name.endswith('.pkl'):
+                    yield os.path.join(d, name)
+
+    def _evict(self):
+        """Scan the directory, remove the oldest files down to max_bytes and reset the running total.
+
+        Called with the lock held.
+        """
+        files = []
+        for path in self._entry_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        # Oldest files are removed first
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        self._bytes = total
+
+
+class TieredCache(CacheBackend):
+    """Stack a fast L1 tier (usually in-memory) on a shared L2 tier.
+
+    Reads try L1 first and promote L2 hits into L1 with their remaining
+    lifetime; writes go to both tiers. Failures in L2 are reported and
+    otherwise ignored so a broken disk never breaks the analysis.
+    """
+
+    def __init__(self, l1, l2):
+        self.l1 = l1
+        self.l2 = l2
+
+    def get_entry(self, namespace, key):
+        entry = self.l1.get_entry(namespace, key)
+        if entry is not None:
+            return entry
+        try:
+            entry = self.l2.get_entry(namespace, key)
+        except Exception as e:
+            print(f"L2 cache read failed for {namespace}: {e}")
+            metrics.incr('cache_l2_errors', namespace=namespace)
+            return None
+        if entry is not None:
+            metrics.incr('cache_l2_hits', namespace=namespace)
+            self.l1.set_entry(namespace, key, *entry)
+        return entry
+
+    def set_entry(self, namespace, key, value, expires_at):
+        self.l1.set_entry(namespace, key, value, expires_at)
+        try:
+            self.l2.set_entry(namespace, key, value, expires_at)
+        except Exception as e:
+            print(f"L2 cache write failed for {namespace}: {e}")
+            metrics.incr('cache_l2_errors', namespace=namespace)
+
+    def delete(self, namespace, key):
+        self.l1.delete(namespace, key)
+        try:
+            self.l2.delete(namespace, key)
+        except Exception as e:
+            print(f"L2 cache delete failed for {namespace}: {e}")
+            metrics.incr('cache_l2_errors', namespace=namespace)
+
+    def clear(self, namespace=None):
+        self.l1.clear(namespace)
+        try:
+            self.l2.clear(namespace)
+        except Exception as e:
+            print(f"L2 cache clear failed for {namespace or 'all namespaces'}: {e}")
+            metrics.incr('cache_l2_errors', namespace=namespace or 'all')
+
+    def keys(self, namespace):
+        keys = self.l1.keys(namespace)
+        try:
+            l2_keys = self.l2.keys(namespace)
+        except Exception as e:
+            print(f"L2 cache listing failed for {namespace}: {e}")
+            metrics.incr('cache_l2_errors', namespace=namespace)
+            return keys
+        return keys + [k for k in l2_keys if k not in keys]
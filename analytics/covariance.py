@@ -0,0 +1,125 @@
+import os
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from .cache import get_or_load
+from .data import get_price_data
+from .fetch import run_until
+from .performance import correlation_matrix
+
+# Estimator for forward risk: "ledoit_wolf", "ewma" or "sample"
+COVARIANCE_METHOD = os.environ.get("COVARIANCE_METHOD", "ledoit_wolf")
+
+# Years of daily returns the estimate is based on
+COVARIANCE_LOOKBACK_YEARS = int(os.environ.get("COVARIANCE_LOOKBACK_YEARS", 3))
+
+# Half-life in trading days of the EWMA weights
+EWMA_HALFLIFE_DAYS = float(os.environ.get("EWMA_HALFLIFE_DAYS", 63))
+
+# Fewer common days than this and the asset-class assumptions are used instead
+COVARIANCE_MIN_DAYS = int(os.environ.get("COVARIANCE_MIN_DAYS", 126))
+
+# Estimates are keyed by universe and day, so one a day per universe is enough
+COVARIANCE_TTL = 24 * 3600
+COVARIANCE_NEGATIVE_TTL = 3600
+COVARIANCE_NAMESPACE = "covariance"
+
+
+def sample_covariance(returns):
+    """Sample covariance of daily returns (days x assets array)."""
+    return np.cov(returns, rowvar=False, ddof=1).reshape(returns.shape[1], returns.shape[1])
+
+
+def ledoit_wolf_covariance(returns):
+    """Ledoit-Wolf shrinkage of the sample covariance towards a scaled identity.
+
+    The shrinkage intensity is estimated from the data (Ledoit & Wolf, 2004),
+    so noisy off-diagonal terms are pulled in when there are few days per
+    asset. Returns (covariance, shrinkage).
+    """
+    days, n = returns.shape
+    centered = returns - returns.mean(axis=0)
+    sample = centered.T.dot(centered) / days
+    mu = np.trace(sample) / n
+    target = mu * np.eye(n)
+
+    # Squared Frobenius norms, normalised by n as in the paper
+    delta = ((sample - target) ** 2).sum() / n
+    row_norms = (centered ** 2).sum(axis=1)
+    beta = ((row_norms ** 2).sum() - days * (sample ** 2).sum()) / (days ** 2 * n)
+    shrinkage = min(beta, delta) / delta if delta > 0 else 1.0
+    return shrinkage * target + (1 - shrinkage) * sample, shrinkage
+
+
+def ewma_covariance(returns, halflife=EWMA_HALFLIFE_DAYS):
+    """Exponentially weighted covariance, with weights halving every `halflife` days back."""
+    days = len(returns)
+    weights = 0.5 ** (np.arange(days)[::-1] / halflife)
+    weights /= weights.sum()
+    centered = returns - weights.dot(returns)
+    return (centered * weights[:, None]).T.dot(centered)
+
+
+def estimate_covariance(returns, method=COVARIANCE_METHOD):
+    """Annualized covariance of a (days x assets) daily return frame or array."""
+    values = np.asarray(returns, dtype=float)
+    if method == "ledoit_wolf":
+        covariance = ledoit_wolf_covariance(values)[0]
+    elif method == "ewma":
+        covariance = ewma_covariance(values)
+    elif method == "sample":
+        covariance = sample_covariance(values)
+    else:
+        raise ValueError(f"Unknown covariance method: {method}")
+    covariance = covariance * 252
+    if isinstance(returns, pd.DataFrame):
+        return pd.DataFrame(covariance, index=returns.columns, columns=returns.columns)
+    return covariance
+
+
+def _load_covariance(tickers, end_date, method, lookback_years):
+    start_date = (datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=365 * lookback_years)).strftime('%Y-%m-%d')
+    prices = get_price_data(list(tickers), start_date, end_date, align_start=False)
+    # Only days on which every asset has a return
+    returns = prices.pct_change().dropna()
+    if len(returns) < COVARIANCE_MIN_DAYS:
+        return None
+    return estimate_covariance(returns[list(tickers)], method)
+
+
+def covariance_matrix(tickers, method=COVARIANCE_METHOD, lookback_years=COVARIANCE_LOOKBACK_YEARS, end_date=None,
+                      deadline=None):
+    """Annualized covariance of the tickers' daily returns as a DataFrame, or None.
+
+    Estimated from the cached price history over the last lookback_years
+    and cached per universe (ticker set) and day, so it is computed once a
+    day however many portfolios use it. None when the tickers have fewer
+    than COVARIANCE_MIN_DAYS common days of history. Raises DeadlineExceeded
+    if the history is not loaded by the deadline.
+    """
+    universe = tuple(sorted(set(tickers)))
+    end_date = end_date or datetime.today().strftime('%Y-%m-%d')
+    covariance = run_until(lambda: get_or_load(
+        COVARIANCE_NAMESPACE, (universe, end_date, method, lookback_years),
+        lambda: _load_covariance(universe, end_date, method, lookback_years),
+        COVARIANCE_TTL, negative_ttl_seconds=COVARIANCE_NEGATIVE_TTL
+    ), deadline)
+    if covariance is None:
+        return None
+    return covariance.loc[list(tickers), list(tickers)]
+
+
+def asset_class_covariance(asset_classes, asset_volatility, correlations):
+    """Covariance implied by the asset-class volatility and correlation assumptions."""
+    volatility = np.array([asset_volatility.get(asset_class, 0.0) for asset_class in asset_classes])
+    covariance = correlation_matrix(asset_classes, correlations) * np.outer(volatility, volatility)
+    return pd.DataFrame(covariance, index=list(asset_classes), columns=list(asset_classes))
+
+
+def portfolio_variance(weights, covariance):
+    """Quadratic form w'Σw for one weight vector or each row of a (portfolios x assets) matrix."""
+    weights = np.asarray(weights, dtype=float)
+    covariance = np.asarray(covariance, dtype=float)
+    if weights.ndim == 1:
+        return weights.dot(covariance).dot(weights)
+    return np.einsum('ij,ij->i', weights.dot(covariance), weights)
@@ -1,109 +1,184 @@
-import yfinance as yf
+import math
 import pandas as pd
 from datetime import datetime
-from .cache import cache_with_ttl, get_ticker_info_batch
+from .cache import (
+    cache_with_ttl, cached_keys, get_or_load, get_ticker_info, get_ticker_info_batch
+)
+from .price_store import price_store
+from .providers import get_provider
+from .security_master import security_from_info, security_master
+from .throttle import ProviderUnavailable
+
+# Used when a holding's expense ratio is unknown
+DEFAULT_EXPENSE_RATIO = 0.0
+
+# Used when a holding cannot be classified automatically
+DEFAULT_CLASSIFICATION = "US Equities"
 
 
 def get_available_date_range(tickers, start, end):
-    """Find the common date range where all tickers have data."""
-    latest_start = start
+    """Find the common date range where all tickers have data.
 
-    for ticker in tickers:
-        # Get a small sample to find actual start date
-        sample = yf.download(ticker, start=start, end=end, auto_adjust=True, prepost=True, threads=True)
-        if not sample.empty:
-            actual_start = sample.index[0].strftime('%Y-%m-%d')
-            if actual_start > latest_start:
-                latest_start = actual_start
+    First available dates come from the price store's inception index, which
+    is populated by the bulk price download, so no requests are made; tickers
+    that have not been downloaded yet do not move the start.
+    """
+    latest_start = start
+    for ticker, inception in price_store.inception_dates(tickers).items():
+        if inception > latest_start:
+            latest_start = inception
 
     return latest_start, end
 
 
-@cache_with_ttl(ttl_seconds=3600)  # Cache for 1 hour
-def get_price_data(tickers, start, end):
-    """Download adjusted close prices for tickers."""
-    # Find common date range
-    actual_start, actual_end = get_available_date_range(tickers, start, end)
+# Price frames are cached by (ticker set, start, end) so that any request for
+# a subset of tickers or a sub-window of a cached frame is answered by slicing.
+# Expired frames are served for a few more hours while they refresh.
+PRICE_DATA_TTL = 3600  # Cache for 1 hour
+PRICE_DATA_STALE_TTL = 6 * 3600
+PRICE_DATA_NAMESPACE = "price_data"
 
-    if actual_start != start:
-        print(f"Note: Adjusted start date from {start} to {actual_start} due to limited data availability")
 
-    data = yf.download(tickers, start=actual_start, end=actual_end, auto_adjust=True, prepost=True, threads=True)
+def _price_window(frame, tickers, start, end):
+    """Slice tickers between start and end (exclusive) out of a price frame."""
+    end_exclusive = pd.Timestamp(end) - pd.Timedelta(microseconds=1)
+    return frame.loc[start:end_exclusive, list(tickers)]
 
-    # Handle single vs multiple tickers
-    if len(tickers) == 1:
-        # For single ticker, data structure is different
-        if 'Close' in data.columns:
-            prices = data['Close']
-        else:
-            prices = data
+
+def _load_price_frame(key):
+    tickers, start, end = key
+    return get_or_load(PRICE_DATA_NAMESPACE, key, lambda: price_store.get_prices(sorted(tickers), start, end),
+                       PRICE_DATA_TTL, PRICE_DATA_STALE_TTL)
+
+
+def _find_cached_prices(tickers, start, end):
+    """Return prices sliced from a cached frame covering the tickers and window, if any."""
+    wanted = frozenset(tickers)
+    for key in cached_keys(PRICE_DATA_NAMESPACE):
+        cached_tickers, cached_start, cached_end = key
+        if wanted <= cached_tickers and cached_start <= start and end <= cached_end:
+            return _price_window(_load_price_frame(key), tickers, start, end)
+    return None
+
+
+def get_price_data(tickers, start, end, align_start=True):
+    """Download adjusted close prices for tickers.
+
+    Prices are served from the local price store; only bars missing from
+    disk are requested from the market-data provider. Columns follow the order of tickers.
+    With align_start=False the frame is not trimmed to the date all tickers
+    have data, so later-listed tickers start with NaN.
+    """
+    tickers = list(tickers)
+
+    prices = _find_cached_prices(tickers, start, end)
+    cached = prices is not None
+    if not cached:
+        frame = _load_price_frame((frozenset(tickers), start, end))
+        prices = _price_window(frame, tickers, start, end)
+
+    if not align_start:
+        return prices.dropna(how='all')
+
+    # Find common date range
+    if cached:
+        # The cached frame already shows which tickers start after its first bar
+        first_dates = [prices[ticker].first_valid_index() for ticker in tickers]
+        later = [d for d in first_dates if d is not None and d > prices.index[0]]
+        actual_start = max(later).strftime('%Y-%m-%d') if later else start
     else:
-        # For multiple tickers, extract Close prices
-        if 'Close' in data.columns.get_level_values(0):
-            prices = data['Close']
-        else:
-            # Fallback to Adj Close if available
-            prices = data['Adj Close']
+        actual_start, actual_end = get_available_date_range(tickers, start, end)
 
-    return prices
+    if actual_start != start:
+        print(f"Note: Adjusted start date from {start} to {actual_start} due to limited data availability")
+
+    return prices.loc[actual_start:].dropna(how='all')
 
 
-@cache_with_ttl(ttl_seconds=3600)  # Cache for 1 hour
 def validate_ticker(ticker):
     """Validate if a ticker exists and return its info."""
-    try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-
-        # Check if we got valid data
-        if not info or 'symbol' not in info:
-            return False, None
+    info = get_ticker_info(ticker)
 
-        return True, info
-    except Exception as e:
+    # Check if we got valid data
+    if not info or 'symbol' not in info:
         return False, None
 
+    return True, info
+
 
-@cache_with_ttl(ttl_seconds=3600)  # Cache for 1 hour
 def get_investment_name(ticker):
     """Get the full name of an investment."""
-    try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-
-        # Try different possible keys for the name
-        if 'longName' in info:
-            return info['longName']
-        elif 'shortName' in info:
-            return info['shortName']
-        elif 'name' in info:
-            return info['name']
-        else:
-            return ticker
-    except Exception as e:
+    info = get_ticker_info(ticker) or {}
+
+    # Try different possible keys for the name
+    if 'longName' in info:
+        return info['longName']
+    elif 'shortName' in info:
+        return info['shortName']
+    elif 'name' in info:
+        return info['name']
+    else:
         return ticker
 
 
-@cache_with_ttl(ttl_seconds=300)  # Cache for 5 minutes (prices change frequently)
+# Latest prices change frequently; expired ones are served for 15 more
+# minutes while they refresh
+CURRENT_PRICES_TTL = 300
+CURRENT_PRICES_STALE_TTL = 900
+CURRENT_PRICES_NAMESPACE = "current_prices"
+
+
+class IncompletePrices(Exception):
+    """Some latest prices did not come back; raised inside the loader so the result is not cached."""
+
+    def __init__(self, prices, missing):
+        super().__init__(f"No latest price for {', '.join(missing)}")
+        self.prices = prices
+
+
+def _load_current_prices(tickers):
+    prices = get_provider().get_latest_prices(list(tickers))
+    missing = [ticker for ticker in tickers if not math.isfinite(prices.get(ticker, float('nan')))]
+    if missing:
+        raise IncompletePrices(prices, missing)
+    return prices
+
+
 def get_current_prices(tickers):
-    """Get current prices for tickers to calculate portfolio weights."""
-    data = yf.download(tickers, period="1d", interval="1d", auto_adjust=True, prepost=True, threads=True)
+    """Get current prices for tickers to calculate portfolio weights.
 
-    if len(tickers) == 1:
-        # For single ticker
-        current_price = data['Close'].iloc[-1]
-        return {tickers[0]: current_price}
-    else:
-        # For multiple tickers
-        current_prices = {}
-        for ticker in tickers:
-            current_prices[ticker] = data['Close'][ticker].iloc[-1]
-        return current_prices
+    Tickers whose price did not come back are NaN, and such a partial
+    result is returned without being cached.
+    """
+    tickers = tuple(tickers)
+    try:
+        return get_or_load(CURRENT_PRICES_NAMESPACE, tickers, lambda: _load_current_prices(tickers),
+                           CURRENT_PRICES_TTL, CURRENT_PRICES_STALE_TTL)
+    except IncompletePrices as e:
+        return {ticker: e.prices.get(ticker, float('nan')) for ticker in tickers}
+
+
+def expense_ratio_from_info(info):
+    """Read the expense ratio from a ticker's info, as a decimal (0 if it has none)."""
+    # Try different possible keys for expense ratio
+    expense_ratio = None
+    if 'expenseRatio' in info:
+        expense_ratio = info['expenseRatio']
+    elif 'annualReportExpenseRatio' in info:
+        expense_ratio = info['annualReportExpenseRatio']
+    elif 'netExpenseRatio' in info:
+        expense_ratio = info['netExpenseRatio']
+
+    # If found, store it; otherwise default to 0
+    # Convert from percentage (e.g., 0.07) to decimal (e.g., 0.0007)
+    if expense_ratio is not None:
+        return expense_ratio / 100.0
+    return DEFAULT_EXPENSE_RATIO
 
 
 @cache_with_ttl(ttl_seconds=86400)  # Cache for 24 hours (expense ratios rarely change)
 def get_expense_ratios(tickers):
-    """Get expense ratios for ETFs, Mutual Funds, and SMAs from yfinance."""
+    """Get expense ratios for ETFs, Mutual Funds, and SMAs from ticker metadata."""
     expense_ratios = {}
 
     # Batch fetch all ticker info at once
@@ -115,30 +190,15 @@ def get_expense_ratios(tickers):
             if not info:
                 raise Exception("No info available")
 
-            # Try different possible keys for expense ratio
-            expense_ratio = None
-            if 'expenseRatio' in info:
-                expense_ratio = info['expenseRatio']
-            elif 'annualReportExpenseRatio' in info:
-                expense_ratio = info['annualReportExpenseRatio']
-            elif 'netExpenseRatio' in info:
-                expense_ratio = info['netExpenseRatio']
-
-            # If found, store it; otherwise default to 0
-            # Convert from percentage (e.g., 0.07) to decimal (e.g., 0.0007)
-            if expense_ratio is not None:
-                expense_ratios[ticker] = expense_ratio / 100.0
-            else:
-                expense_ratios[ticker] = 0.0
+            expense_ratios[ticker] = expense_ratio_from_info(info)
 
         except Exception as e:
             print(f"Could not fetch expense ratio for {ticker}: {e}")
-            expense_ratios[ticker] = 0.0
+            expense_ratios[ticker] = DEFAULT_EXPENSE_RATIO
 
     return expense_ratios
 
 
-@cache_with_ttl(ttl_seconds=3600)  # Cache for 1 hour
 def classify_investment(ticker, info=None):
     """Classify investment into US Equities, International Equities, Core Fixed Income, or Alternatives."""
 
@@ -148,6 +208,11 @@ def classify_investment(ticker, info=None):
     fixed_income_patterns = ['AGG', 'BND', 'VGIT', 'VGLT', 'TLT', 'SHY', 'IEF', 'PULS', 'BNDX', 'IAGG', 'BWX']
     alternatives_patterns = ['VNQ', 'VNQI', 'REM', 'DBC', 'DBA', 'GLD', 'SLV', 'USO', 'AMLP', 'QAI', 'PUTW', 'TAIL']
 
+    # The local security master knows most client holdings already
+    security = security_master.get(ticker)
+    if security is not None and security.asset_class:
+        return security.asset_class
+
     # Check for common patterns first
     if ticker in us_equity_patterns:
         return "US Equities"
@@ -158,13 +223,12 @@ def classify_investment(ticker, info=None):
     elif ticker in alternatives_patterns:
         return "Alternatives"
 
-    # Try to get info from yfinance
+    # Try to get info from the market-data provider
     try:
         if info is None:
-            stock = yf.Ticker(ticker)
-            info = stock.info
+            info = get_ticker_info(ticker) or {}
 
-        # Check category based on yfinance data
+        # Check category based on provider metadata
         category = info.get('category', '').lower()
         fund_family = info.get('fundFamily', '').lower()
         asset_class = info.get('assetClass', '').lower()
@@ -203,6 +267,8 @@ def classify_investment(ticker, info=None):
             elif country and country not in ['united states', 'usa', 'us']:
                 return "International Equities"
 
+    except ProviderUnavailable:
+        raise
     except Exception as e:
         print(f"Could not fetch classification info for {ticker}: {e}")
 
@@ -210,6 +276,29 @@ def classify_investment(ticker, info=None):
     return None
 
 
+def refresh_security_master(tickers):
+    """Fetch current metadata for tickers from the provider and store it in the security master.
+
+    Meant to be run offline (see analytics/security_master.py), not while
+    serving requests. Unknown tickers are skipped.
+    """
+    securities = []
+    for ticker in tickers:
+        try:
+            info = get_provider().get_ticker_info(ticker)
+        except Exception as e:
+            print(f"Could not refresh {ticker}: {e}")
+            continue
+        if not info or 'symbol' not in info:
+            print(f"Unknown ticker {ticker}")
+            continue
+        # An asset class already in the table (e.g. curated via CSV) is kept
+        securities.append(security_from_info(ticker, info, classify_investment(ticker, info)))
+
+    security_master.upsert(securities)
+    return securities
+
+
 def get_investment_classifications(tickers, overrides=None):
     """Get classifications for all investments, using overrides if provided."""
     classifications = {}
@@ -231,12 +320,12 @@ def get_investment_classifications(tickers, overrides=None):
                 classifications[ticker] = auto_classification
             else:
                 # Default to US Equities if cannot classify
-                classifications[ticker] = "US Equities"
+                classifications[ticker] = DEFAULT_CLASSIFICATION
 
     return classifications
 
 
-@cache_with_ttl(ttl_seconds=3600)  # Cache for 1 hour
+@cache_with_ttl(ttl_seconds=3600, stale_ttl_seconds=23 * 3600)  # Cache for 1 hour
 def get_investment_details(tickers):
     """Get detailed information about investments including yield, fees, and other metrics."""
     details = {}
@@ -265,7 +354,8 @@ def get_investment_details(tickers):
                 elif industry:
                     category = industry
                 else:
-                    category = 'N/A'
+                    # Security-master records keep sector/industry as the category
+                    category = info.get('category') or 'N/A'
             else:
                 category = info.get('category', 'N/A')
 
@@ -0,0 +1,125 @@
+import asyncio
+import math
+import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from .cache import get_ticker_info
+from .data import (
+    DEFAULT_CLASSIFICATION, DEFAULT_EXPENSE_RATIO, classify_investment, expense_ratio_from_info, get_current_prices
+)
+from .providers import get_provider, in_provider_executor, provider_executor
+from .throttle import DeadlineExceeded
+
+# Time budget for all market-data fetches of one analysis: current prices,
+# metadata, price history, benchmark and covariance estimates
+FETCH_DEADLINE_SECONDS = float(os.environ.get("FETCH_DEADLINE_SECONDS", 20))
+
+
+def analysis_deadline(seconds=FETCH_DEADLINE_SECONDS):
+    """Absolute deadline (time.monotonic()) for an analysis starting now."""
+    return time.monotonic() + seconds
+
+
+def run_until(fn, deadline):
+    """Run a blocking call in the provider pool and wait for it until the deadline.
+
+    Raises DeadlineExceeded if it has not finished by then; the call keeps
+    running in the pool, so its result still warms the cache and price
+    store. Without a deadline, or on a pool thread already, fn runs inline.
+    """
+    if deadline is None or in_provider_executor():
+        return fn()
+    future = provider_executor(get_provider()).submit(fn)
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeoutError:
+        raise DeadlineExceeded("Market data did not arrive within the analysis time budget") from None
+
+
+async def gather_until(calls, deadline):
+    """Run blocking calls concurrently in the provider pool until the deadline.
+
+    Returns (results, failed): results maps each name to its return value
+    for calls that finished in time; failed holds the names of calls that
+    raised or were still running at the deadline. Calls cut off by the
+    deadline keep running in the pool, so their results still warm the cache.
+    """
+    loop = asyncio.get_running_loop()
+    executor = provider_executor(get_provider())
+    tasks = {name: loop.run_in_executor(executor, fn) for name, fn in calls.items()}
+    if not tasks:
+        return {}, set()
+
+    done, pending = await asyncio.wait(tasks.values(), timeout=max(0.0, deadline - time.monotonic()))
+    for task in pending:
+        task.cancel()
+
+    results = {}
+    failed = set()
+    for name, task in tasks.items():
+        if task not in done:
+            print(f"Timed out fetching {name}")
+            failed.add(name)
+        elif task.exception() is not None:
+            print(f"Error fetching {name}: {task.exception()}")
+            failed.add(name)
+        else:
+            results[name] = task.result()
+    return results, failed
+
+
+async def _fetch_portfolio_data(tickers, overrides, deadline):
+    calls = {'prices': lambda: get_current_prices(tickers)}
+    for ticker in tickers:
+        calls[ticker] = lambda ticker=ticker: get_ticker_info(ticker)
+
+    results, failed = await gather_until(calls, deadline)
+
+    missing = {}
+    current_prices = results.get('prices') or {}
+    current_prices = {ticker: current_prices.get(ticker, float('nan')) for ticker in tickers}
+    for ticker, price in current_prices.items():
+        if not math.isfinite(price):
+            missing.setdefault(ticker, []).append('price')
+
+    expense_ratios = {}
+    classifications = {}
+    for ticker in tickers:
+        info = results.get(ticker)
+
+        if info:
+            expense_ratios[ticker] = expense_ratio_from_info(info)
+        else:
+            expense_ratios[ticker] = DEFAULT_EXPENSE_RATIO
+            missing.setdefault(ticker, []).append('expense_ratio')
+
+        if ticker in overrides:
+            classifications[ticker] = overrides[ticker]
+        else:
+            # An empty info dict still lets the known-ticker patterns match
+            classification = classify_investment(ticker, info or {})
+            if classification is None:
+                classification = DEFAULT_CLASSIFICATION
+                if ticker in failed:
+                    missing.setdefault(ticker, []).append('classification')
+            classifications[ticker] = classification
+
+    return {
+        'current_prices': current_prices,
+        'expense_ratios': expense_ratios,
+        'classifications': classifications,
+        'missing': missing
+    }
+
+
+def fetch_portfolio_data(tickers, overrides=None, deadline=None):
+    """Fetch current prices, expense ratios and classifications under one deadline.
+
+    All calls share the provider's bounded pool. Anything not available by
+    the deadline falls back to a default (NaN price, default expense ratio,
+    pattern-based or default classification) and is listed under 'missing'
+    as {ticker: [field, ...]} instead of failing the whole request.
+    """
+    if deadline is None:
+        deadline = analysis_deadline()
+    return asyncio.run(_fetch_portfolio_data(list(tickers), overrides or {}, deadline))
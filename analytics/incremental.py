@@ -0,0 +1,221 @@
+import os
+import threading
+from collections import OrderedDict, deque
+import numpy as np
+import pandas as pd
+from .performance import calculate_portfolio_returns
+from .price_store import ADJUSTMENT_TOLERANCE
+from .returns_index import merge_segments
+
+# Sliding analysis windows kept in memory for the daily rollover, per process
+INCREMENTAL_MAX_WINDOWS = int(os.environ.get("INCREMENTAL_MAX_WINDOWS", 256))
+
+_windows = OrderedDict()
+_windows_lock = threading.Lock()
+
+
+class SlidingPerformance:
+    """Historical performance over a date window that moves forward bar by bar.
+
+    Holds one portfolio's daily net returns for one or more advisory fee
+    scenarios, with running sums of returns, squared returns and log growth
+    and a two-stack queue of (max, min, drawdown) summaries of the value
+    path. advance() appends the new bars and drops the ones that fell out
+    of the window, so performance_stats for the window is updated in
+    O(new bars) instead of being recomputed over the whole decade.
+    """
+
+    def __init__(self, prices, weights, advisory_fees, expense_ratios=None, start_date=None):
+        self.weights = dict(weights)
+        self.advisory_fees = list(advisory_fees)
+        self.expense_ratios = expense_ratios
+        self.tickers = list(prices.columns)
+        self._lock = threading.RLock()
+
+        self._dates = deque()
+        self._returns = deque()
+        self._levels = deque()
+        self._prices = deque()
+        self._sum = np.zeros(len(self.advisory_fees))
+        self._sum_sq = np.zeros(len(self.advisory_fees))
+        self._level = np.zeros(len(self.advisory_fees))
+        # Two-stack queue: _front holds (level, summary of it and every newer
+        # front level), oldest on top; _back_summary covers the newer levels
+        self._front = []
+        self._back = []
+        self._back_summary = self._empty()
+
+        # Requested window start; the first price may be later (inception)
+        self.start_date = pd.Timestamp(start_date or prices.index[0])
+        self._base_date = prices.index[0]
+        self._base_prices = prices.iloc[0].to_numpy(dtype=float)
+        self._base_level = self._level.copy()
+        self._last_prices = prices.iloc[[0]]
+        self._append(prices)
+
+    def _empty(self):
+        n = len(self.advisory_fees)
+        return np.full(n, -np.inf), np.full(n, np.inf), np.zeros(n)
+
+    @property
+    def first_date(self):
+        """Date of the first price in the window."""
+        return self._base_date
+
+    @property
+    def last_date(self):
+        """Date of the last price in the window."""
+        return self._last_prices.index[-1]
+
+    def __len__(self):
+        return len(self._dates)
+
+    def _readjusted(self, prices):
+        """Whether prices has the window's last bar on a different (re-adjusted) basis."""
+        last_date = self.last_date
+        if last_date not in prices.index:
+            return False
+        held = self._last_prices.iloc[0].to_numpy(dtype=float)
+        fresh = prices.loc[last_date, self.tickers].to_numpy(dtype=float)
+        return not np.allclose(fresh, held, rtol=ADJUSTMENT_TOLERANCE, atol=0.0, equal_nan=True)
+
+    def _append(self, prices):
+        """Push the returns of every bar after the last one held."""
+        # The last bar from prices, when present, is the base for the first new return
+        base = prices.loc[[self.last_date], self.tickers] if self.last_date in prices.index else self._last_prices
+        prices = prices[prices.index > self.last_date]
+        if prices.empty:
+            return
+        frame = pd.concat([base, prices[self.tickers]])
+        returns = calculate_portfolio_returns(frame, self.weights, self.advisory_fees, self.expense_ratios)
+        rows = frame.reindex(returns.index).to_numpy(dtype=float)
+        for date, net, row in zip(returns.index, returns.to_numpy(), rows):
+            self._level = self._level + np.log1p(net)
+            self._sum = self._sum + net
+            self._sum_sq = self._sum_sq + net * net
+            self._dates.append(date)
+            self._returns.append(net)
+            self._levels.append(self._level)
+            self._prices.append(row)
+            self._back.append(self._level)
+            self._back_summary = merge_segments(self._back_summary, (self._level, self._level, np.zeros_like(net)))
+        self._last_prices = prices.iloc[[-1]]
+
+    def _drop_before(self, start_date):
+        """Pop the oldest returns until the window's first price is on or after start_date."""
+        start = pd.Timestamp(start_date)
+        while self._dates and self._base_date < start:
+            if not self._front:
+                # Refill the front stack with the back levels, newest first
+                summary = self._empty()
+                for level in reversed(self._back):
+                    summary = merge_segments((level, level, np.zeros_like(level)), summary)
+                    self._front.append(summary)
+                self._back = []
+                self._back_summary = self._empty()
+            self._front.pop()
+
+            net = self._returns.popleft()
+            self._sum = self._sum - net
+            self._sum_sq = self._sum_sq - net * net
+            self._base_level = self._levels.popleft()
+            self._base_date = self._dates.popleft()
+            self._base_prices = self._prices.popleft()
+
+    def advance(self, prices, start_date):
+        """Add the bars in prices that are newer than the window and drop those before start_date.
+
+        prices should start at last_date. Returns False, leaving the window
+        unchanged, if that bar has been re-adjusted (e.g. for a dividend or
+        split): returns across the adjustment can only be computed on one
+        basis, so the window must then be rebuilt from the full history.
+        """
+        with self._lock:
+            if self._readjusted(prices):
+                return False
+            self._append(prices)
+            self.start_date = max(self.start_date, pd.Timestamp(start_date))
+            self._drop_before(self.start_date)
+            return True
+
+    def advance_and_summarize(self, prices, start_date, risk_free=0.02):
+        """advance() then summary() in one critical section, so no other caller moves the window in between.
+
+        Returns the summary, or None (window unchanged) if the last bar was re-adjusted.
+        """
+        with self._lock:
+            if not self.advance(prices, start_date):
+                return None
+            return self.summary(risk_free)
+
+    def _stats(self, risk_free):
+        days = len(self._dates)
+        total_return = np.expm1(self._level - self._base_level)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            annualized_return = (1 + total_return) ** (252 / days) - 1
+            variance = (self._sum_sq - self._sum * self._sum / days) / (days - 1)
+            volatility = np.sqrt(np.maximum(variance, 0.0)) * np.sqrt(252)
+            sharpe = (annualized_return - risk_free) / volatility
+
+        front = self._front[-1] if self._front else self._empty()
+        max_dd = np.expm1(merge_segments(front, self._back_summary)[2])
+        return [{
+            "Total Return": total_return[i],
+            "Annualized Return": annualized_return[i],
+            "Volatility": volatility[i],
+            "Sharpe Ratio": sharpe[i],
+            "Max Drawdown": max_dd[i]
+        } for i in range(len(self.advisory_fees))]
+
+    def summary(self, risk_free=0.02):
+        """Everything analyze_historical_performance reports, as of the current window.
+
+        Returns a dict with 'stats' (one performance_stats dict per fee
+        scenario), 'returns' and 'cumulative' (days x scenarios DataFrames),
+        'individual_returns' and the first and last price dates. Only the
+        series are built in O(window); the statistics are kept up to date.
+        """
+        with self._lock:
+            index = pd.DatetimeIndex(list(self._dates))
+            levels = np.array(self._levels).reshape(len(index), -1)
+            last_prices = self._last_prices.iloc[0].to_numpy(dtype=float)
+            return {
+                'stats': self._stats(risk_free),
+                'returns': pd.DataFrame(np.array(self._returns).reshape(len(index), -1),
+                                        index=index, columns=self.advisory_fees),
+                'cumulative': pd.DataFrame(np.exp(levels - self._base_level),
+                                           index=index, columns=self.advisory_fees),
+                'individual_returns': dict(zip(self.tickers, (last_prices - self._base_prices) / self._base_prices)),
+                'first_date': self._base_date,
+                'last_date': self.last_date
+            }
+
+
+def window_key(weights, advisory_fees, expense_ratios=None, span_days=None):
+    """Identify a sliding window by portfolio weights, fee scenarios, expense ratios and length.
+
+    span_days is the calendar length of the requested window; windows of
+    different lengths over the same portfolio are kept apart so that a
+    shorter request never trims a longer window other sessions rely on.
+    """
+    ers = expense_ratios or {}
+    return (tuple(sorted(weights.items())), tuple(advisory_fees),
+            tuple(sorted((ticker, ers.get(ticker)) for ticker in weights)), span_days)
+
+
+def recall_window(key):
+    """Return the sliding window kept for key, or None."""
+    with _windows_lock:
+        window = _windows.get(key)
+        if window is not None:
+            _windows.move_to_end(key)
+        return window
+
+
+def remember_window(key, window):
+    """Keep a sliding window for the next rollover, evicting the least recently used."""
+    with _windows_lock:
+        _windows[key] = window
+        _windows.move_to_end(key)
+        while len(_windows) > INCREMENTAL_MAX_WINDOWS:
+            _windows.popitem(last=False)
@@ -0,0 +1,38 @@
+import numpy as np
+from .performance import batch_performance_stats, trailing_stats_array
+
+# Numeric kernels run in the worker processes of analytics.parallel. Keep
+# this module free of data, cache and provider imports so that starting a
+# worker never imports yfinance or opens the cache and security-master
+# databases.
+
+
+def net_returns(returns, missing, weights, fees, log_er):
+    """Daily net returns (days x portfolios), NaN on days where a portfolio misses a holding's return."""
+    held = (weights != 0).astype(float)
+    # Days on which every holding of the portfolio has a return
+    complete = missing.dot(held.T) == 0
+    gross = returns.dot(weights.T)
+    # Combined advisory and fund fee multiplier per portfolio
+    fee_factor = np.exp((np.log1p(-fees) + weights.dot(log_er)) / 252)
+    return np.where(complete, (1 + gross) * fee_factor - 1, np.nan)
+
+
+def chunk_stats(arrays, weights, fees, log_er, risk_free, horizons=None):
+    """performance_stats plus first/last return row and day count for one chunk of portfolios.
+
+    horizons is None or (labels, starts, latest) for trailing statistics.
+    """
+    net = net_returns(arrays['returns'], arrays['missing'], weights, fees, log_er)
+    stats = batch_performance_stats(net, risk_free)
+    if horizons is not None:
+        labels, starts, latest = horizons
+        for key, values in trailing_stats_array(net, starts, latest, risk_free).items():
+            for label, row in zip(labels, values):
+                stats[f"{label} {key}"] = row
+
+    valid = ~np.isnan(net)
+    stats['Days'] = valid.sum(axis=0)
+    stats['first'] = np.where(stats['Days'] > 0, valid.argmax(axis=0), -1)
+    stats['last'] = np.where(stats['Days'] > 0, len(net) - 1 - valid[::-1].argmax(axis=0), -1)
+    return stats
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+
+# Latency percentiles are computed over the most recent samples per series
+LATENCY_SAMPLES = int(os.environ.get("METRICS_LATENCY_SAMPLES", 1024))
+
+# When set, metrics are written here periodically (Prometheus text format,
+# or JSON if the path ends in .json), e.g. for node_exporter's textfile collector
+METRICS_EXPORT_PATH = os.environ.get("METRICS_EXPORT_PATH", "")
+METRICS_EXPORT_INTERVAL = float(os.environ.get("METRICS_EXPORT_INTERVAL", 15))
+
+METRIC_PREFIX = "portfolio_"
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    text = ",".join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+    return "{" + text + "}"
+
+
+class Metrics:
+    """In-process counters, latency samples and gauges for the cache and data layer.
+
+    Counters and latency series are identified by a name plus labels (e.g.
+    namespace="ticker_info"). Gauges are callbacks evaluated at snapshot
+    time that return {((label, value), ...): gauge value}.
+    """
+
+    def __init__(self, max_samples=LATENCY_SAMPLES):
+        self.max_samples = max_samples
+        self._counters = {}
+        self._samples = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, n=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def observe(self, name, seconds, **labels):
+        """Record one latency sample, in seconds."""
+        key = (name, _labels_key(labels))
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = [0, deque(maxlen=self.max_samples)]
+            samples[0] += 1
+            samples[1].append(seconds)
+
+    def register_gauge(self, name, fn):
+        """Register a gauge callback, read whenever metrics are collected."""
+        self._gauges[name] = fn
+
+    def counter(self, name, **labels):
+        return self._counters.get((name, _labels_key(labels)), 0)
+
+    def latency(self, name, **labels):
+        """Return {'count', 'p50', 'p95', 'p99'} for a latency series (None if no samples)."""
+        with self._lock:
+            samples = self._samples.get((name, _labels_key(labels)))
+            if samples is None:
+                return None
+            count, values = samples[0], list(samples[1])
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {'count': count, 'p50': float(p50), 'p95': float(p95), 'p99': float(p99)}
+
+    def snapshot(self):
+        """Return every metric as plain data: counters, latency summaries and gauges."""
+        with self._lock:
+            counters = dict(self._counters)
+            series = list(self._samples)
+        gauges = {}
+        for name, fn in list(self._gauges.items()):
+            try:
+                gauges[name] = fn()
+            except Exception as e:
+                print(f"Could not collect metric {name}: {e}")
+
+        return {
+            'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                         for (name, labels), value in sorted(counters.items())],
+            'latencies': [dict(name=name, labels=dict(labels), **self.latency(name, **dict(labels)))
+                          for name, labels in sorted(series)],
+            'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                       for name, values in sorted(gauges.items()) for labels, value in sorted(values.items())]
+        }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=1, sort_keys=True)
+
+    def to_prometheus(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+
+        def header(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for metric in snapshot['counters']:
+            name = f"{METRIC_PREFIX}{metric['name']}_total"
+            header(name, "counter")
+            lines.append(f"{name}{_format_labels(sorted(metric['labels'].items()))} {metric['value']}")
+        for metric in snapshot['latencies']:
+            name = f"{METRIC_PREFIX}{metric['name']}_seconds"
+            labels = sorted(metric['labels'].items())
+            header(name, "summary")
+            for quantile, q in (('p50', '0.5'), ('p95', '0.95'), ('p99', '0.99')):
+                lines.append(f"{name}{_format_labels(labels, [('quantile', q)])} {metric[quantile]:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {metric['count']}")
+        for metric in snapshot['gauges']:
+            name = f"{METRIC_PREFIX}{metric['name']}"
+            header(name, "gauge")
+            lines.append(f"{name}{_format_labels(sorted(metric['labels'].items()))} {metric['value']}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write the metrics to path atomically; JSON if it ends in .json, else Prometheus text."""
+        text = self.to_json() if path.endswith(".json") else self.to_prometheus()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._samples.clear()
+
+
+# Shared by the cache, the providers and the throttling layer
+metrics = Metrics()
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def start_exporter(path=METRICS_EXPORT_PATH, interval=METRICS_EXPORT_INTERVAL):
+    """Write the metrics to path every interval seconds from a daemon thread (once per process)."""
+    global _exporter
+    if not path:
+        return None
+    with _exporter_lock:
+        if _exporter is None:
+            def export():
+                while True:
+                    try:
+                        metrics.write(path)
+                    except OSError as e:
+                        print(f"Could not write metrics to {path}: {e}")
+                    time.sleep(interval)
+
+            _exporter = threading.Thread(target=export, name="metrics-exporter", daemon=True)
+            _exporter.start()
+        return _exporter
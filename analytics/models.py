@@ -15,6 +15,13 @@ asset_volatility = {
     "Alternatives": 0.16              # 16% volatility
 }
 
+# Correlations between annual asset-class returns (symmetric; unlisted pairs are uncorrelated)
+asset_correlations = {
+    "US Equities": {"International Equities": 0.85, "Core Fixed Income": 0.10, "Alternatives": 0.65},
+    "International Equities": {"Core Fixed Income": 0.10, "Alternatives": 0.60},
+    "Core Fixed Income": {"Alternatives": 0.20}
+}
+
 #Define model portfolio advisory fee
 model_fee = .0025 #.025% 
 
@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import numpy as np
+
+# Worker processes for heavy numeric work (Monte Carlo, batch backtests)
+PARALLEL_WORKERS = int(os.environ.get("PARALLEL_WORKERS", os.cpu_count() or 1))
+
+# Forking a threaded server process is unsafe, so workers are started fresh
+PARALLEL_START_METHOD = os.environ.get(
+    "PARALLEL_START_METHOD",
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class SharedArray:
+    """A read-only NumPy array placed in shared memory for worker processes.
+
+    Workers attach to it by name (see attached()) instead of receiving a
+    pickled copy. The creating process owns the segment and must close() it,
+    which the context manager does.
+    """
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=self._shm.buf)[...] = array
+        self.handle = (self._shm.name, array.shape, array.dtype.str)
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@contextmanager
+def attached(handles):
+    """Map {name: SharedArray.handle} to {name: ndarray} for the duration of the block."""
+    segments = []
+    arrays = {}
+    try:
+        for key, (name, shape, dtype) in handles.items():
+            shm = shared_memory.SharedMemory(name=name)
+            segments.append(shm)
+            array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+            array.flags.writeable = False
+            arrays[key] = array
+        yield arrays
+    finally:
+        arrays.clear()
+        for shm in segments:
+            shm.close()
+
+
+def _run_chunk(fn, handles, args):
+    with attached(handles) as arrays:
+        return fn(arrays, *args)
+
+
+def get_pool(workers=PARALLEL_WORKERS):
+    """Return the shared process pool with the given number of workers.
+
+    Pools are kept per requested size, which is PARALLEL_WORKERS unless a
+    caller asks for another, so the number of pools stays small.
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=multiprocessing.get_context(PARALLEL_START_METHOD))
+            _pools[workers] = pool
+        return pool
+
+
+def map_chunks(fn, chunks, arrays=None, workers=None):
+    """Call fn(arrays, *chunk) for every chunk and return the results in chunk order.
+
+    fn must be a module-level function so it can be sent to workers.
+    arrays ({name: ndarray}) are shared read-only with the workers through
+    shared memory. With workers=None the shared pool (PARALLEL_WORKERS) is
+    used when there is more than one chunk; with one worker, or one chunk,
+    everything runs in this process. Results do not depend on the worker
+    count as long as each chunk's work is deterministic.
+    """
+    chunks = list(chunks)
+    arrays = arrays or {}
+    if workers is None:
+        workers = PARALLEL_WORKERS
+    if workers <= 1 or len(chunks) <= 1:
+        return [fn(arrays, *chunk) for chunk in chunks]
+
+    shared = {key: SharedArray(array) for key, array in arrays.items()}
+    try:
+        handles = {key: array.handle for key, array in shared.items()}
+        # One pool per configured size, whatever the chunk count; idle
+        # workers simply get no task
+        pool = get_pool(workers)
+        futures = [pool.submit(_run_chunk, fn, handles, chunk) for chunk in chunks]
+        return [future.result() for future in futures]
+    finally:
+        for array in shared.values():
+            array.close()
+
+
+def shutdown():
+    """Stop every worker pool."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(cancel_futures=True)
+        _pools.clear()
@@ -1,24 +1,53 @@
+import os
 import numpy as np
 import pandas as pd
+from .parallel import map_chunks
+
+# Monte Carlo defaults: paths per projection and paths simulated per chunk,
+# which bounds the memory used for the asset-class shocks
+MONTE_CARLO_PATHS = int(os.environ.get("MONTE_CARLO_PATHS", 10000))
+MONTE_CARLO_CHUNK_SIZE = int(os.environ.get("MONTE_CARLO_CHUNK_SIZE", 10000))
+MONTE_CARLO_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Trailing horizons (years) for multi-horizon statistics; a series counts as
+# covering a horizon if it starts at most this many days after its start
+TRAILING_HORIZONS = (1, 3, 5, 10)
+HORIZON_TOLERANCE_DAYS = 7
+
+def daily_fee_factor(weights, advisory_fees=0.0, expense_ratios=None):
+    """Daily growth multiplier left after advisory and fund fees, one per advisory fee level.
+
+    Each holding's expense ratio is charged on its weight, so the combined
+    drag is (1 - advisory) ** (1/252) * prod((1 - er) ** (weight/252)),
+    evaluated in log space as a single dot product.
+    """
+    log_drag = 0.0
+    if expense_ratios:
+        weights_array = np.array(list(weights.values()), dtype=float)
+        ers = np.array([expense_ratios.get(ticker, 0.0) for ticker in weights], dtype=float)
+        ers = np.where(ers > 0, ers, 0.0)
+        log_drag = weights_array.dot(np.log1p(-ers))
+    return np.exp((np.log1p(-np.asarray(advisory_fees, dtype=float)) + log_drag) / 252)
+
 
 def calculate_portfolio_returns(prices, weights, advisory_fee=0.0, expense_ratios=None):
+    """Daily portfolio returns net of advisory and fund fees.
+
+    advisory_fee may be a single rate, giving a Series, or a sequence of
+    rates, giving a DataFrame of returns with one column per fee scenario
+    computed from the same pass over the prices.
+    """
     returns = prices.pct_change().dropna()
     weights_array = np.array(list(weights.values()))
-    port_returns = returns.dot(weights_array)
-
-    # Deduct advisory fee daily
-    daily_advisory = (1 - advisory_fee) ** (1/252)
-    port_returns = (1 + port_returns) * daily_advisory - 1
+    gross = returns.to_numpy().dot(weights_array)
 
-    # Deduct expense ratios daily
-    if expense_ratios:
-        for ticker, weight in weights.items():
-            er = expense_ratios.get(ticker, 0.0)
-            if er > 0:
-                daily_er = (1 - er) ** (1/252)
-                port_returns = (1 + port_returns) * (daily_er ** weight) - 1
+    # Fees are deducted daily as one combined multiplier per scenario
+    factors = daily_fee_factor(weights, advisory_fee, expense_ratios)
+    if np.ndim(factors) == 0:
+        return pd.Series((1 + gross) * factors - 1, index=returns.index)
 
-    return port_returns
+    net = np.outer(1 + gross, factors) - 1
+    return pd.DataFrame(net, index=returns.index, columns=list(np.atleast_1d(advisory_fee)))
 
 def calculate_individual_returns(prices):
     """Calculate total return for each individual asset."""
@@ -51,6 +80,134 @@ def performance_stats(port_returns, risk_free=0.02):
 
 
 
+def batch_performance_stats(port_returns, risk_free=0.02):
+    """performance_stats for many portfolios at once.
+
+    port_returns is a (days x portfolios) array; NaN marks days outside a
+    portfolio's own history and is skipped. Returns a dict of arrays with
+    the same keys as performance_stats.
+    """
+    valid = ~np.isnan(port_returns)
+    days = valid.sum(axis=0)
+    cumulative = np.cumprod(np.where(valid, 1 + port_returns, 1.0), axis=0)
+    total_return = cumulative[-1] - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annualized_return = (1 + total_return) ** (252 / days) - 1
+        demeaned = np.where(valid, port_returns - np.nansum(port_returns, axis=0) / days, 0.0)
+        volatility = np.sqrt((demeaned ** 2).sum(axis=0) / (days - 1)) * np.sqrt(252)
+        sharpe = (annualized_return - risk_free) / volatility
+    # Days before a portfolio's first return are not part of its value path,
+    # so they must not count as a peak
+    started = np.logical_or.accumulate(valid, axis=0)
+    path = np.where(started, cumulative, np.nan)
+    with np.errstate(invalid='ignore'):
+        drawdown = path / np.fmax.accumulate(path, axis=0) - 1
+    max_dd = np.where(started, drawdown, 0.0).min(axis=0)
+
+    return {
+        "Total Return": total_return,
+        "Annualized Return": annualized_return,
+        "Volatility": volatility,
+        "Sharpe Ratio": sharpe,
+        "Max Drawdown": max_dd
+    }
+
+
+def horizon_windows(index, horizons=TRAILING_HORIZONS):
+    """First row of each trailing horizon ending at index[-1], and the latest row a series may start on."""
+    end = pd.Timestamp(index[-1])
+    starts, latest = [], []
+    for years in horizons:
+        begin = end - pd.DateOffset(years=years)
+        starts.append(index.searchsorted(begin, side='right'))
+        latest.append(index.searchsorted(begin + pd.Timedelta(days=HORIZON_TOLERANCE_DAYS), side='right'))
+    return np.array(starts), np.array(latest)
+
+
+def trailing_stats_array(port_returns, starts, latest, risk_free=0.02):
+    """performance_stats over several trailing windows for many series at once.
+
+    port_returns is a (days x series) array with NaN outside each series'
+    history; starts/latest come from horizon_windows. Prefix sums give every
+    window's returns and volatility from one pass; drawdowns are taken one
+    window at a time so memory stays at a few (days x series) arrays
+    whatever the number of horizons. Returns a dict
+    of (horizons x series) arrays keyed like performance_stats; windows a
+    series does not cover are NaN.
+    """
+    valid = ~np.isnan(port_returns)
+    values = np.where(valid, port_returns, 0.0)
+    n = len(values)
+    first_valid = np.where(valid.any(axis=0), valid.argmax(axis=0), n)
+
+    def prefix(a):
+        return np.concatenate([np.zeros((1,) + a.shape[1:]), np.cumsum(a, axis=0)])
+
+    log_levels = prefix(np.log1p(values))
+    sums, sums_sq, counts = prefix(values), prefix(values ** 2), prefix(valid.astype(float))
+
+    days = counts[-1] - counts[starts]
+    total = sums[-1] - sums[starts]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        total_return = np.expm1(log_levels[-1] - log_levels[starts])
+        annualized_return = (1 + total_return) ** (252 / days) - 1
+        variance = (sums_sq[-1] - sums_sq[starts] - total * total / days) / (days - 1)
+        volatility = np.sqrt(np.maximum(variance, 0.0)) * np.sqrt(252)
+        sharpe = (annualized_return - risk_free) / volatility
+
+    # Drawdowns one window at a time, reusing a single (days x series) buffer
+    path = log_levels[1:]
+    buffer = np.empty_like(path)
+    max_dd = np.zeros((len(starts), path.shape[1]))
+    for h, start in enumerate(starts):
+        if start < n:
+            window = buffer[:n - start]
+            np.maximum.accumulate(path[start:], axis=0, out=window)
+            np.subtract(path[start:], window, out=window)
+            max_dd[h] = window.min(axis=0)
+    max_dd = np.expm1(max_dd)
+
+    # latest counts the rows dated on or before the latest allowed start
+    covered = first_valid[None, :] < latest[:, None]
+    stats = {
+        "Total Return": total_return,
+        "Annualized Return": annualized_return,
+        "Volatility": volatility,
+        "Sharpe Ratio": sharpe,
+        "Max Drawdown": max_dd
+    }
+    return {key: np.where(covered, value, np.nan) for key, value in stats.items()}
+
+
+def multi_horizon_stats(port_returns, horizons=TRAILING_HORIZONS, risk_free=0.02):
+    """Trailing performance_stats (e.g. 1/3/5/10 years) computed together.
+
+    For a return Series, returns a DataFrame with one row per horizon
+    ("1Y", "3Y", ...) and the performance_stats columns. For a DataFrame of
+    return series (days x series), returns one row per series with
+    (horizon, statistic) columns.
+    """
+    index = pd.DatetimeIndex(port_returns.index)
+    starts, latest = horizon_windows(index, horizons)
+    labels = [f"{years}Y" for years in horizons]
+
+    values = port_returns.to_numpy(dtype=float)
+    stats = trailing_stats_array(values.reshape(len(values), -1), starts, latest, risk_free)
+
+    if isinstance(port_returns, pd.Series):
+        return pd.DataFrame({key: value[:, 0] for key, value in stats.items()}, index=labels)
+    columns = pd.MultiIndex.from_product([labels, list(stats)])
+    data = np.stack([stats[key] for key in stats], axis=1)  # horizons x stats x series
+    return pd.DataFrame(data.reshape(-1, data.shape[-1]).T, index=port_returns.columns, columns=columns)
+
+
+def _weighted_annual_return(asset_class_allocation, growth_rates):
+    return sum(
+        asset_class_allocation.get(asset_class, 0) * growth_rate
+        for asset_class, growth_rate in growth_rates.items()
+    )
+
+
 def project_portfolio_returns(asset_class_allocation, growth_rates, years=10):
     """
     Project portfolio returns based on asset class allocations and growth rates.
@@ -61,38 +218,42 @@ def project_portfolio_returns(asset_class_allocation, growth_rates, years=10):
         years: Number of years to project
     
     Returns:
-        Dict with projection results
+        Dict with projection results; 'yearly_projections' is a DataFrame
+        indexed by year with portfolio_value, annual_return and
+        cumulative_return columns
     """
     # Calculate weighted average annual return
-    weighted_annual_return = sum(
-        asset_class_allocation.get(asset_class, 0) * growth_rate
-        for asset_class, growth_rate in growth_rates.items()
-    )
+    weighted_annual_return = _weighted_annual_return(asset_class_allocation, growth_rates)
     
-    # Calculate total return over the projection period
-    total_projected_return = (1 + weighted_annual_return) ** years - 1
+    # Year-by-year values of $1 in closed form
+    year_numbers = np.arange(1, years + 1)
+    portfolio_values = (1 + weighted_annual_return) ** year_numbers
     
-    # Calculate year-by-year projections
-    yearly_projections = []
-    portfolio_value = 1.0  # Start with $1
-    
-    for year in range(1, years + 1):
-        portfolio_value *= (1 + weighted_annual_return)
-        yearly_projections.append({
-            'year': year,
-            'portfolio_value': portfolio_value,
-            'annual_return': weighted_annual_return,
-            'cumulative_return': portfolio_value - 1
-        })
+    yearly_projections = pd.DataFrame({
+        'portfolio_value': portfolio_values,
+        'annual_return': weighted_annual_return,
+        'cumulative_return': portfolio_values - 1
+    }, index=pd.Index(year_numbers, name='year'))
     
     return {
         'weighted_annual_return': weighted_annual_return,
-        'total_projected_return': total_projected_return,
-        'final_portfolio_value': portfolio_value,
+        'total_projected_return': (1 + weighted_annual_return) ** years - 1,
+        'final_portfolio_value': portfolio_values[-1] if years else 1.0,
         'yearly_projections': yearly_projections
     }
 
 
+def _fee_projection(weighted_annual_return, fee_rates, years):
+    """Starting value, growth, fees and ending value of $1 for each fee rate (rows) and year (columns)."""
+    fee_rates = np.asarray(fee_rates, dtype=float).reshape(-1, 1)
+    year_numbers = np.arange(1, years + 1)
+    # Each year's ending value is (1 + r) * (1 - fee) times the starting value
+    starting = ((1 + weighted_annual_return) * (1 - fee_rates)) ** (year_numbers - 1)
+    growth = starting * weighted_annual_return
+    fees = (starting + growth) * fee_rates
+    return starting, growth, fees, starting + growth - fees
+
+
 def project_portfolio_with_fees(asset_class_allocation, growth_rates, total_fee_rate, years=10):
     """
     Project portfolio returns with year-by-year fee calculations.
@@ -104,40 +265,140 @@ def project_portfolio_with_fees(asset_class_allocation, growth_rates, total_fee_
         years: Number of years to project
     
     Returns:
-        Dict with detailed year-by-year projections including fees
+        Dict with totals and a 'yearly_projections' DataFrame indexed by
+        year with starting_value, growth, fees, ending_value and
+        annual_return columns
     """
     # Calculate weighted average annual return (before fees)
-    weighted_annual_return = sum(
-        asset_class_allocation.get(asset_class, 0) * growth_rate
-        for asset_class, growth_rate in growth_rates.items()
-    )
+    weighted_annual_return = _weighted_annual_return(asset_class_allocation, growth_rates)
     
-    # Calculate year-by-year projections with fees
-    yearly_projections = []
-    portfolio_value = 1.0  # Start with $1
-    total_fees = 0.0
-    
-    for year in range(1, years + 1):
-        starting_value = portfolio_value
-        growth = starting_value * weighted_annual_return
-        fees = (starting_value + growth) * total_fee_rate
-        ending_value = starting_value + growth - fees
-        
-        portfolio_value = ending_value
-        total_fees += fees
-        
-        yearly_projections.append({
-            'year': year,
-            'starting_value': starting_value,
-            'growth': growth,
-            'fees': fees,
-            'ending_value': ending_value,
-            'annual_return': weighted_annual_return
-        })
+    starting, growth, fees, ending = (a[0] for a in _fee_projection(weighted_annual_return, total_fee_rate, years))
+    yearly_projections = pd.DataFrame({
+        'starting_value': starting,
+        'growth': growth,
+        'fees': fees,
+        'ending_value': ending,
+        'annual_return': weighted_annual_return
+    }, index=pd.Index(np.arange(1, years + 1), name='year'))
     
     return {
         'weighted_annual_return': weighted_annual_return,
-        'final_portfolio_value': portfolio_value,
-        'total_fees': total_fees,
+        'final_portfolio_value': ending[-1] if years else 1.0,
+        'total_fees': fees.sum(),
         'yearly_projections': yearly_projections
     }
+
+
+def project_fee_grid(asset_class_allocation, growth_rates, fee_rates, horizons):
+    """
+    Project final value and cumulative fees of $1 for every fee rate and horizon in one call.
+    
+    Args:
+        asset_class_allocation: Dict of asset class -> weight
+        growth_rates: Dict of asset class -> annual growth rate
+        fee_rates: Sequence of combined annual fee rates
+        horizons: Sequence of horizons in whole years >= 1 (e.g. range(1, 41))
+    
+    Returns:
+        Dict with DataFrames (fee rates x horizons) of final_portfolio_value
+        and total_fees
+    """
+    weighted_annual_return = _weighted_annual_return(asset_class_allocation, growth_rates)
+    horizons = np.asarray(horizons, dtype=int)
+    if horizons.size == 0 or (horizons < 1).any():
+        raise ValueError(f"Horizons must be at least one year: {horizons.tolist()}")
+    fee_index = pd.Index(np.asarray(fee_rates, dtype=float), name='fee_rate')
+    horizon_index = pd.Index(horizons, name='years')
+    
+    _, _, fees, ending = _fee_projection(weighted_annual_return, fee_rates, int(horizons.max()))
+    cumulative_fees = np.cumsum(fees, axis=1)
+    
+    return {
+        'weighted_annual_return': weighted_annual_return,
+        'final_portfolio_value': pd.DataFrame(ending[:, horizons - 1], index=fee_index, columns=horizon_index),
+        'total_fees': pd.DataFrame(cumulative_fees[:, horizons - 1], index=fee_index, columns=horizon_index)
+    }
+
+
+def correlation_matrix(asset_classes, correlations):
+    """Build the correlation matrix for asset_classes from a nested {a: {b: rho}} mapping."""
+    n = len(asset_classes)
+    matrix = np.eye(n)
+    for i, a in enumerate(asset_classes):
+        for j, b in enumerate(asset_classes):
+            if i != j:
+                matrix[i, j] = correlations.get(a, {}).get(b, correlations.get(b, {}).get(a, 0.0))
+    return matrix
+
+
+def simulate_portfolio_values(asset_class_allocation, growth_rates, asset_volatility, correlations,
+                              total_fee_rate=0.0, years=10, n_paths=MONTE_CARLO_PATHS, seed=None,
+                              chunk_size=MONTE_CARLO_CHUNK_SIZE, workers=None):
+    """Simulate year-end values of $1 along n_paths random paths; returns an (n_paths x years) array.
+
+    Each year every asset class draws a normal return with its growth rate
+    as mean and its volatility as standard deviation, correlated through the
+    Cholesky factor of the covariance matrix. The portfolio is rebalanced to
+    its allocation yearly and the fee is deducted from each path's year-end
+    value, as in project_portfolio_with_fees. Paths are generated in chunks,
+    each with its own RNG stream spawned from seed, and spread over the
+    process pool (see analytics.parallel), so results depend only on seed
+    and chunk_size, never on the number of workers.
+    """
+    asset_classes = [a for a, w in asset_class_allocation.items() if w]
+    weights = np.array([asset_class_allocation[a] for a in asset_classes])
+    means = np.array([growth_rates.get(a, 0) for a in asset_classes])
+    vols = np.array([asset_volatility.get(a, 0) for a in asset_classes])
+
+    covariance = correlation_matrix(asset_classes, correlations) * np.outer(vols, vols)
+    # The tiny ridge keeps the factorisation valid for zero-volatility classes
+    cholesky = np.linalg.cholesky(covariance + 1e-12 * np.eye(len(asset_classes)))
+    # Portfolio return = w . (mean + L z), so only w . L is needed per draw
+    loadings = weights.dot(cholesky)
+    mean_return = weights.dot(means)
+
+    n_chunks = -(-n_paths // chunk_size)
+    streams = np.random.SeedSequence(seed).spawn(n_chunks)
+    chunks = [(min(chunk_size, n_paths - i * chunk_size), years, mean_return, loadings, total_fee_rate, stream)
+              for i, stream in enumerate(streams)]
+    return np.concatenate(map_chunks(_simulate_chunk, chunks, workers=workers))
+
+
+def _simulate_chunk(arrays, n_paths, years, mean_return, loadings, total_fee_rate, stream):
+    shocks = np.random.default_rng(stream).standard_normal((n_paths, years, len(loadings)))
+    annual_returns = mean_return + shocks.dot(loadings)
+    return np.cumprod((1 + annual_returns) * (1 - total_fee_rate), axis=1)
+
+
+def project_portfolio_monte_carlo(asset_class_allocation, growth_rates, asset_volatility, correlations,
+                                  total_fee_rate=0.0, years=10, n_paths=MONTE_CARLO_PATHS, seed=None,
+                                  percentiles=MONTE_CARLO_PERCENTILES, workers=None):
+    """
+    Monte Carlo projection of portfolio value after fees, summarised as percentile bands.
+
+    Args:
+        asset_class_allocation: Dict of asset class -> weight
+        growth_rates: Dict of asset class -> expected annual return
+        asset_volatility: Dict of asset class -> annual volatility
+        correlations: Nested dict of asset class correlations
+        total_fee_rate: Combined expense ratio + advisory fee
+        years: Number of years to project
+        n_paths: Number of simulated paths
+        seed: Seed for the random number streams
+        workers: Worker processes to use (default: the shared pool)
+
+    Returns:
+        Dict with the year numbers, {percentile: value of $1 per year}, and
+        the mean and probability of loss of the final value
+    """
+    values = simulate_portfolio_values(asset_class_allocation, growth_rates, asset_volatility, correlations,
+                                       total_fee_rate, years, n_paths, seed, workers=workers)
+    bands = np.percentile(values, percentiles, axis=0)
+
+    return {
+        'years': list(range(1, years + 1)),
+        'percentiles': {p: band for p, band in zip(percentiles, bands)},
+        'mean_final_value': values[:, -1].mean(),
+        'probability_of_loss': (values[:, -1] < 1.0).mean(),
+        'n_paths': n_paths
+    }
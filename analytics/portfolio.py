@@ -1,15 +1,22 @@
-
 import numpy as np
-from .data import get_current_prices, get_expense_ratios, get_investment_classifications, get_price_data, get_investment_details
-from .performance import calculate_portfolio_returns, performance_stats, calculate_individual_returns, project_portfolio_returns, project_portfolio_with_fees
-from .models import growth_rates, asset_volatility
+import pandas as pd
+from .cache import get_cached, set_cached
+from .data import get_price_data, get_investment_details
+from .fetch import fetch_portfolio_data, run_until
+from .throttle import ProviderUnavailable
+from .performance import project_portfolio_returns, project_portfolio_with_fees, project_portfolio_monte_carlo, multi_horizon_stats, MONTE_CARLO_PATHS
+from .models import growth_rates, asset_volatility, asset_correlations
+from .returns_index import ReturnsIndex
+from .incremental import SlidingPerformance, recall_window, remember_window, window_key
+from .covariance import COVARIANCE_METHOD, asset_class_covariance, covariance_matrix, portfolio_variance
 
 
 class Portfolio:
-    # Class-level cache for portfolio data
-    _portfolio_cache = {}
+    # Portfolio data is kept in the shared cache so every worker can reuse it
+    _portfolio_cache_namespace = "portfolio_data"
+    _portfolio_cache_ttl = 300  # Matches the current price cache
     
-    def __init__(self, portfolio_dollars, name, advisory_fee=0.0, asset_class_overrides=None):
+    def __init__(self, portfolio_dollars, name, advisory_fee=0.0, asset_class_overrides=None, deadline=None):
         self.portfolio_dollars = portfolio_dollars
         self.name = name
         self.advisory_fee = advisory_fee
@@ -22,29 +29,28 @@ class Portfolio:
         cache_key = f"{sorted(tickers)}_{asset_class_overrides}"
         
         # Check if we have cached data for this exact set of tickers
-        if cache_key in Portfolio._portfolio_cache:
-            cached_data = Portfolio._portfolio_cache[cache_key]
+        cached_data = get_cached(Portfolio._portfolio_cache_namespace, cache_key)
+        if cached_data is not None:
             self.current_prices = cached_data['prices']
             self.expense_ratios = cached_data['expense_ratios']
             self.classifications = cached_data['classifications']
+            self.missing_data = {}
         else:
-            # Parallel data fetching
-            from concurrent.futures import ThreadPoolExecutor
-            with ThreadPoolExecutor(max_workers=3) as executor:
-                price_future = executor.submit(get_current_prices, tickers)
-                expense_future = executor.submit(get_expense_ratios, tickers)
-                classification_future = executor.submit(get_investment_classifications, tickers, asset_class_overrides)
-                
-                self.current_prices = price_future.result()
-                self.expense_ratios = expense_future.result()
-                self.classifications = classification_future.result()
+            # Concurrent data fetching under one deadline; anything that does
+            # not arrive in time falls back to a default and is flagged
+            data = fetch_portfolio_data(tickers, asset_class_overrides, deadline)
+            self.current_prices = data['current_prices']
+            self.expense_ratios = data['expense_ratios']
+            self.classifications = data['classifications']
+            self.missing_data = data['missing']
             
-            # Cache the results
-            Portfolio._portfolio_cache[cache_key] = {
-                'prices': self.current_prices,
-                'expense_ratios': self.expense_ratios,
-                'classifications': self.classifications
-            }
+            # Cache the results, unless some of them are fallbacks
+            if not self.missing_data:
+                set_cached(Portfolio._portfolio_cache_namespace, cache_key, {
+                    'prices': self.current_prices,
+                    'expense_ratios': self.expense_ratios,
+                    'classifications': self.classifications
+                }, Portfolio._portfolio_cache_ttl)
         
         self.portfolio_weights = self._calculate_weights()
         self.weighted_avg_er = self._calculate_weighted_avg_er()
@@ -70,8 +76,12 @@ class Portfolio:
             allocation[asset_class] = allocation.get(asset_class, 0) + weight
         return allocation
     
-    def analyze_historical_performance(self, start_date, end_date):
-        """Analyze historical portfolio performance."""
+    def analyze_historical_performance(self, start_date, end_date, deadline=None):
+        """Analyze historical portfolio performance.
+
+        With a deadline, loading the price history raises DeadlineExceeded
+        if it does not finish in time.
+        """
         # Cache key based on portfolio composition and date range
         cache_key = f"{self.name}_{start_date}_{end_date}_{hash(frozenset(self.portfolio_weights.items()))}"
         
@@ -79,23 +89,24 @@ class Portfolio:
         if hasattr(self, '_performance_cache') and cache_key in self._performance_cache:
             return self._performance_cache[cache_key]
         
-        # Load historical data
-        prices = get_price_data(list(self.portfolio_dollars.keys()), start_date, end_date)
-        
-        # Calculate returns with and without advisory fees
-        returns_with_fees = calculate_portfolio_returns(
-            prices, self.portfolio_weights, self.advisory_fee, self.expense_ratios
-        )
-        returns_no_advisory = calculate_portfolio_returns(
-            prices, self.portfolio_weights, 0.0, self.expense_ratios
-        )
-        
-        # Get performance statistics
-        stats_with_fees, cumulative_with_fees = performance_stats(returns_with_fees)
-        stats_no_advisory, cumulative_no_advisory = performance_stats(returns_no_advisory)
-        
-        # Individual asset returns
-        individual_returns = calculate_individual_returns(prices)
+        # Roll yesterday's window forward when only new bars are needed,
+        # otherwise load the whole history
+        summary = self._rolled_summary(start_date, end_date, deadline)
+        if summary is None:
+            prices = run_until(lambda: get_price_data(list(self.portfolio_dollars.keys()), start_date, end_date),
+                               deadline)
+            # Returns with and without advisory fees are computed in one pass
+            window = SlidingPerformance(prices, self.portfolio_weights, [self.advisory_fee, 0.0],
+                                        self.expense_ratios, start_date)
+            # Summarize before sharing it; other sessions may roll it from then on
+            summary = window.summary()
+            remember_window(self._window_key(start_date, end_date), window)
+
+        stats_with_fees, stats_no_advisory = summary['stats']
+        returns_with_fees = summary['returns'].iloc[:, 0]
+        cumulative_with_fees = summary['cumulative'].iloc[:, 0]
+        cumulative_no_advisory = summary['cumulative'].iloc[:, 1]
+        individual_returns = summary['individual_returns']
         
         result = {
             'stats_with_fees': stats_with_fees,
@@ -103,8 +114,13 @@ class Portfolio:
             'cumulative_with_fees': cumulative_with_fees,
             'cumulative_no_advisory': cumulative_no_advisory,
             'individual_returns': individual_returns,
-            'actual_start_date': prices.index[0].strftime('%Y-%m-%d'),
-            'actual_end_date': prices.index[-1].strftime('%Y-%m-%d')
+            'returns_with_fees': returns_with_fees,
+            # Answers stats for any sub-window without recomputing the returns
+            'returns_index': ReturnsIndex(returns_with_fees),
+            # Trailing 1/3/5/10-year stats after all fees
+            'trailing_stats': multi_horizon_stats(returns_with_fees),
+            'actual_start_date': summary['first_date'].strftime('%Y-%m-%d'),
+            'actual_end_date': summary['last_date'].strftime('%Y-%m-%d')
         }
         
         # Cache the result
@@ -114,6 +130,28 @@ class Portfolio:
         
         return result
     
+    def _window_key(self, start_date, end_date):
+        span_days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days
+        return window_key(self.portfolio_weights, [self.advisory_fee, 0.0], self.expense_ratios, span_days)
+
+    def _rolled_summary(self, start_date, end_date, deadline=None):
+        """Summary of the kept window for this portfolio moved to [start_date, end_date), or None.
+
+        Windows are kept per length, so a kept window is only moved forward,
+        by as many days as its end, and only the bars since its last price
+        are loaded. None if there is no such window or the stored prices
+        were re-adjusted since it was built.
+        """
+        window = recall_window(self._window_key(start_date, end_date))
+        if window is None or pd.Timestamp(start_date) < window.start_date or \
+                pd.Timestamp(end_date) <= window.last_date:
+            return None
+        new_prices = run_until(lambda: get_price_data(list(self.portfolio_dollars.keys()),
+                                                      window.last_date.strftime('%Y-%m-%d'), end_date,
+                                                      align_start=False), deadline)
+        # History may have been re-adjusted since the window was built (None)
+        return window.advance_and_summarize(new_prices, start_date)
+
     def project_future_returns(self, years=10):
         """Project future portfolio returns."""
         return project_portfolio_returns(self.asset_class_allocation, growth_rates, years)
@@ -123,23 +161,42 @@ class Portfolio:
         total_fee_rate = self.weighted_avg_er + self.advisory_fee
         return project_portfolio_with_fees(self.asset_class_allocation, growth_rates, total_fee_rate, years)
     
-    def calculate_forward_metrics(self, risk_free_rate=0.02):
-        """Calculate estimated forward volatility and Sharpe ratio."""
+    def simulate_future_with_fees(self, years=10, n_paths=MONTE_CARLO_PATHS, seed=None):
+        """Monte Carlo projection after fees with correlated asset-class returns."""
+        total_fee_rate = self.weighted_avg_er + self.advisory_fee
+        return project_portfolio_monte_carlo(self.asset_class_allocation, growth_rates, asset_volatility,
+                                             asset_correlations, total_fee_rate, years, n_paths, seed)
+    
+    def calculate_forward_metrics(self, risk_free_rate=0.02, deadline=None):
+        """Calculate estimated forward volatility and Sharpe ratio.
+
+        If the holdings' covariance cannot be estimated (too little history,
+        or its prices not loaded by the deadline), the asset-class
+        assumptions are used and 'volatility_source' says so.
+        """
         # Calculate weighted expected return
         expected_return = sum(
             self.asset_class_allocation.get(asset_class, 0) * growth_rate
             for asset_class, growth_rate in growth_rates.items()
         )
         
-        # Calculate portfolio volatility using asset class volatilities
-        portfolio_variance = 0
-        for asset_class, weight in self.asset_class_allocation.items():
-            volatility = asset_volatility.get(asset_class, 0)
-            portfolio_variance += (weight ** 2) * (volatility ** 2)
-        
-        # For simplicity, we're not considering correlations between asset classes
-        # In practice, you'd want to include a correlation matrix
-        portfolio_volatility = portfolio_variance ** 0.5
+        # Portfolio volatility from the estimated covariance of the holdings
+        # (w'Σw), or from the asset-class assumptions without enough history
+        tickers = list(self.portfolio_weights)
+        try:
+            covariance = covariance_matrix(tickers, deadline=deadline)
+        except Exception as e:
+            print(f"Could not estimate covariance for {tickers}: {e}")
+            covariance = None
+        if covariance is not None:
+            weights = [self.portfolio_weights[ticker] for ticker in tickers]
+            volatility_source = COVARIANCE_METHOD
+        else:
+            asset_classes = list(self.asset_class_allocation)
+            covariance = asset_class_covariance(asset_classes, asset_volatility, asset_correlations)
+            weights = [self.asset_class_allocation[asset_class] for asset_class in asset_classes]
+            volatility_source = 'asset_class'
+        portfolio_volatility = float(np.sqrt(max(portfolio_variance(weights, covariance), 0.0)))
         
         # Calculate Sharpe ratio
         excess_return = expected_return - risk_free_rate
@@ -148,7 +205,8 @@ class Portfolio:
         return {
             'expected_return': expected_return,
             'portfolio_volatility': portfolio_volatility,
-            'sharpe_ratio': sharpe_ratio
+            'sharpe_ratio': sharpe_ratio,
+            'volatility_source': volatility_source
         }
     
     def get_portfolio_summary(self):
@@ -181,7 +239,13 @@ class Portfolio:
     
     def get_detailed_holdings(self):
         """Get detailed information about portfolio holdings."""
-        details = get_investment_details(list(self.portfolio_dollars.keys()))
+        try:
+            details = get_investment_details(list(self.portfolio_dollars.keys()))
+        except ProviderUnavailable as e:
+            # Show the holdings without provider details rather than guessing them
+            print(f"Could not fetch investment details: {e}")
+            details = {ticker: {'yield': float('nan'), 'category': 'N/A', 'name': ticker}
+                       for ticker in self.portfolio_dollars}
         
         holdings_info = []
         for ticker in self.portfolio_weights.keys():
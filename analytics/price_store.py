@@ -0,0 +1,290 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+import pandas as pd
+from datetime import datetime, timedelta
+from .providers import get_provider
+
+try:
+    import fcntl
+except ImportError:  # Windows: manifest updates are only serialized within a process
+    fcntl = None
+
+# Default on-disk location for the local price store
+DEFAULT_STORE_DIR = os.environ.get(
+    "PRICE_STORE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "portfolio-analysis", "prices")
+)
+
+# Relative tolerance before a stored history is treated as re-adjusted by Yahoo
+ADJUSTMENT_TOLERANCE = 1e-6
+
+# A window that came back empty or failed is not requested again for this long
+FAILED_RETRY_SECONDS = float(os.environ.get("PRICE_STORE_RETRY_SECONDS", 900))
+
+
+class PriceStore:
+    """On-disk store of daily adjusted close prices, one Parquet file per ticker.
+
+    A manifest records, per ticker, the earliest start date that has been
+    downloaded and the (exclusive) end date the history has been checked
+    through, so later requests only fetch the bars that are missing. It
+    also indexes each ticker's first available date, which is filled in
+    as a side effect of the downloads. Windows that came back empty are
+    remembered for failed_retry_seconds so they are not requested on
+    every call.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, failed_retry_seconds=FAILED_RETRY_SECONDS):
+        self.root = root
+        self.failed_retry_seconds = failed_retry_seconds
+        self._lock = threading.RLock()
+        self._manifest = None
+        self._failed = {}  # (ticker, start, end) -> time of the empty download
+
+    # -- file layout -----------------------------------------------------
+
+    def _ticker_path(self, ticker):
+        safe = ticker.replace('/', '_').replace('\\', '_')
+        return os.path.join(self.root, f"{safe}.parquet")
+
+    def _manifest_path(self):
+        return os.path.join(self.root, "manifest.json")
+
+    def _read_manifest(self):
+        try:
+            with open(self._manifest_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _load_manifest(self):
+        if self._manifest is None:
+            self._manifest = self._read_manifest()
+        return self._manifest
+
+    @contextmanager
+    def _manifest_locked(self):
+        """Hold an exclusive lock on the manifest across processes sharing the store."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, "manifest.lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Closing the file releases the lock
+            yield
+
+    def _save_manifest(self, changes=None):
+        """Write the changed entries to the manifest file.
+
+        Several server processes share the store, so the file is re-read
+        under the lock and only these entries are replaced, keeping what
+        other processes have added. changes=None empties the manifest.
+        """
+        with self._manifest_locked():
+            self._store_manifest(changes)
+
+    def _store_manifest(self, changes):
+        """_save_manifest for callers already holding _manifest_locked()."""
+        manifest = {} if changes is None else self._read_manifest()
+        manifest.update(changes or {})
+        tmp_path = f"{self._manifest_path()}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self._manifest_path())
+        self._manifest = manifest
+
+    def read(self, ticker):
+        """Return the stored close series for a ticker, or None if not stored."""
+        path = self._ticker_path(ticker)
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_parquet(path)['Close'].rename(ticker)
+        except Exception as e:
+            print(f"Could not read stored prices for {ticker}: {e}")
+            return None
+
+    def _write(self, ticker, series):
+        os.makedirs(self.root, exist_ok=True)
+        path = self._ticker_path(ticker)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        series.rename('Close').to_frame().to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+
+    # -- incremental sync ------------------------------------------------
+
+    def _missing_range(self, ticker, start, end):
+        """Work out which (start, end) window still has to be downloaded for a ticker."""
+        entry = self._load_manifest().get(ticker)
+        if entry is None or not os.path.exists(self._ticker_path(ticker)):
+            return start, end
+        if start < entry['start']:
+            # Requested further back than ever stored: refetch the whole window
+            return start, max(end, entry['end'])
+        if end <= entry['end']:
+            return None
+        # Start a couple of bars early so the overlap reveals any dividend
+        # re-adjustment and replaces a possibly partial last bar
+        stored = self.read(ticker)
+        fetch_from = stored.index[-2:][0].strftime('%Y-%m-%d') if not stored.empty else entry['start']
+        return fetch_from, end
+
+    def _merge(self, ticker, start, end, new_prices):
+        """Merge freshly downloaded bars into the stored history for a ticker.
+
+        Returns the ticker's new manifest entry, or None if nothing was stored.
+        """
+        entry = self._load_manifest().get(ticker)
+        stored = self.read(ticker) if entry else None
+        new_prices = new_prices.dropna()
+        if new_prices.empty:
+            # yf.download reports a failed ticker as an all-NaN column; keep
+            # the stored history and manifest so the window is retried later
+            return None
+
+        if stored is None or stored.empty:
+            merged = new_prices
+            covered_from = start
+        else:
+            overlap = stored.index.intersection(new_prices.index)
+            if len(overlap) > 0:
+                ratio = new_prices[overlap[0]] / stored[overlap[0]]
+                if abs(ratio - 1) > ADJUSTMENT_TOLERANCE:
+                    # Adjusted closes are rescaled after dividends and splits,
+                    # so bring the stored history onto the new basis
+                    stored = stored * ratio
+            # Backfilled bars extend the stored history rather than replace it
+            merged = pd.concat([stored[~stored.index.isin(new_prices.index)], new_prices]).sort_index()
+            covered_from = min(start, entry['start'])
+
+        self._write(ticker, merged)
+        return {
+            'start': covered_from,
+            'end': max(end, entry['end']) if entry else end,
+            # First bar on or after 'start'; the ticker's inception if it listed later
+            'inception': merged.index[0].strftime('%Y-%m-%d') if not merged.empty else None
+        }
+
+    def _recently_failed(self, ticker, window):
+        failed_at = self._failed.get((ticker,) + window)
+        return failed_at is not None and time.time() - failed_at < self.failed_retry_seconds
+
+    def _still_mergeable(self, ticker, start, end):
+        """Whether bars downloaded for (start, end) still join the ticker's stored history.
+
+        Another process may have stored a window for the ticker while this
+        one was downloading; merging a window that neither overlaps nor
+        touches it would leave a gap the manifest claims is covered.
+        """
+        entry = self._load_manifest().get(ticker)
+        if entry is None or not os.path.exists(self._ticker_path(ticker)):
+            return True
+        return start <= entry['end'] and end >= entry['start']
+
+    def sync(self, tickers, start, end):
+        """Download whatever bars are missing for the tickers and persist them.
+
+        Downloads run without any lock, so callers whose bars are already
+        stored are not held up by another caller's download. Merging is
+        done under the cross-process manifest lock, from re-reading the
+        manifest through writing the price files and the manifest, so
+        processes sharing the store never overwrite each other's bars.
+        """
+        with self._lock:
+            # Pick up bars other processes have stored since the manifest was read
+            self._manifest = None
+            now = time.time()
+            self._failed = {key: failed_at for key, failed_at in self._failed.items()
+                            if now - failed_at < self.failed_retry_seconds}
+            # Group tickers needing the same window into a single bulk download
+            windows = {}
+            for ticker in tickers:
+                window = self._missing_range(ticker, start, end)
+                if window is not None and not self._recently_failed(ticker, window):
+                    windows.setdefault(window, []).append(ticker)
+
+        for (fetch_start, fetch_end), group in windows.items():
+            prices = get_provider().get_price_history(group, fetch_start, fetch_end)
+            with self._lock, self._manifest_locked():
+                # Merge against what other processes stored meanwhile
+                self._manifest = self._read_manifest()
+                changes = {}
+                for ticker in group:
+                    if not self._still_mergeable(ticker, fetch_start, fetch_end):
+                        # Left for the next sync to fetch against the new entry
+                        continue
+                    series = prices[ticker] if ticker in prices.columns else pd.Series(dtype=float)
+                    # Nothing came back (market closed, or yf.download failed
+                    # the ticker); the manifest is left alone and the window
+                    # is retried once failed_retry_seconds have passed
+                    entry = self._merge(ticker, fetch_start, fetch_end, series)
+                    if entry is None:
+                        if self.read(ticker) is None:
+                            print(f"No price data returned for {ticker}")
+                        self._failed[(ticker, fetch_start, fetch_end)] = time.time()
+                    else:
+                        self._failed.pop((ticker, fetch_start, fetch_end), None)
+                        changes[ticker] = entry
+                if changes:
+                    self._store_manifest(changes)
+
+    def inception_dates(self, tickers):
+        """Return the first stored bar date for each ticker from the manifest index.
+
+        Tickers that have never been downloaded are omitted.
+        """
+        with self._lock:
+            manifest = self._load_manifest()
+            dates = {}
+            backfilled = {}
+            for ticker in tickers:
+                entry = manifest.get(ticker)
+                if entry is None:
+                    continue
+                if entry.get('inception') is None:
+                    # Entries written before the index existed: derive it once
+                    series = self.read(ticker)
+                    if series is None or series.dropna().empty:
+                        continue
+                    entry['inception'] = series.dropna().index[0].strftime('%Y-%m-%d')
+                    backfilled[ticker] = entry
+                dates[ticker] = entry['inception']
+            if backfilled:
+                self._save_manifest(backfilled)
+            return dates
+
+    def get_prices(self, tickers, start, end):
+        """Return adjusted close prices for tickers between start and end (exclusive).
+
+        Only bars after the last stored date (or before the first stored
+        date) are downloaded; everything else is served from disk.
+        """
+        self.sync(tickers, start, end)
+
+        columns = {}
+        for ticker in tickers:
+            series = self.read(ticker)
+            columns[ticker] = series if series is not None else pd.Series(dtype=float, index=pd.DatetimeIndex([]))
+
+        prices = pd.DataFrame(columns).reindex(columns=list(tickers))
+        if prices.empty:
+            return prices
+        end_exclusive = datetime.strptime(end, '%Y-%m-%d') - timedelta(microseconds=1)
+        return prices.loc[start:end_exclusive].dropna(how='all')
+
+    def clear(self):
+        """Delete every stored price file."""
+        with self._lock:
+            self._manifest = None
+            self._failed = {}
+            for ticker in list(self._load_manifest()):
+                try:
+                    os.remove(self._ticker_path(ticker))
+                except OSError:
+                    pass
+            self._save_manifest(None)
+
+
+price_store = PriceStore()
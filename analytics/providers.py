@@ -0,0 +1,275 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import yfinance as yf
+from .throttle import governor, is_transient_error
+
+# Which market-data backend to use: "yfinance" (default), "record" or "replay"
+MARKET_DATA_PROVIDER = os.environ.get("MARKET_DATA_PROVIDER", "yfinance").lower()
+MARKET_DATA_FIXTURES = os.environ.get(
+    "MARKET_DATA_FIXTURES",
+    os.path.join(os.path.expanduser("~"), ".cache", "portfolio-analysis", "fixtures")
+)
+
+# Upper bound on concurrent calls into each market-data provider
+PROVIDER_CONCURRENCY = int(os.environ.get("PROVIDER_CONCURRENCY", 8))
+PROVIDER_THREAD_PREFIX = "provider-"
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def extract_close(data, tickers):
+    """Pull adjusted close prices out of a yf.download frame as one column per ticker."""
+    if data is None or data.empty:
+        return pd.DataFrame(columns=list(tickers), dtype=float)
+
+    if isinstance(data.columns, pd.MultiIndex):
+        level = 'Close' if 'Close' in data.columns.get_level_values(0) else 'Adj Close'
+        prices = data[level]
+    elif 'Close' in data.columns:
+        # Older yfinance returns flat columns for a single ticker
+        prices = data[['Close']].rename(columns={'Close': tickers[0]})
+    else:
+        prices = data
+
+    if isinstance(prices, pd.Series):
+        prices = prices.to_frame(tickers[0])
+
+    prices = prices.reindex(columns=list(tickers))
+    prices.index = pd.DatetimeIndex(prices.index).tz_localize(None)
+    return prices.sort_index()
+
+
+def _confirm_failed(prices, tickers, **history_args):
+    """Re-request, one at a time, the tickers a yf.download frame has no prices for.
+
+    yf.download does not raise for failed tickers; it returns them as
+    missing or all-NaN columns and keeps the reasons in a process-wide dict
+    that every concurrent download resets. So the failures are read from
+    the frame and confirmed with Ticker.history(raise_errors=True), whose
+    errors belong to this call alone. Throttling and connection errors are
+    raised for the governor to retry; any other error (unknown symbol, no
+    bars in the window) leaves the ticker NaN. Returns the completed frame.
+    """
+    for ticker in tickers:
+        if ticker in prices.columns and prices[ticker].notna().any():
+            continue
+        try:
+            history = yf.Ticker(ticker).history(auto_adjust=True, raise_errors=True, **history_args)
+        except Exception as e:
+            if is_transient_error(e):
+                raise
+            continue
+        closes = extract_close(history, [ticker])[ticker].dropna()
+        if not closes.empty:
+            prices = prices.reindex(prices.index.union(closes.index))
+            prices[ticker] = closes
+    return prices
+
+
+class MarketDataProvider:
+    """Source of price history, latest prices and ticker metadata."""
+
+    name = "base"
+
+    def get_price_history(self, tickers, start, end):
+        """Return daily adjusted closes between start and end (exclusive), one column per ticker."""
+        raise NotImplementedError
+
+    def get_latest_prices(self, tickers):
+        """Return {ticker: latest close}."""
+        raise NotImplementedError
+
+    def get_ticker_info(self, ticker):
+        """Return the metadata dict for a ticker; raises if it cannot be fetched."""
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Live market data from Yahoo Finance."""
+
+    name = "yfinance"
+
+    def get_price_history(self, tickers, start, end):
+        data = yf.download(list(tickers), start=start, end=end, auto_adjust=True,
+                           prepost=True, threads=True, progress=False)
+        prices = extract_close(data, list(tickers))
+        return _confirm_failed(prices, tickers, start=start, end=end, prepost=True)
+
+    def get_latest_prices(self, tickers):
+        data = yf.download(list(tickers), period="1d", interval="1d", auto_adjust=True,
+                           prepost=True, threads=True, progress=False)
+        closes = _confirm_failed(extract_close(data, list(tickers)), tickers, period="1d", interval="1d", prepost=True)
+        # Tickers without a close (e.g. unknown symbols) are NaN
+        return {ticker: closes[ticker].dropna().iloc[-1] if closes[ticker].notna().any() else float('nan')
+                for ticker in tickers}
+
+    def get_ticker_info(self, ticker):
+        return yf.Ticker(ticker).info
+
+
+class GovernedProvider(MarketDataProvider):
+    """Wrap a provider so every call goes through the shared rate limiter and retry governor."""
+
+    def __init__(self, provider, governor=governor):
+        self.provider = provider
+        self.governor = governor
+        self.name = provider.name
+
+    def get_price_history(self, tickers, start, end):
+        return self.governor.call(self.provider.get_price_history, tickers, start, end)
+
+    def get_latest_prices(self, tickers):
+        return self.governor.call(self.provider.get_latest_prices, tickers)
+
+    def get_ticker_info(self, ticker):
+        return self.governor.call(self.provider.get_ticker_info, ticker)
+
+
+class ReplayProvider(MarketDataProvider):
+    """Serve market data recorded on disk, optionally recording from an upstream provider.
+
+    With an upstream provider every response is written under the fixture
+    directory (record mode); without one, only recorded data is served and
+    anything missing raises LookupError (replay mode). Price history is
+    recorded per ticker and merged, so any date window inside the recorded
+    range can be replayed regardless of how it was originally requested.
+    Failed metadata lookups are recorded too and replay as the same error.
+    """
+
+    name = "replay"
+
+    def __init__(self, directory=MARKET_DATA_FIXTURES, upstream=None):
+        self.directory = directory
+        self.upstream = upstream
+        self._lock = threading.Lock()
+
+    def _path(self, kind, ticker, extension):
+        safe = ticker.replace('/', '_').replace('\\', '_')
+        return os.path.join(self.directory, kind, f"{safe}.{extension}")
+
+    def _write_json(self, path, payload):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f, default=str, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def _read_json(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _read_prices(self, ticker):
+        path = self._path("prices", ticker, "parquet")
+        if not os.path.exists(path):
+            return None
+        return pd.read_parquet(path)['Close']
+
+    def _record_prices(self, prices):
+        with self._lock:
+            for ticker in prices.columns:
+                series = prices[ticker].dropna()
+                recorded = self._read_prices(ticker)
+                if recorded is not None:
+                    series = pd.concat([recorded[~recorded.index.isin(series.index)], series]).sort_index()
+                path = self._path("prices", ticker, "parquet")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                series.rename('Close').to_frame().to_parquet(path + ".tmp")
+                os.replace(path + ".tmp", path)
+
+    def get_price_history(self, tickers, start, end):
+        if self.upstream is not None:
+            prices = self.upstream.get_price_history(tickers, start, end)
+            self._record_prices(prices)
+            return prices
+
+        columns = {}
+        for ticker in tickers:
+            recorded = self._read_prices(ticker)
+            if recorded is None:
+                raise LookupError(f"No recorded price history for {ticker}")
+            columns[ticker] = recorded
+        prices = pd.DataFrame(columns).reindex(columns=list(tickers))
+        end_exclusive = pd.Timestamp(end) - pd.Timedelta(microseconds=1)
+        return prices.loc[start:end_exclusive].dropna(how='all')
+
+    def get_latest_prices(self, tickers):
+        if self.upstream is not None:
+            prices = self.upstream.get_latest_prices(tickers)
+            for ticker, price in prices.items():
+                self._write_json(self._path("latest", ticker, "json"), {'price': float(price)})
+            return prices
+
+        prices = {}
+        for ticker in tickers:
+            recorded = self._read_json(self._path("latest", ticker, "json"))
+            if recorded is None:
+                raise LookupError(f"No recorded latest price for {ticker}")
+            prices[ticker] = recorded['price']
+        return prices
+
+    def get_ticker_info(self, ticker):
+        path = self._path("info", ticker, "json")
+        if self.upstream is not None:
+            try:
+                info = self.upstream.get_ticker_info(ticker)
+            except Exception as e:
+                self._write_json(path, {'__error__': str(e)})
+                raise
+            self._write_json(path, info)
+            return info
+
+        recorded = self._read_json(path)
+        if recorded is None:
+            raise LookupError(f"No recorded info for {ticker}")
+        if '__error__' in recorded:
+            raise LookupError(recorded['__error__'])
+        return recorded
+
+
+def _default_provider():
+    if MARKET_DATA_PROVIDER == "replay":
+        return ReplayProvider(MARKET_DATA_FIXTURES)
+    if MARKET_DATA_PROVIDER == "record":
+        return ReplayProvider(MARKET_DATA_FIXTURES, upstream=GovernedProvider(YFinanceProvider()))
+    return GovernedProvider(YFinanceProvider())
+
+
+_provider = _default_provider()
+
+
+def get_provider():
+    """Return the market-data provider used by the data layer."""
+    return _provider
+
+
+def set_provider(provider):
+    """Swap the market-data provider, e.g. for a ReplayProvider in benchmarks."""
+    global _provider
+    _provider = provider
+
+
+def provider_executor(provider):
+    """Return the shared, bounded thread pool used for blocking calls into a provider."""
+    with _executors_lock:
+        executor = _executors.get(provider.name)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=PROVIDER_CONCURRENCY,
+                                          thread_name_prefix=f"{PROVIDER_THREAD_PREFIX}{provider.name}")
+            _executors[provider.name] = executor
+        return executor
+
+
+def in_provider_executor():
+    """Whether the current thread is one of the provider pool's workers.
+
+    Work submitted from a pool worker to its own pool and waited on could
+    deadlock once every worker waits, so such callers run it inline.
+    """
+    return threading.current_thread().name.startswith(PROVIDER_THREAD_PREFIX)
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+
+def merge_segments(left, right):
+    """Combine (max level, min level, drawdown) summaries of two adjacent ranges, left first."""
+    left_max, left_min, left_dd = left
+    right_max, right_min, right_dd = right
+    return (np.maximum(left_max, right_max), np.minimum(left_min, right_min),
+            np.minimum(np.minimum(left_dd, right_dd), right_min - left_max))
+
+
+class ReturnsIndex:
+    """Precomputed index over a daily return series for fast statistics on any date window.
+
+    Prefix sums of log growth, returns and squared returns answer total
+    return, annualized return, volatility and Sharpe ratio for a window in
+    constant time. A segment tree over the log value path answers the
+    window's maximum drawdown in O(log n).
+    """
+
+    def __init__(self, returns):
+        returns = returns.dropna()
+        self.dates = pd.DatetimeIndex(returns.index)
+        values = returns.to_numpy(dtype=float)
+
+        # Element i covers the first i returns
+        self._log_level = np.concatenate([[0.0], np.cumsum(np.log1p(values))])
+        self._sum = np.concatenate([[0.0], np.cumsum(values)])
+        self._sum_sq = np.concatenate([[0.0], np.cumsum(values ** 2)])
+
+        # Bottom-up segment tree over the log levels; empty leaves are neutral
+        size = 1
+        while size < len(self._log_level):
+            size *= 2
+        self._size = size
+        self._max = np.full(2 * size, -np.inf)
+        self._min = np.full(2 * size, np.inf)
+        self._dd = np.zeros(2 * size)
+        self._max[size:size + len(self._log_level)] = self._log_level
+        self._min[size:size + len(self._log_level)] = self._log_level
+        node = size // 2
+        while node >= 1:
+            nodes = np.arange(node, 2 * node)
+            self._max[nodes], self._min[nodes], self._dd[nodes] = merge_segments(
+                (self._max[2 * nodes], self._min[2 * nodes], self._dd[2 * nodes]),
+                (self._max[2 * nodes + 1], self._min[2 * nodes + 1], self._dd[2 * nodes + 1])
+            )
+            node //= 2
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _positions(self, start_date=None, end_date=None):
+        """Positions [first, last] of the returns dated within [start_date, end_date]."""
+        first = 0 if start_date is None else self.dates.searchsorted(pd.Timestamp(start_date), side='left')
+        last = len(self.dates) - 1 if end_date is None else \
+            self.dates.searchsorted(pd.Timestamp(end_date), side='right') - 1
+        if first > last:
+            raise ValueError(f"No returns between {start_date} and {end_date}")
+        return first, last
+
+    def _drawdown(self, lo, hi):
+        """Most negative log drawdown among levels lo..hi inclusive."""
+        left = (-np.inf, np.inf, 0.0)
+        right = (-np.inf, np.inf, 0.0)
+        lo += self._size
+        hi += self._size + 1
+        while lo < hi:
+            if lo & 1:
+                left = merge_segments(left, (self._max[lo], self._min[lo], self._dd[lo]))
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                right = merge_segments((self._max[hi], self._min[hi], self._dd[hi]), right)
+            lo //= 2
+            hi //= 2
+        return merge_segments(left, right)[2]
+
+    def stats(self, start_date=None, end_date=None, risk_free=0.02):
+        """performance_stats for the returns dated within [start_date, end_date]."""
+        first, last = self._positions(start_date, end_date)
+        days = last - first + 1
+
+        total_return = np.expm1(self._log_level[last + 1] - self._log_level[first])
+        annualized_return = (1 + total_return) ** (252 / days) - 1
+
+        total = self._sum[last + 1] - self._sum[first]
+        total_sq = self._sum_sq[last + 1] - self._sum_sq[first]
+        variance = (total_sq - total * total / days) / (days - 1) if days > 1 else np.nan
+        volatility = np.sqrt(max(variance, 0.0)) * np.sqrt(252)
+        sharpe = (annualized_return - risk_free) / volatility if volatility > 0 else np.nan
+
+        # Like performance_stats, the path starts at the value after the first return
+        max_dd = np.expm1(self._drawdown(first + 1, last + 1))
+
+        return {
+            "Total Return": total_return,
+            "Annualized Return": annualized_return,
+            "Volatility": volatility,
+            "Sharpe Ratio": sharpe,
+            "Max Drawdown": max_dd
+        }
+
+    def cumulative(self, start_date=None, end_date=None):
+        """Growth of $1 over the window, as performance_stats returns it."""
+        first, last = self._positions(start_date, end_date)
+        levels = np.exp(self._log_level[first + 1:last + 2] - self._log_level[first])
+        return pd.Series(levels, index=self.dates[first:last + 1])
@@ -0,0 +1,240 @@
+import os
+import numpy as np
+import pandas as pd
+from .data import get_price_data
+from .fetch import run_until
+
+# Rolling windows in trading days (about 3, 6 and 12 months)
+ROLLING_WINDOWS = (63, 126, 252)
+
+# Ticker the rolling beta is measured against
+ROLLING_BENCHMARK = os.environ.get("ROLLING_BENCHMARK", "VOO")
+
+
+def benchmark_returns(start_date, end_date, ticker=ROLLING_BENCHMARK, deadline=None):
+    """Daily returns of the benchmark ticker, for rolling beta.
+
+    Raises DeadlineExceeded if the prices are not loaded by the deadline.
+    """
+    prices = run_until(lambda: get_price_data([ticker], start_date, end_date), deadline)
+    return prices[ticker].pct_change().dropna()
+
+
+def _rolling_moments(x, windows, y=None):
+    """Sliding-window moments of every column of x for several windows in one pass.
+
+    x is a (days x series) array and y an optional (days,) benchmark. Each
+    day adds the new return to every window and drops the one leaving it
+    (Welford updates), so the cost is O(days x windows x series) whatever
+    the window length. Returns (windows x days x series) arrays: count of
+    complete windows (NaN-free), mean, sum of squared deviations, sum of
+    log growth and, with y, the co-moment with y and y's squared deviations.
+    """
+    n, m = x.shape
+    widths = np.asarray(windows)[:, None]
+    k = len(widths)
+
+    gaps = np.isnan(x)
+    if y is not None:
+        gaps = gaps | np.isnan(y)[:, None]
+        y = np.where(np.isnan(y), 0.0, y)
+    x = np.where(np.isnan(x), 0.0, x)
+    log_x = np.log1p(x)
+    gaps = gaps.astype(int)
+
+    mean = np.zeros((k, m))
+    m2 = np.zeros((k, m))
+    log_sum = np.zeros((k, m))
+    missing = np.zeros((k, m), dtype=int)
+    mean_y = np.zeros((k, 1))
+    m2_y = np.zeros((k, 1))
+    co = np.zeros((k, m))
+
+    out = {key: np.empty((k, n, m)) for key in ('complete', 'mean', 'm2', 'log_sum')}
+    if y is not None:
+        out['co'] = np.empty((k, n, m))
+        out['m2_y'] = np.empty((k, n, 1))
+
+    for t in range(n):
+        # Add day t to every window
+        size = np.minimum(t, widths) + 1
+        delta = x[t] - mean
+        mean = mean + delta / size
+        m2 = m2 + delta * (x[t] - mean)
+        log_sum = log_sum + log_x[t]
+        missing = missing + gaps[t]
+        if y is not None:
+            delta_y = y[t] - mean_y
+            mean_y = mean_y + delta_y / size
+            m2_y = m2_y + delta_y * (y[t] - mean_y)
+            co = co + delta * (y[t] - mean_y)
+
+        # Drop day t - width from the windows that are already full
+        full = t >= widths
+        if full.any():
+            old = np.maximum(t - widths[:, 0], 0)
+            x_old = x[old]
+            kept_mean = mean - (x_old - mean) / widths
+            m2 = np.where(full, m2 - (x_old - kept_mean) * (x_old - mean), m2)
+            log_sum = np.where(full, log_sum - log_x[old], log_sum)
+            missing = np.where(full, missing - gaps[old], missing)
+            if y is not None:
+                y_old = y[old][:, None]
+                kept_mean_y = mean_y - (y_old - mean_y) / widths
+                co = np.where(full, co - (x_old - kept_mean) * (y_old - mean_y), co)
+                m2_y = np.where(full, m2_y - (y_old - kept_mean_y) * (y_old - mean_y), m2_y)
+                mean_y = np.where(full, kept_mean_y, mean_y)
+            mean = np.where(full, kept_mean, mean)
+
+        out['complete'][:, t] = (t + 1 >= widths) & (missing == 0)
+        out['mean'][:, t] = mean
+        out['m2'][:, t] = m2
+        out['log_sum'][:, t] = log_sum
+        if y is not None:
+            out['co'][:, t] = co
+            out['m2_y'][:, t] = m2_y
+    return out
+
+
+def rolling_max(values, window):
+    """Maximum of each column over the trailing `window` rows (van Herk/Gil-Werman, O(n)).
+
+    Rows are split into blocks of `window`; a full window is covered by the
+    tail of one block and the head of the next, so its maximum is the larger
+    of a suffix maximum and a prefix maximum. Rows before the first full
+    window use the rows available so far.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    blocks = -(-n // window)
+    padded = np.full((blocks * window,) + values.shape[1:], -np.inf)
+    padded[:n] = values
+    shaped = padded.reshape((blocks, window) + values.shape[1:])
+    prefix = np.maximum.accumulate(shaped, axis=1).reshape(padded.shape)[:n]
+    suffix = np.maximum.accumulate(shaped[:, ::-1], axis=1)[:, ::-1].reshape(padded.shape)
+
+    start = np.arange(n) - window + 1
+    window_max = np.maximum(suffix[np.maximum(start, 0)], prefix)
+    # Rows before the first full window lie in block 0, where the prefix alone is the answer
+    window_max[:window - 1] = prefix[:window - 1]
+    return window_max
+
+
+def _frame(returns):
+    if isinstance(returns, pd.Series):
+        return returns.to_frame()
+    return returns
+
+
+def rolling_risk(returns, windows=ROLLING_WINDOWS, benchmark=None, risk_free=0.02):
+    """Rolling volatility, Sharpe ratio and (with a benchmark) beta for many return series.
+
+    returns is a daily return Series or a (days x series) DataFrame;
+    benchmark is an optional daily return Series. All windows and series
+    are computed together in one pass. Volatility and Sharpe ratio follow
+    performance_stats over each trailing window. Returns a DataFrame with
+    (statistic, window, series) columns, e.g. result['Volatility'][252];
+    windows that are incomplete or contain gaps are NaN.
+    """
+    frame = _frame(returns)
+    windows = tuple(windows)
+    bench = None
+    if benchmark is not None:
+        bench = benchmark.reindex(frame.index).to_numpy(dtype=float)
+    moments = _rolling_moments(frame.to_numpy(dtype=float), windows, bench)
+
+    widths = np.asarray(windows)[:, None, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volatility = np.sqrt(np.maximum(moments['m2'], 0.0) / (widths - 1)) * np.sqrt(252)
+        annualized_return = np.expm1(moments['log_sum'] * 252 / widths)
+        stats = {
+            'Volatility': volatility,
+            'Sharpe Ratio': np.where(volatility > 0, (annualized_return - risk_free) / volatility, np.nan)
+        }
+        if bench is not None:
+            stats['Beta'] = moments['co'] / moments['m2_y']
+
+    complete = moments['complete'].astype(bool)
+    columns = {}
+    for stat, values in stats.items():
+        for i, window in enumerate(windows):
+            for j, name in enumerate(frame.columns):
+                columns[(stat, window, name)] = np.where(complete[i, :, j], values[i, :, j], np.nan)
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def _log_path(frame):
+    """Log value path of each column, starting from 0 before the first return; gaps are -inf."""
+    values = frame.to_numpy(dtype=float)
+    gaps = np.isnan(values)
+    log_level = np.cumsum(np.log1p(np.where(gaps, 0.0, values)), axis=0)
+    start = np.zeros((1, values.shape[1]))
+    return np.concatenate([start, np.where(gaps, -np.inf, log_level)]), gaps
+
+
+def _like(values, returns, frame):
+    result = pd.DataFrame(values, index=frame.index, columns=frame.columns)
+    return result.iloc[:, 0] if isinstance(returns, pd.Series) else result
+
+
+def drawdowns(returns):
+    """Drawdown depth and duration series for one or many return series.
+
+    Depth is the value relative to its running peak (a non-positive
+    fraction, as in performance_stats' Max Drawdown); duration counts the
+    trading days since that peak. Returns (depth, duration) shaped like
+    returns, NaN where a series has no return.
+    """
+    frame = _frame(returns)
+    path, gaps = _log_path(frame)
+    peak = np.maximum.accumulate(path, axis=0)
+    rows = np.arange(len(path))[:, None]
+    last_peak = np.maximum.accumulate(np.where(path >= peak, rows, 0), axis=0)
+
+    depth = np.where(gaps, np.nan, np.expm1(path - peak)[1:])
+    duration = np.where(gaps, np.nan, (rows - last_peak)[1:])
+    return _like(depth, returns, frame), _like(duration, returns, frame)
+
+
+def rolling_drawdown(returns, window=252):
+    """Value relative to its highest point over the trailing `window` days, for one or many series."""
+    frame = _frame(returns)
+    path, gaps = _log_path(frame)
+    # window returns span window + 1 values
+    with np.errstate(invalid='ignore'):
+        depth = np.expm1(path - rolling_max(path, window + 1))[1:]
+    return _like(np.where(gaps, np.nan, depth), returns, frame)
+
+
+def drawdown_episodes(returns):
+    """Every drawdown of a return series with its depth, length and recovery time.
+
+    Returns a DataFrame with one row per drawdown, deepest first: the date
+    of the peak, trough and recovery (NaT if not yet recovered), Depth,
+    Duration (trading days from peak to recovery, or to the last day) and
+    Recovery Days (from trough to recovery).
+    """
+    returns = returns.dropna()
+    depth, _ = drawdowns(returns)
+    values = depth.to_numpy()
+    dates = returns.index
+    # An episode is a run of days below the peak
+    under = values < 0
+    edges = np.diff(np.concatenate([[0], under.astype(int), [0]]))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    rows = []
+    for first, end in zip(starts, ends):
+        trough = first + values[first:end].argmin()
+        recovered = end < len(values)
+        rows.append({
+            'Peak': dates[first - 1] if first > 0 else pd.NaT,
+            'Trough': dates[trough],
+            'Recovery': dates[end] if recovered else pd.NaT,
+            'Depth': values[trough],
+            'Duration': (end if recovered else len(values) - 1) - first + 1,
+            'Recovery Days': end - trough if recovered else np.nan
+        })
+    columns = ['Peak', 'Trough', 'Recovery', 'Depth', 'Duration', 'Recovery Days']
+    return pd.DataFrame(rows, columns=columns).sort_values('Depth', ignore_index=True)
@@ -0,0 +1,205 @@
+import csv
+import os
+import sqlite3
+import sys
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+# Local reference data consulted before any provider lookup
+SECURITY_MASTER_PATH = os.environ.get(
+    "SECURITY_MASTER_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "portfolio-analysis", "security_master.sqlite3")
+)
+
+# Expense ratio and yield are kept in the provider's units (percent), so a
+# record can stand in for the provider's info payload unchanged
+Security = namedtuple('Security', [
+    'symbol', 'name', 'quote_type', 'category', 'asset_class', 'expense_ratio', 'dividend_yield', 'updated'
+])
+
+
+def security_from_info(ticker, info, asset_class=None):
+    """Build a security-master record from a provider info payload."""
+    category = info.get('category')
+    if not category and info.get('quoteType') == 'EQUITY':
+        # Stocks have no fund category; keep sector/industry instead
+        category = "/".join(part for part in (info.get('sector'), info.get('industry')) if part) or None
+
+    expense_ratio = info.get('expenseRatio')
+    if expense_ratio is None:
+        expense_ratio = info.get('annualReportExpenseRatio', info.get('netExpenseRatio'))
+
+    return Security(
+        symbol=ticker,
+        name=info.get('longName') or info.get('shortName') or info.get('name'),
+        quote_type=info.get('quoteType'),
+        category=category,
+        asset_class=asset_class,
+        expense_ratio=expense_ratio,
+        dividend_yield=info.get('dividendYield'),
+        updated=datetime.now().strftime('%Y-%m-%d')
+    )
+
+
+def security_info(security):
+    """Return a record as a provider-style info payload (only the fields it holds)."""
+    info = {
+        'symbol': security.symbol,
+        'longName': security.name,
+        'quoteType': security.quote_type,
+        'category': security.category,
+        'expenseRatio': security.expense_ratio,
+        'dividendYield': security.dividend_yield
+    }
+    return {key: value for key, value in info.items() if value is not None}
+
+
+class SecurityMaster:
+    """Local table of name, quote type, category, asset class, expense ratio and yield per symbol.
+
+    The SQLite table is read into memory once, on first use, and every
+    lookup after that is a dict access. It is maintained offline with
+    refresh_security_master() or import_csv() and picked up by reload().
+    The same database counts how often each symbol is requested, for the
+    startup cache warmer.
+    """
+
+    def __init__(self, path=SECURITY_MASTER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = None
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS securities (
+                symbol TEXT PRIMARY KEY,
+                name TEXT,
+                quote_type TEXT,
+                category TEXT,
+                asset_class TEXT,
+                expense_ratio REAL,
+                dividend_yield REAL,
+                updated TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS symbol_usage (
+                symbol TEXT PRIMARY KEY,
+                count INTEGER NOT NULL,
+                last_used TEXT NOT NULL
+            )
+        """)
+        return conn
+
+    def _load(self):
+        if self._records is None:
+            with self._lock:
+                if self._records is None:
+                    records = {}
+                    if os.path.exists(self.path):
+                        try:
+                            conn = self._connect()
+                            try:
+                                for row in conn.execute("SELECT * FROM securities"):
+                                    records[row[0]] = Security(*row)
+                            finally:
+                                conn.close()
+                        except sqlite3.Error as e:
+                            print(f"Could not load security master: {e}")
+                    self._records = records
+        return self._records
+
+    def reload(self):
+        """Re-read the table, e.g. after it was refreshed by another process."""
+        with self._lock:
+            self._records = None
+        return len(self._load())
+
+    def get(self, ticker):
+        """Return the Security record for a ticker, or None if it is not in the table."""
+        return self._load().get(ticker)
+
+    def get_info(self, ticker):
+        """Return the ticker's record as a provider-style info payload, or None."""
+        security = self.get(ticker)
+        return security_info(security) if security is not None else None
+
+    def symbols(self):
+        return sorted(self._load())
+
+    def upsert(self, securities):
+        """Insert or replace records in the table and in memory."""
+        securities = list(securities)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO securities VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                 [tuple(security) for security in securities])
+        finally:
+            conn.close()
+        records = self._load()
+        with self._lock:
+            for security in securities:
+                records[security.symbol] = security
+
+    def record_usage(self, tickers, day):
+        """Count one request for each ticker on day (YYYY-MM-DD).
+
+        Each count is incremented in a single statement, so concurrent
+        server processes never lose each other's updates.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany("""
+                    INSERT INTO symbol_usage (symbol, count, last_used) VALUES (?, 1, ?)
+                    ON CONFLICT (symbol) DO UPDATE SET count = count + 1, last_used = excluded.last_used
+                """, [(ticker, day) for ticker in set(tickers)])
+        finally:
+            conn.close()
+
+    def top_symbols(self, n, since):
+        """The n symbols requested most often among those used on or after since (YYYY-MM-DD)."""
+        if not os.path.exists(self.path):
+            return []
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT symbol FROM symbol_usage WHERE last_used >= ? ORDER BY count DESC LIMIT ?",
+                                (since, n)).fetchall()
+        finally:
+            conn.close()
+        return [row[0] for row in rows]
+
+    def import_csv(self, path):
+        """Load records from a CSV file with a header naming the Security fields."""
+        securities = []
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                values = {field: (row.get(field) or None) for field in Security._fields}
+                for field in ('expense_ratio', 'dividend_yield'):
+                    if values[field] is not None:
+                        values[field] = float(values[field])
+                values['symbol'] = values['symbol'].strip().upper()
+                values['updated'] = values['updated'] or datetime.now().strftime('%Y-%m-%d')
+                securities.append(Security(**values))
+        self.upsert(securities)
+        return len(securities)
+
+
+security_master = SecurityMaster()
+
+
+if __name__ == "__main__":
+    # Offline maintenance:
+    #   python -m analytics.security_master refresh VOO VXUS BND ...
+    #   python -m analytics.security_master import securities.csv
+    if len(sys.argv) > 2 and sys.argv[1] == "refresh":
+        from .data import refresh_security_master
+        print(f"Refreshed {len(refresh_security_master(sys.argv[2:]))} securities")
+    elif len(sys.argv) == 3 and sys.argv[1] == "import":
+        print(f"Imported {security_master.import_csv(sys.argv[2])} securities")
+    else:
+        print("Usage: python -m analytics.security_master refresh TICKER [TICKER ...] | import FILE.csv")
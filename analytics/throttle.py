@@ -0,0 +1,222 @@
+import os
+import random
+import threading
+import time
+from .metrics import metrics
+
+# Process-wide limits for calls into the market-data provider
+PROVIDER_RATE = float(os.environ.get("PROVIDER_RATE", 5))          # requests per second
+PROVIDER_BURST = int(os.environ.get("PROVIDER_BURST", 10))
+PROVIDER_MAX_CONCURRENCY = int(os.environ.get("PROVIDER_MAX_CONCURRENCY", 8))
+PROVIDER_MAX_ATTEMPTS = int(os.environ.get("PROVIDER_MAX_ATTEMPTS", 4))
+
+
+class RateLimitedError(Exception):
+    """Raised by a provider when the upstream service throttles a request."""
+
+
+class ProviderUnavailable(Exception):
+    """The provider could not be reached after retrying; the result is unknown, not empty."""
+
+
+class CircuitOpenError(ProviderUnavailable):
+    """The circuit breaker is open, so the call was not attempted."""
+
+
+class DeadlineExceeded(ProviderUnavailable):
+    """The data did not arrive within the request's time budget."""
+
+
+def is_throttling_error(exc):
+    """Whether an exception means the provider is rate limiting us (HTTP 429)."""
+    if isinstance(exc, RateLimitedError):
+        return True
+    text = f"{type(exc).__name__} {exc}".lower()
+    return 'ratelimit' in text or 'rate limit' in text or 'too many requests' in text or '429' in text
+
+
+def is_transient_error(exc):
+    """Whether an exception is worth retrying (throttling, timeouts, connection problems)."""
+    if is_throttling_error(exc) or isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    # HTTP client exceptions (requests, curl_cffi) without importing them here
+    names = {cls.__name__ for cls in type(exc).__mro__}
+    return bool(names & {'Timeout', 'ConnectTimeout', 'ReadTimeout', 'ConnectionError', 'DNSError', 'ProxyError'})
+
+
+class TokenBucket:
+    """Token-bucket rate limiter: `rate` tokens per second, up to `capacity` banked."""
+
+    def __init__(self, rate=PROVIDER_RATE, capacity=PROVIDER_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveConcurrencyLimiter:
+    """Concurrency limit adjusted AIMD-style.
+
+    Each success raises the limit by 1/limit (about one slot per round of
+    calls); each throttling response halves it. Callers block while the
+    number of calls in flight is at the limit.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=PROVIDER_MAX_CONCURRENCY, decrease_factor=0.5):
+        self.limit = float(min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self):
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        with self._condition:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def on_throttle(self):
+        with self._condition:
+            self.limit = max(self.minimum, self.limit * self.decrease_factor)
+
+
+class CircuitBreaker:
+    """Stop calling a provider after repeated failures, then probe it again after a cool-down.
+
+    Closed: calls go through. After `failure_threshold` consecutive
+    failures it opens and calls fail fast for `reset_timeout` seconds; then
+    one trial call is let through (half-open) and its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half-open"
+            return "open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may be made now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                raise CircuitOpenError("Market data provider circuit is open")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class Governor:
+    """Rate limiting, adaptive concurrency, retries and circuit breaking for provider calls.
+
+    Throttling and transient errors are retried with jittered exponential
+    backoff; if they persist, ProviderUnavailable is raised so callers can
+    tell "unknown" apart from a genuine empty answer. Other errors (e.g. an
+    unknown ticker) are raised immediately.
+    """
+
+    def __init__(self, bucket=None, limiter=None, breaker=None, max_attempts=PROVIDER_MAX_ATTEMPTS,
+                 base_delay=0.5, max_delay=8.0):
+        self.bucket = bucket or TokenBucket()
+        self.limiter = limiter or AdaptiveConcurrencyLimiter()
+        self.breaker = breaker or CircuitBreaker()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff delay before retry number attempt + 1."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, fn, *args, **kwargs):
+        method = getattr(fn, '__name__', 'call')
+        last_error = None
+        for attempt in range(self.max_attempts):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                metrics.incr('provider_errors', method=method, kind='circuit_open')
+                raise
+            self.bucket.acquire()
+            with self.limiter:
+                started = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception as e:
+                    metrics.observe('provider_call', time.perf_counter() - started, method=method)
+                    if not is_transient_error(e):
+                        # The provider answered; the request itself was bad
+                        metrics.incr('provider_errors', method=method, kind='rejected')
+                        self.breaker.record_success()
+                        raise
+                    if is_throttling_error(e):
+                        metrics.incr('provider_errors', method=method, kind='throttled')
+                        self.limiter.on_throttle()
+                    else:
+                        metrics.incr('provider_errors', method=method, kind='transient')
+                    self.breaker.record_failure()
+                    last_error = e
+                else:
+                    metrics.observe('provider_call', time.perf_counter() - started, method=method)
+                    self.limiter.on_success()
+                    self.breaker.record_success()
+                    return result
+
+            if attempt < self.max_attempts - 1:
+                time.sleep(self.backoff(attempt))
+
+        metrics.incr('provider_errors', method=method, kind='unavailable')
+        raise ProviderUnavailable(f"Market data provider unavailable: {last_error}") from last_error
+
+
+# Shared by every call into the live provider
+governor = Governor()
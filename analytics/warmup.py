@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from .cache import get_ticker_info_batch
+from .data import get_price_data
+from .models import model_portfolios
+from .security_master import security_master
+from .user_input import find_best_matching_model
+
+# How many of the most-requested symbols to prefetch at startup
+WARMUP_TOP_N = int(os.environ.get("WARMUP_TOP_N", 25))
+
+# Only symbols requested within this many days count as recent usage
+WARMUP_USAGE_DAYS = int(os.environ.get("WARMUP_USAGE_DAYS", 30))
+
+_warmup_thread = None
+_warmup_lock = threading.Lock()
+
+
+def record_usage(tickers):
+    """Count a request for each ticker, so the next startup can prefetch popular symbols."""
+    try:
+        security_master.record_usage(tickers, datetime.today().strftime('%Y-%m-%d'))
+    except sqlite3.Error as e:
+        print(f"Could not record symbol usage: {e}")
+
+
+def top_symbols(n=WARMUP_TOP_N, days=WARMUP_USAGE_DAYS):
+    """Return the n symbols requested most often in the last `days` days."""
+    cutoff = (datetime.today() - timedelta(days=days)).strftime('%Y-%m-%d')
+    try:
+        return security_master.top_symbols(n, cutoff)
+    except sqlite3.Error as e:
+        print(f"Could not read symbol usage: {e}")
+        return []
+
+
+def warm_cache(top_n=WARMUP_TOP_N):
+    """Prefetch metadata and 10 years of prices for model and popular tickers.
+
+    Current prices are cached per portfolio, so they are warmed by building
+    the model portfolios rather than for the popular symbols.
+    """
+    started = time.monotonic()
+    model_tickers = list(dict.fromkeys(t for allocations in model_portfolios.values() for t in allocations))
+    tickers = list(dict.fromkeys(model_tickers + top_symbols(top_n)))
+
+    # Same window as the analysis in app.py, so its price requests are
+    # answered by slicing the frame cached here
+    end_date = datetime.today().strftime('%Y-%m-%d')
+    start_date = (datetime.today() - timedelta(days=365*10)).strftime('%Y-%m-%d')
+
+    steps = [
+        ("ticker info", lambda: get_ticker_info_batch(tickers)),
+        ("price history", lambda: get_price_data(tickers, start_date, end_date)),
+        # Builds the five model portfolios exactly as the first analysis will
+        ("model portfolios", lambda: find_best_matching_model({"US Equities": 1.0})),
+    ]
+    for name, step in steps:
+        try:
+            step()
+        except Exception as e:
+            print(f"Cache warm-up: could not prefetch {name}: {e}")
+
+    print(f"Cache warm-up finished for {len(tickers)} tickers in {time.monotonic() - started:.1f}s")
+
+
+def start_warmup():
+    """Warm the cache in a background thread, once per process; returns immediately."""
+    global _warmup_thread
+    with _warmup_lock:
+        if _warmup_thread is None:
+            _warmup_thread = threading.Thread(target=warm_cache, name="cache-warmup", daemon=True)
+            _warmup_thread.start()
+        return _warmup_thread
+
+
+if __name__ == "__main__":
+    # Run before starting the server (e.g. in the deploy step) so the price
+    # store and the shared cache tier (ANALYTICS_CACHE_L2) are already warm
+    warm_cache()
@@ -5,6 +5,24 @@ import plotly.express as px
 from analytics.portfolio import Portfolio
 from analytics.user_input import find_best_matching_model
 from analytics.models import model_portfolios, model_fee
+from analytics.metrics import start_exporter
+from analytics.rolling import ROLLING_BENCHMARK, ROLLING_WINDOWS, benchmark_returns, drawdowns, rolling_risk
+from analytics.warmup import record_usage, start_warmup
+
+@st.cache_resource
+def start_background_services():
+    """Start process-wide background work once per server process, not per script run.
+
+    Prefetches model-portfolio and popular tickers in the background and
+    periodically dumps cache and provider metrics if METRICS_EXPORT_PATH is
+    set. To have the cache warm before the first visitor arrives, also run
+    `python -m analytics.warmup` in the deploy step.
+    """
+    start_exporter()
+    return start_warmup()
+
+
+start_background_services()
 
 # Page configuration
 st.set_page_config(
@@ -402,6 +420,7 @@ st.markdown("### Current Holdings")
 
 # Import validation and name functions
 from analytics.data import validate_ticker, get_investment_name, classify_investment
+from analytics.throttle import ProviderUnavailable
 
 # Add column headers
 header_cols = st.columns([1.5, 2, 2, 2, 0.5])
@@ -421,8 +440,13 @@ for i, (ticker, amount) in enumerate(list(st.session_state.portfolio.items())):
     # Validate ticker only if it's not empty
     is_valid = False
     ticker_info = None
+    data_unavailable = False
     if ticker.strip():  # Only validate non-empty tickers
-        is_valid, ticker_info = validate_ticker(ticker)
+        try:
+            is_valid, ticker_info = validate_ticker(ticker)
+        except ProviderUnavailable:
+            # Throttled or offline: we don't know yet, which is not the same as invalid
+            data_unavailable = True
 
     # Create columns for ticker, name, amount, asset class, and delete button
     cols = st.columns([1.5, 2, 2, 2, 0.5])
@@ -434,6 +458,8 @@ for i, (ticker, amount) in enumerate(list(st.session_state.portfolio.items())):
         if is_valid:
             investment_name = get_investment_name(ticker)
             st.markdown(f'<input type="text" value="{investment_name}" disabled style="width: 100%; padding: 0.5rem 1rem; border: 1px solid #d0d0d0; border-radius: 6px; background-color: #f5f5f5; color: #000000; font-size: 0.95rem; height: 38px; box-sizing: border-box;">', unsafe_allow_html=True)
+        elif data_unavailable:
+            st.text_input("Name", value="⏳ Market data unavailable", key=f"name_{ticker}_{i}", label_visibility="collapsed", disabled=True)
         elif ticker.strip():  # Only show invalid message for non-empty tickers
             st.text_input("Name", value="⚠️ Invalid Ticker", key=f"name_{ticker}_{i}", label_visibility="collapsed", disabled=True)
         else:
@@ -485,7 +511,9 @@ for i, (ticker, amount) in enumerate(list(st.session_state.portfolio.items())):
             st.rerun()
 
     # Show warning only for non-empty invalid tickers
-    if ticker.strip() and not is_valid:
+    if data_unavailable:
+        st.warning(f"⚠️ Market data for '{ticker}' is temporarily unavailable. It will be checked again shortly.")
+    elif ticker.strip() and not is_valid:
         st.warning(f"⚠️ '{ticker}' is not a valid investment symbol. Please correct it or remove this holding.")
 
     # Update portfolio
@@ -520,21 +548,28 @@ if analyze_clicked:
     from analytics.data import validate_ticker
     invalid_tickers = []
     empty_tickers = []
+    unverified_tickers = []
     
     for ticker in st.session_state.portfolio.keys():
         if not ticker.strip():
             empty_tickers.append("(empty)")
         else:
-            is_valid, _ = validate_ticker(ticker)
+            try:
+                is_valid, _ = validate_ticker(ticker)
+            except ProviderUnavailable:
+                unverified_tickers.append(ticker)
+                continue
             if not is_valid:
                 invalid_tickers.append(ticker)
 
-    if empty_tickers or invalid_tickers:
+    if empty_tickers or invalid_tickers or unverified_tickers:
         error_msg = "❌ Cannot analyze portfolio. "
         if empty_tickers:
             error_msg += f"Please enter ticker symbols for {len(empty_tickers)} empty holding(s). "
         if invalid_tickers:
-            error_msg += f"Please correct or remove these invalid tickers: {', '.join(invalid_tickers)}"
+            error_msg += f"Please correct or remove these invalid tickers: {', '.join(invalid_tickers)}. "
+        if unverified_tickers:
+            error_msg += f"Market data is temporarily unavailable for {', '.join(unverified_tickers)}; please try again shortly."
         st.error(error_msg)
     else:
         progress_bar = st.progress(0, text="Initializing analysis...")
@@ -544,13 +579,20 @@ if analyze_clicked:
             
             from concurrent.futures import ThreadPoolExecutor
             from datetime import datetime, timedelta
+            from analytics.fetch import analysis_deadline
+            
+            # One time budget for every market-data fetch in this analysis:
+            # prices, metadata, price history and the benchmark
+            deadline = analysis_deadline()
+            record_usage(st.session_state.portfolio.keys())
             
             # Create current portfolio with asset class overrides
             current_portfolio = Portfolio(
                 st.session_state.portfolio, 
                 "Current", 
                 advisory_fee,
-                st.session_state.asset_class_overrides
+                st.session_state.asset_class_overrides,
+                deadline=deadline
             )
             
             progress_bar.progress(20, text="Finding best matching model...")
@@ -561,7 +603,7 @@ if analyze_clicked:
 
             # Create model portfolio
             model_portfolio_dollars = {ticker: total_value * weight for ticker, weight in model_allocations.items()}
-            model_portfolio = Portfolio(model_portfolio_dollars, model_name, model_fee)
+            model_portfolio = Portfolio(model_portfolio_dollars, model_name, model_fee, deadline=deadline)
             
             progress_bar.progress(40, text="Analyzing historical performance...")
 
@@ -572,7 +614,7 @@ if analyze_clicked:
             # Run historical analysis in parallel
             with ThreadPoolExecutor(max_workers=2) as executor:
                 current_future = executor.submit(
-                    current_portfolio.analyze_historical_performance, start_date, end_date
+                    current_portfolio.analyze_historical_performance, start_date, end_date, deadline
                 )
                 # Wait for current to get actual_start_date
                 current_results = current_future.result()
@@ -581,9 +623,23 @@ if analyze_clicked:
                 model_future = executor.submit(
                     model_portfolio.analyze_historical_performance, 
                     current_results['actual_start_date'], 
-                    end_date
+                    end_date,
+                    deadline
                 )
                 model_results = model_future.result()
+
+            # Rolling risk for both portfolios in one pass over their returns
+            both_returns = pd.DataFrame({
+                'current': current_results['returns_with_fees'],
+                'model': model_results['returns_with_fees']
+            })
+            try:
+                benchmark = benchmark_returns(current_results['actual_start_date'], end_date, deadline=deadline)
+            except Exception as e:
+                print(f"Could not load benchmark {ROLLING_BENCHMARK} for rolling beta: {e}")
+                benchmark = None
+            rolling_results = rolling_risk(both_returns, benchmark=benchmark)
+            drawdown_depth, drawdown_duration = drawdowns(both_returns)
             
             progress_bar.progress(70, text="Projecting future returns...")
 
@@ -593,11 +649,16 @@ if analyze_clicked:
                 model_proj_future = executor.submit(model_portfolio.project_future_returns, 10)
                 current_proj_fees_future = executor.submit(current_portfolio.project_future_with_fees, 10)
                 model_proj_fees_future = executor.submit(model_portfolio.project_future_with_fees, 10)
+                # Same seed for both, so they are compared on the same market scenarios
+                current_sim_future = executor.submit(current_portfolio.simulate_future_with_fees, 10, seed=42)
+                model_sim_future = executor.submit(model_portfolio.simulate_future_with_fees, 10, seed=42)
                 
                 current_projections = current_proj_future.result()
                 model_projections = model_proj_future.result()
                 current_projections_with_fees = current_proj_fees_future.result()
                 model_projections_with_fees = model_proj_fees_future.result()
+                current_simulation = current_sim_future.result()
+                model_simulation = model_sim_future.result()
             
             progress_bar.progress(90, text="Finalizing results...")
 
@@ -608,10 +669,15 @@ if analyze_clicked:
             st.session_state.similarity = similarity
             st.session_state.current_results = current_results
             st.session_state.model_results = model_results
+            st.session_state.rolling_results = rolling_results
+            st.session_state.drawdown_depth = drawdown_depth
+            st.session_state.drawdown_duration = drawdown_duration
             st.session_state.current_projections = current_projections
             st.session_state.model_projections = model_projections
             st.session_state.current_projections_with_fees = current_projections_with_fees
             st.session_state.model_projections_with_fees = model_projections_with_fees
+            st.session_state.current_simulation = current_simulation
+            st.session_state.model_simulation = model_simulation
             st.session_state.analyzed = True
 
             progress_bar.progress(100, text="Complete!")
@@ -623,12 +689,27 @@ if analyze_clicked:
             st.error(f"Error during analysis: {str(e)}")
             st.session_state.analyzed = False
 
+def projection_table(yearly_projections, total_value):
+    """Year-by-year projection table with years as columns, in dollars."""
+    table = yearly_projections[['starting_value', 'growth', 'fees', 'ending_value']].T * total_value
+    table = table.map(lambda value: f"${value:,.0f}")
+    table.columns = [f'Year {year}' for year in yearly_projections.index]
+    table.insert(0, 'Metric', ['Starting Value', 'Growth', 'Fees', 'Ending Value'])
+    return table
+
+
 # Results Section
 if st.session_state.analyzed:
     st.markdown("---")
     st.markdown("## Analysis Results")
     
     # Model Portfolio Info
+    # Flag holdings whose market data did not arrive in time
+    missing_data = {**st.session_state.current_portfolio.missing_data, **st.session_state.model_portfolio.missing_data}
+    if missing_data:
+        details = ", ".join(f"{ticker} ({', '.join(fields).replace('_', ' ')})" for ticker, fields in missing_data.items())
+        st.warning(f"⚠️ Some market data was unavailable and defaults were used: {details}")
+
     st.markdown(f"### Recommended: {st.session_state.model_name} Portfolio")
     st.markdown(f"Asset allocation similarity: **{st.session_state.similarity:.1%}**")
 
@@ -831,12 +912,32 @@ if st.session_state.analyzed:
     model_proj_fees = st.session_state.model_projections_with_fees
 
     # Create projection data with fees
-    years = [0] + [p['year'] for p in current_proj_fees['yearly_projections']]
-    current_values = [total_value] + [p['ending_value'] * total_value for p in current_proj_fees['yearly_projections']]
-    model_values = [total_value] + [p['ending_value'] * total_value for p in model_proj_fees['yearly_projections']]
+    years = [0] + current_proj_fees['yearly_projections'].index.tolist()
+    current_values = [total_value] + (current_proj_fees['yearly_projections']['ending_value'] * total_value).tolist()
+    model_values = [total_value] + (model_proj_fees['yearly_projections']['ending_value'] * total_value).tolist()
 
     fig_proj = go.Figure()
 
+    # Monte Carlo 5th-95th and 25th-75th percentile bands behind each line
+    for simulation, color, label in [
+        (st.session_state.get('current_simulation'), '46, 134, 171', 'Your Portfolio'),
+        (st.session_state.get('model_simulation'), '6, 167, 125', st.session_state.model_name)
+    ]:
+        if simulation is None:
+            continue
+        bands = simulation['percentiles']
+        for low, high, opacity in [(5, 95, 0.10), (25, 75, 0.18)]:
+            fig_proj.add_trace(go.Scatter(
+                x=years + years[::-1],
+                y=[total_value] + list(bands[high] * total_value) + list(bands[low][::-1] * total_value) + [total_value],
+                fill='toself',
+                fillcolor=f'rgba({color}, {opacity})',
+                line=dict(width=0),
+                hoverinfo='skip',
+                name=f'{label} {low}th–{high}th percentile',
+                showlegend=False
+            ))
+
     fig_proj.add_trace(go.Scatter(
         x=years,
         y=current_values,
@@ -872,6 +973,17 @@ if st.session_state.analyzed:
 
     st.plotly_chart(fig_proj, use_container_width=True)
 
+    current_sim = st.session_state.get('current_simulation')
+    model_sim = st.session_state.get('model_simulation')
+    if current_sim is not None and model_sim is not None:
+        st.caption(
+            f"*Shaded bands: 25th–75th and 5th–95th percentiles of {current_sim['n_paths']:,} simulated paths "
+            f"with correlated asset-class returns. 10-year range: Your Portfolio "
+            f"\\${current_sim['percentiles'][5][-1] * total_value:,.0f}–\\${current_sim['percentiles'][95][-1] * total_value:,.0f}, "
+            f"{st.session_state.model_name} "
+            f"\\${model_sim['percentiles'][5][-1] * total_value:,.0f}–\\${model_sim['percentiles'][95][-1] * total_value:,.0f}.*"
+        )
+
     # Show projection details
     col1, col2, col3 = st.columns(3)
     
@@ -907,38 +1019,14 @@ if st.session_state.analyzed:
         st.markdown("#### Your Portfolio")
         
         # Build current portfolio table with years as columns
-        current_table_data = {
-            'Metric': ['Starting Value', 'Growth', 'Fees', 'Ending Value']
-        }
-        
-        for i, p in enumerate(current_proj_fees['yearly_projections'], 1):
-            current_table_data[f'Year {i}'] = [
-                f"${p['starting_value'] * total_value:,.0f}",
-                f"${p['growth'] * total_value:,.0f}",
-                f"${p['fees'] * total_value:,.0f}",
-                f"${p['ending_value'] * total_value:,.0f}"
-            ]
-        
-        df_current = pd.DataFrame(current_table_data)
+        df_current = projection_table(current_proj_fees['yearly_projections'], total_value)
         st.dataframe(df_current, hide_index=True, use_container_width=True)
         
         st.markdown("---")
         st.markdown(f"#### {st.session_state.model_name} Portfolio")
         
         # Build model portfolio table with years as columns
-        model_table_data = {
-            'Metric': ['Starting Value', 'Growth', 'Fees', 'Ending Value']
-        }
-        
-        for i, p in enumerate(model_proj_fees['yearly_projections'], 1):
-            model_table_data[f'Year {i}'] = [
-                f"${p['starting_value'] * total_value:,.0f}",
-                f"${p['growth'] * total_value:,.0f}",
-                f"${p['fees'] * total_value:,.0f}",
-                f"${p['ending_value'] * total_value:,.0f}"
-            ]
-        
-        df_model = pd.DataFrame(model_table_data)
+        df_model = projection_table(model_proj_fees['yearly_projections'], total_value)
         st.dataframe(df_model, hide_index=True, use_container_width=True)
 
     st.markdown("## Projected Fees & Savings")
@@ -1047,11 +1135,24 @@ if st.session_state.analyzed:
     current_res = st.session_state.current_results
     model_res = st.session_state.model_results
 
+    # Window for the chart and statistics; answered from the precomputed returns index
+    current_index = current_res['returns_index']
+    model_index = model_res['returns_index']
+    window_dates = current_index.dates.date
+    window_start, window_end = st.select_slider(
+        "Analysis window",
+        options=list(window_dates),
+        value=(window_dates[0], window_dates[-1]),
+        format_func=lambda d: d.strftime('%b %Y')
+    )
+
     # Historical Growth Chart
     fig_hist = go.Figure()
 
-    current_cumulative = current_res['cumulative_with_fees']
-    model_cumulative = model_res['cumulative_with_fees']
+    current_cumulative = current_index.cumulative(window_start, window_end)
+    model_cumulative = model_index.cumulative(window_start, window_end)
+    current_stats = current_index.stats(window_start, window_end)
+    model_stats = model_index.stats(window_start, window_end)
 
     fig_hist.add_trace(go.Scatter(
         x=current_cumulative.index,
@@ -1093,18 +1194,18 @@ if st.session_state.analyzed:
     metrics_data = {
         'Metric': ['Total Return', 'Annualized Return', 'Volatility', 'Sharpe Ratio', 'Max Drawdown'],
         'Your Portfolio': [
-            f"{current_res['stats_with_fees']['Total Return']:.2%}",
-            f"{current_res['stats_with_fees']['Annualized Return']:.2%}",
-            f"{current_res['stats_with_fees']['Volatility']:.2%}",
-            f"{current_res['stats_with_fees']['Sharpe Ratio']:.2f}",
-            f"{current_res['stats_with_fees']['Max Drawdown']:.2%}"
+            f"{current_stats['Total Return']:.2%}",
+            f"{current_stats['Annualized Return']:.2%}",
+            f"{current_stats['Volatility']:.2%}",
+            f"{current_stats['Sharpe Ratio']:.2f}",
+            f"{current_stats['Max Drawdown']:.2%}"
         ],
         st.session_state.model_name: [
-            f"{model_res['stats_with_fees']['Total Return']:.2%}",
-            f"{model_res['stats_with_fees']['Annualized Return']:.2%}",
-            f"{model_res['stats_with_fees']['Volatility']:.2%}",
-            f"{model_res['stats_with_fees']['Sharpe Ratio']:.2f}",
-            f"{model_res['stats_with_fees']['Max Drawdown']:.2%}"
+            f"{model_stats['Total Return']:.2%}",
+            f"{model_stats['Annualized Return']:.2%}",
+            f"{model_stats['Volatility']:.2%}",
+            f"{model_stats['Sharpe Ratio']:.2f}",
+            f"{model_stats['Max Drawdown']:.2%}"
         ]
     }
 
@@ -1122,7 +1223,90 @@ if st.session_state.analyzed:
         }
     )
 
-    st.caption(f"*Historical period: {current_res['actual_start_date']} to {current_res['actual_end_date']}*")
+    st.caption(f"*Historical period: {window_start:%Y-%m-%d} to {window_end:%Y-%m-%d} "
+               f"(data available {current_res['actual_start_date']} to {current_res['actual_end_date']})*")
+
+    # Trailing returns over standard horizons, ending at the latest data
+    st.markdown("### Trailing Performance")
+
+    def trailing_cell(stats, horizon, stat, fmt):
+        value = stats.loc[horizon, stat]
+        return "N/A" if pd.isna(value) else fmt.format(value)
+
+    current_trailing = current_res['trailing_stats']
+    model_trailing = model_res['trailing_stats']
+    trailing_rows = []
+    for horizon in current_trailing.index:
+        for label, trailing in (('Your Portfolio', current_trailing), (st.session_state.model_name, model_trailing)):
+            trailing_rows.append({
+                'Horizon': horizon,
+                'Portfolio': label,
+                'Annualized Return': trailing_cell(trailing, horizon, 'Annualized Return', "{:.2%}"),
+                'Volatility': trailing_cell(trailing, horizon, 'Volatility', "{:.2%}"),
+                'Sharpe Ratio': trailing_cell(trailing, horizon, 'Sharpe Ratio', "{:.2f}"),
+                'Max Drawdown': trailing_cell(trailing, horizon, 'Max Drawdown', "{:.2%}")
+            })
+    st.dataframe(pd.DataFrame(trailing_rows), hide_index=True, use_container_width=True)
+    st.caption("*N/A means the portfolio does not have enough history for that horizon.*")
+
+    # Rolling Risk Charts (precomputed for both portfolios when the analysis ran)
+    st.markdown("### Rolling Risk")
+
+    rolling_results = st.session_state.rolling_results
+    rolling_stats = [stat for stat in ('Volatility', 'Sharpe Ratio', 'Beta')
+                     if stat in rolling_results.columns.get_level_values(0)]
+    roll_col1, roll_col2 = st.columns(2)
+    with roll_col1:
+        rolling_stat = st.selectbox("Statistic", rolling_stats + ['Drawdown'])
+    with roll_col2:
+        rolling_window = st.selectbox(
+            "Window", ROLLING_WINDOWS, index=len(ROLLING_WINDOWS) - 1,
+            format_func=lambda days: f"{days} trading days (~{round(days / 21)} months)",
+            disabled=rolling_stat == 'Drawdown'
+        )
+
+    if rolling_stat == 'Drawdown':
+        rolling_series = st.session_state.drawdown_depth
+    else:
+        rolling_series = rolling_results[rolling_stat][rolling_window]
+
+    fig_rolling = go.Figure()
+    for key, label, color in (('current', 'Your Portfolio', '#2E86AB'),
+                              ('model', f'{st.session_state.model_name} Model', '#06A77D')):
+        fig_rolling.add_trace(go.Scatter(
+            x=rolling_series.index,
+            y=rolling_series[key],
+            mode='lines',
+            name=label,
+            line=dict(color=color, width=2)
+        ))
+
+    fig_rolling.update_layout(
+        title=f"Rolling {rolling_stat}" if rolling_stat == 'Drawdown' else f"Rolling {rolling_window}-Day {rolling_stat}",
+        xaxis_title="Date",
+        yaxis_title=rolling_stat,
+        height=400,
+        hovermode='x unified',
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        font=dict(family="Arial, sans-serif", size=12, color='black'),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1, font=dict(color='black')),
+        title_font=dict(color='black'),
+        xaxis=dict(title_font=dict(color='black'), tickfont=dict(color='black')),
+        yaxis=dict(title_font=dict(color='black'), tickfont=dict(color='black'))
+    )
+    fig_rolling.update_xaxes(showgrid=True, gridwidth=1, gridcolor='#E5E5E5')
+    fig_rolling.update_yaxes(showgrid=True, gridwidth=1, gridcolor='#E5E5E5',
+                             tickformat='.2f' if rolling_stat in ('Sharpe Ratio', 'Beta') else '.0%')
+
+    st.plotly_chart(fig_rolling, use_container_width=True)
+
+    if rolling_stat == 'Drawdown':
+        duration = st.session_state.drawdown_duration.iloc[-1]
+        st.caption(f"*Days since the last peak: Your Portfolio {duration['current']:.0f}, "
+                   f"{st.session_state.model_name} {duration['model']:.0f}.*")
+    elif rolling_stat == 'Beta':
+        st.caption(f"*Beta is measured against {ROLLING_BENCHMARK}.*")
 
     # Footer
     st.markdown("""
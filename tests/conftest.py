@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+
+
+def random_returns(days, columns=None, seed=0, mean=0.0003, vol=0.01, correlated=False):
+    """Normal daily returns on the business days from 2020-01-01.
+
+    Without columns this is a Series; with a list of names, a DataFrame
+    with one column each. correlated=True mixes the columns through a
+    random matrix so that they co-move, for the covariance estimators.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range('2020-01-01', periods=days)
+    if columns is None:
+        return pd.Series(rng.normal(mean, vol, days), index=index)
+    draws = rng.normal(mean, vol, (days, len(columns)))
+    if correlated:
+        draws = draws.dot(rng.normal(size=(len(columns), len(columns))))
+    return pd.DataFrame(draws, index=index, columns=list(columns))
@@ -0,0 +1,120 @@
+import threading
+import time
+import pytest
+import analytics.cache as cache_module
+from analytics.cache import SingleFlight, get_or_load
+from analytics.cache_backends import TTLCache
+
+CALLERS = 8
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    backend = TTLCache()
+    monkeypatch.setattr(cache_module, '_cache', backend)
+    monkeypatch.setattr(cache_module, '_flights', SingleFlight())
+    return backend
+
+
+def _run_concurrently(call, callers=CALLERS):
+    """Run call() from several threads; returns each thread's result or exception."""
+    outcomes = [None] * callers
+
+    def run(i):
+        try:
+            outcomes[i] = call()
+        except Exception as e:
+            outcomes[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def _blocking_loader(result):
+    """A loader that counts its calls and blocks until released; raises result if it is an exception."""
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def finish(threads):
+        assert started.wait(5)
+        # Give the other callers time to queue behind the first one
+        time.sleep(0.2)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+    return load, calls, finish
+
+
+def test_concurrent_misses_share_one_load():
+    load, calls, finish = _blocking_loader({'price': 1.0})
+    threads, outcomes = _run_concurrently(lambda: get_or_load('ns', 'key', load, 60))
+    finish(threads)
+
+    assert len(calls) == 1
+    assert all(outcome is outcomes[0] for outcome in outcomes)
+    assert outcomes[0] == {'price': 1.0}
+    # Later callers are answered from the cache
+    assert get_or_load('ns', 'key', load, 60) is outcomes[0]
+    assert len(calls) == 1
+
+
+def test_concurrent_callers_see_the_same_error():
+    error = ConnectionError("provider down")
+    load, calls, finish = _blocking_loader(error)
+    flights = SingleFlight()
+    threads, outcomes = _run_concurrently(lambda: flights.do('key', load))
+    finish(threads)
+
+    assert len(calls) == 1
+    assert all(outcome is error for outcome in outcomes)
+    # Errors are not remembered: the next call runs again
+    assert flights.in_flight() == 0
+    with pytest.raises(ConnectionError):
+        flights.do('key', load)
+    assert len(calls) == 2
+
+
+def test_errors_are_not_cached(fresh_cache):
+    def fail():
+        raise ValueError("bad")
+
+    with pytest.raises(ValueError):
+        get_or_load('ns', 'key', fail, 60)
+    assert fresh_cache.get_entry('ns', 'key') is None
+    assert get_or_load('ns', 'key', lambda: 'value', 60) == 'value'
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(fresh_cache):
+    # Past its 60s freshness but inside the 60s stale window
+    fresh_cache.set_entry('ns', 'key', 'old', time.time() + 30)
+    load, calls, finish = _blocking_loader('new')
+
+    threads, outcomes = _run_concurrently(lambda: get_or_load('ns', 'key', load, 60, stale_ttl_seconds=60))
+    for thread in threads:
+        thread.join(5)
+    assert outcomes == ['old'] * CALLERS
+    finish([])
+
+    deadline = time.time() + 5
+    while fresh_cache.get('ns', 'key') != 'new' and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 1
+    assert get_or_load('ns', 'key', load, 60, stale_ttl_seconds=60) == 'new'
+    assert len(calls) == 1
+
+
+def test_expired_entry_is_loaded_synchronously(fresh_cache):
+    fresh_cache.set_entry('ns', 'key', 'old', time.time() - 1)
+    assert get_or_load('ns', 'key', lambda: 'new', 60, stale_ttl_seconds=60) == 'new'
@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+from analytics.cache_backends import DiskCache, SQLiteCache, TieredCache, TTLCache
+from analytics.metrics import metrics
+
+
+def test_ttl_cache_evicts_least_recently_used_by_count():
+    cache = TTLCache(max_entries=3)
+    for key in 'abc':
+        cache.set('ns', key, key, 60)
+    cache.get('ns', 'a')
+    cache.set('ns', 'd', 'd', 60)
+
+    assert cache.keys('ns') == ['d', 'a', 'c']
+    assert len(cache) == 3
+
+
+def test_ttl_cache_evicts_by_bytes():
+    value = b'x' * 1000
+    size = sys.getsizeof(value)
+    cache = TTLCache(max_bytes=3 * size - 1)
+    for key in 'abc':
+        cache.set('ns', key, value, 60)
+
+    assert cache.keys('ns') == ['c', 'b']
+    assert cache.nbytes() == 2 * size
+    # A value larger than the whole cache is not stored at all
+    cache.set('ns', 'huge', b'x' * (3 * size), 60)
+    assert cache.keys('ns') == ['c', 'b']
+
+
+def test_ttl_cache_evicts_expired_entries_first():
+    cache = TTLCache(max_entries=2)
+    cache.set('ns', 'live', 1, 60)
+    # Most recently written, but already expired
+    cache.set_entry('ns', 'expired', 2, time.time() - 1)
+    cache.set('ns', 'new', 3, 60)
+
+    assert cache.keys('ns') == ['new', 'live']
+
+
+def test_disk_cache_scans_only_when_over_its_bound(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), max_bytes=2000)
+    scans = []
+    evict = cache._evict
+    monkeypatch.setattr(cache, '_evict', lambda: (scans.append(1), evict()))
+
+    for i in range(5):
+        cache.set('ns', i, b'x' * 300, 60)
+    # One scan to learn the directory's size, none while under the bound
+    assert len(scans) == 1
+
+    for i in range(5, 10):
+        cache.set('ns', i, b'x' * 300, 60)
+    assert len(scans) > 1
+    assert sum(os.path.getsize(p) for p in cache._entry_files()) <= 2000
+    assert cache._bytes <= 2000
+    assert cache.get('ns', 9) == b'x' * 300
+
+
+def test_sqlite_cache_reads_do_not_rewrite_fresh_access_times(tmp_path):
+    cache = SQLiteCache(str(tmp_path / 'cache.sqlite3'))
+    cache.set('ns', 'key', 'value', 60)
+    statements = []
+    cache._conn.set_trace_callback(statements.append)
+
+    assert cache.get('ns', 'key') == 'value'
+    assert not [s for s in statements if s.startswith('UPDATE')]
+
+
+class BrokenCache(TTLCache):
+    """An L2 tier whose every call fails, like an unreachable disk."""
+
+    def _fail(self, *args, **kwargs):
+        raise OSError("disk unavailable")
+
+    get_entry = set_entry = delete = clear = keys = _fail
+
+
+def test_tiered_cache_survives_a_failing_l2():
+    cache = TieredCache(TTLCache(), BrokenCache())
+    before = metrics.counter('cache_l2_errors', namespace='ns')
+
+    cache.set('ns', 'a', 1, 60)
+    assert cache.get('ns', 'a') == 1
+    assert cache.keys('ns') == ['a']
+    cache.delete('ns', 'a')
+    assert cache.get('ns', 'a') is None
+    cache.set('ns', 'b', 2, 60)
+    cache.clear('ns')
+    assert cache.keys('ns') == []
+    cache.clear()
+
+    # set, keys, delete, the missed get, set, clear and keys each reported once
+    assert metrics.counter('cache_l2_errors', namespace='ns') - before == 7
+    assert metrics.counter('cache_l2_errors', namespace='all') >= 1
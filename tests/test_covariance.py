@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from conftest import random_returns
+from analytics.covariance import ewma_covariance, estimate_covariance, ledoit_wolf_covariance, sample_covariance
+
+
+def _naive_shrinkage(returns):
+    """Ledoit-Wolf (2004) shrinkage intensity, summing over days with explicit loops."""
+    days, n = returns.shape
+    centered = returns - returns.mean(axis=0)
+    sample = sum(np.outer(row, row) for row in centered) / days
+    target = np.trace(sample) / n * np.eye(n)
+    delta = np.sum((sample - target) ** 2) / n
+    beta = sum(np.sum((np.outer(row, row) - sample) ** 2) for row in centered) / days ** 2 / n
+    return min(beta, delta) / delta
+
+
+@pytest.mark.parametrize('days, assets', [(30, 10), (126, 5), (750, 8)])
+def test_ledoit_wolf_is_psd_keeps_the_trace_and_matches_the_naive_intensity(days, assets):
+    returns = random_returns(days, range(assets), seed=days, vol=0.006, correlated=True).to_numpy()
+    covariance, shrinkage = ledoit_wolf_covariance(returns)
+    sample = np.cov(returns, rowvar=False, ddof=0)
+
+    assert 0 <= shrinkage <= 1
+    assert abs(shrinkage - _naive_shrinkage(returns)) < 1e-10
+    assert np.allclose(covariance, covariance.T)
+    assert np.linalg.eigvalsh(covariance).min() > 0
+    # Shrinking towards mu * I moves variance between assets but not in total
+    assert np.isclose(np.trace(covariance), np.trace(sample), rtol=1e-12)
+    # Fewer days per asset means more shrinkage
+    if days == 30:
+        longer = random_returns(750, range(assets), seed=days, vol=0.006, correlated=True).to_numpy()
+        assert shrinkage > ledoit_wolf_covariance(longer)[1]
+
+
+def test_sample_and_ewma_match_pandas():
+    frame = random_returns(300, list('abcd'), seed=1, vol=0.006, correlated=True)
+    assert np.allclose(sample_covariance(frame.to_numpy()), frame.cov().to_numpy(), rtol=1e-12)
+
+    halflife = 20
+    ewma = ewma_covariance(frame.to_numpy(), halflife)
+    weights = 0.5 ** (np.arange(len(frame))[::-1] / halflife)
+    weights /= weights.sum()
+    mean = weights.dot(frame.to_numpy())
+    expected = sum(w * np.outer(row - mean, row - mean) for w, row in zip(weights, frame.to_numpy()))
+    assert np.allclose(ewma, expected, rtol=1e-12)
+
+
+def test_estimate_covariance_annualizes_and_labels():
+    frame = random_returns(200, ['VOO', 'BND', 'VXUS'], seed=2, vol=0.006, correlated=True)
+    covariance = estimate_covariance(frame, 'sample')
+    assert list(covariance.index) == list(covariance.columns) == ['VOO', 'BND', 'VXUS']
+    assert np.allclose(covariance.to_numpy(), frame.cov().to_numpy() * 252, rtol=1e-12)
+    with pytest.raises(ValueError):
+        estimate_covariance(frame, 'unknown')
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+import time
+import pytest
+import analytics.data as data_module
+import analytics.fetch as fetch_module
+from analytics.fetch import fetch_portfolio_data, gather_until, run_until
+from analytics.security_master import SecurityMaster
+from analytics.throttle import DeadlineExceeded
+
+
+@pytest.fixture
+def release():
+    """An event slow calls wait on; set at teardown so no pool thread is left blocked."""
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_gather_until_returns_what_finished_by_the_deadline(release):
+    def broken():
+        raise ConnectionError("provider down")
+
+    calls = {'fast': lambda: 1, 'slow': lambda: release.wait(5), 'broken': broken}
+    started = time.monotonic()
+    results, failed = asyncio.run(gather_until(calls, time.monotonic() + 0.2))
+
+    assert time.monotonic() - started < 2
+    assert results == {'fast': 1}
+    assert failed == {'slow', 'broken'}
+
+
+def test_run_until_raises_once_the_deadline_passes(release):
+    assert run_until(lambda: 'done', time.monotonic() + 5) == 'done'
+    with pytest.raises(DeadlineExceeded):
+        run_until(lambda: release.wait(5), time.monotonic() + 0.2)
+
+
+def test_portfolio_data_falls_back_for_calls_cut_off_by_the_deadline(monkeypatch, tmp_path, release):
+    infos = {'VOO': {'symbol': 'VOO', 'expenseRatio': 0.03}}
+
+    def get_ticker_info(ticker):
+        if ticker not in infos:
+            release.wait(5)
+        return infos.get(ticker)
+
+    monkeypatch.setattr(fetch_module, 'get_current_prices', lambda tickers: {'VOO': 400.0, 'SLOW': 10.0})
+    monkeypatch.setattr(fetch_module, 'get_ticker_info', get_ticker_info)
+    monkeypatch.setattr(data_module, 'security_master', SecurityMaster(str(tmp_path / 'security_master.sqlite3')))
+
+    data = fetch_portfolio_data(['VOO', 'SLOW'], deadline=time.monotonic() + 0.2)
+
+    assert data['current_prices'] == {'VOO': 400.0, 'SLOW': 10.0}
+    assert data['expense_ratios'] == {'VOO': pytest.approx(0.0003), 'SLOW': data_module.DEFAULT_EXPENSE_RATIO}
+    assert data['classifications'] == {'VOO': 'US Equities', 'SLOW': data_module.DEFAULT_CLASSIFICATION}
+    assert data['missing'] == {'SLOW': ['expense_ratio', 'classification']}
@@ -0,0 +1,72 @@
+import pandas as pd
+from conftest import random_returns
+from analytics.incremental import SlidingPerformance, window_key
+from analytics.performance import calculate_portfolio_returns, performance_stats
+
+WEIGHTS = {'AAA': 0.6, 'BBB': 0.4}
+
+
+def _prices(days=300, seed=0):
+    return 100 * (1 + random_returns(days, list(WEIGHTS), seed)).cumprod()
+
+
+def _full_stats(prices):
+    returns = calculate_portfolio_returns(prices, WEIGHTS, [0.01, 0.0])
+    return performance_stats(returns.iloc[:, 0])[0]
+
+
+def test_advance_matches_full_recompute():
+    prices = _prices()
+    window = SlidingPerformance(prices.iloc[:250], WEIGHTS, [0.01, 0.0])
+    for day in range(250, 300):
+        start = prices.index[day - 249]
+        assert window.advance(prices.iloc[day - 1:day + 1], start)
+
+    expected = _full_stats(prices.iloc[50:])
+    summary = window.summary()
+    assert summary['first_date'] == prices.index[50]
+    for key, value in expected.items():
+        assert abs(summary['stats'][0][key] - value) < 1e-12
+
+
+def test_advance_refuses_readjusted_history():
+    # A flat fund paying a 1% dividend: adjusted closes before the ex-date
+    # are rescaled by 0.99, so the total return across it is zero
+    index = pd.bdate_range('2020-01-01', periods=11)
+    flat = pd.DataFrame({'AAA': 100.0, 'BBB': 50.0}, index=index)
+    window = SlidingPerformance(flat.iloc[:10], WEIGHTS, [0.0])
+
+    adjusted = flat.copy()
+    adjusted['AAA'] = 99.0
+    assert not window.advance(adjusted.iloc[9:], index[0])
+    assert window.last_date == index[9]
+
+    rebuilt = SlidingPerformance(adjusted, WEIGHTS, [0.0])
+    assert abs(rebuilt.summary()['stats'][0]['Total Return']) < 1e-15
+
+
+def test_advance_uses_the_fresh_base_bar():
+    prices = _prices(days=20)
+    window = SlidingPerformance(prices.iloc[:10], WEIGHTS, [0.0])
+    # Same basis within tolerance: the new bar's return is taken from the fresh row
+    fresh = prices.iloc[9:].copy()
+    fresh.iloc[0] *= 1 + 1e-9
+    assert window.advance(fresh, prices.index[0])
+
+    expected = calculate_portfolio_returns(fresh.iloc[:2], WEIGHTS, 0.0).iloc[0]
+    assert abs(window.summary()['returns'].iloc[9, 0] - expected) < 1e-15
+
+
+def test_advance_and_summarize_rolls_one_window():
+    prices = _prices(days=260)
+    window = SlidingPerformance(prices.iloc[:250], WEIGHTS, [0.0])
+    summary = window.advance_and_summarize(prices.iloc[249:], prices.index[10])
+
+    assert summary['first_date'] == prices.index[10]
+    assert summary['last_date'] == prices.index[-1]
+    readjusted = prices.iloc[-1:] * 0.99
+    assert window.advance_and_summarize(readjusted, prices.index[10]) is None
+
+
+def test_windows_of_different_lengths_are_kept_apart():
+    assert window_key(WEIGHTS, [0.01, 0.0], span_days=3650) != window_key(WEIGHTS, [0.01, 0.0], span_days=1200)
@@ -0,0 +1,69 @@
+import json
+import pytest
+import analytics.cache as cache_module
+from analytics.cache import SingleFlight, cache_stats, get_or_load
+from analytics.cache_backends import TTLCache
+from analytics.metrics import Metrics
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    backend = TTLCache()
+    monkeypatch.setattr(cache_module, '_cache', backend)
+    monkeypatch.setattr(cache_module, '_flights', SingleFlight())
+    return backend
+
+
+def test_snapshot_and_exports_cover_every_series():
+    metrics = Metrics(max_samples=100)
+    metrics.incr('cache_hits', namespace='prices')
+    metrics.incr('cache_hits', 2, namespace='prices')
+    metrics.incr('cache_hits', namespace='info')
+    for ms in range(1, 101):
+        metrics.observe('cache_load', ms / 1000, namespace='prices')
+    metrics.register_gauge('cache_entries', lambda: {(('namespace', 'prices'),): 7})
+
+    assert metrics.counter('cache_hits', namespace='prices') == 3
+    latency = metrics.latency('cache_load', namespace='prices')
+    assert latency['count'] == 100
+    assert latency['p50'] == pytest.approx(0.0505)
+    assert metrics.latency('cache_load', namespace='info') is None
+
+    snapshot = json.loads(metrics.to_json())
+    assert {'name': 'cache_hits', 'labels': {'namespace': 'info'}, 'value': 1} in snapshot['counters']
+    assert snapshot['gauges'] == [{'name': 'cache_entries', 'labels': {'namespace': 'prices'}, 'value': 7}]
+
+    text = metrics.to_prometheus()
+    assert '# TYPE portfolio_cache_hits_total counter' in text
+    assert 'portfolio_cache_hits_total{namespace="prices"} 3' in text
+    assert 'portfolio_cache_load_seconds{namespace="prices",quantile="0.5"} 0.050500' in text
+    assert 'portfolio_cache_load_seconds_count{namespace="prices"} 100' in text
+    assert 'portfolio_cache_entries{namespace="prices"} 7' in text
+
+
+def test_latency_percentiles_use_the_most_recent_samples():
+    metrics = Metrics(max_samples=10)
+    for seconds in [10.0] * 10 + [1.0] * 10:
+        metrics.observe('provider_call', seconds)
+
+    assert metrics.latency('provider_call') == {'count': 20, 'p50': 1.0, 'p95': 1.0, 'p99': 1.0}
+
+
+def test_cache_stats_reports_hit_rate_and_usage(fresh_cache):
+    namespace = 'stats_test'
+
+    def fail():
+        raise ValueError("bad")
+
+    get_or_load(namespace, 'a', lambda: 'value', 60)
+    get_or_load(namespace, 'a', lambda: 'other', 60)
+    get_or_load(namespace, 'a', lambda: 'other', 60)
+    with pytest.raises(ValueError):
+        get_or_load(namespace, 'b', fail, 60)
+
+    stats = cache_stats()[namespace]
+    assert (stats['hits'], stats['misses'], stats['load_errors']) == (2, 2, 1)
+    assert stats['hit_rate'] == 0.5
+    assert stats['entries'] == 1
+    assert stats['bytes'] > 0
+    assert stats['load_p50'] is not None
@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import analytics.parallel as parallel
+from analytics.parallel import map_chunks
+
+
+def _scaled_sum(arrays, factor):
+    return float(arrays['values'].sum() * factor)
+
+
+def test_chunk_counts_share_one_pool():
+    values = np.arange(10.0)
+    try:
+        for n_chunks in (2, 3, 4, 5):
+            results = map_chunks(_scaled_sum, [(k,) for k in range(n_chunks)], {'values': values}, workers=4)
+            assert results == [45.0 * k for k in range(n_chunks)]
+        assert list(parallel._pools) == [4]
+    finally:
+        parallel.shutdown()
+
+
+def test_single_chunk_runs_in_process():
+    assert map_chunks(_scaled_sum, [(2,)], {'values': np.ones(3)}, workers=4) == [6.0]
+    assert not parallel._pools
+
+
+def test_worker_kernels_import_no_data_layer():
+    # What a worker process imports to run a batch chunk
+    code = ("import sys, analytics.kernels; "
+            "print(sorted(m for m in ('analytics.data', 'analytics.cache', 'yfinance') if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert result.stdout.strip() == '[]'
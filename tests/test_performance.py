@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+from analytics.performance import (
+    batch_performance_stats, calculate_portfolio_returns, multi_horizon_stats, performance_stats, project_fee_grid,
+    project_portfolio_monte_carlo, simulate_portfolio_values
+)
+
+ALLOCATION = {'US Equities': 0.6, 'Core Fixed Income': 0.4}
+GROWTH = {'US Equities': 0.08, 'Core Fixed Income': 0.04}
+VOLATILITY = {'US Equities': 0.16, 'Core Fixed Income': 0.05}
+CORRELATIONS = {'US Equities': {'Core Fixed Income': 0.2}}
+
+
+def _returns(start, end, seed=0):
+    index = pd.bdate_range(start, end)
+    rng = np.random.default_rng(seed)
+    return pd.Series(rng.normal(0.0003, 0.01, len(index)), index=index)
+
+
+def test_short_series_has_no_longer_horizons():
+    returns = _returns('2022-08-01', '2025-06-02')  # about 2.8 years
+    stats = multi_horizon_stats(returns)
+
+    assert stats.loc['1Y'].notna().all()
+    assert stats.loc[['3Y', '5Y', '10Y']].isna().all().all()
+
+
+def test_horizons_match_performance_stats_on_trailing_slices():
+    returns = _returns('2015-06-01', '2025-06-02')
+    stats = multi_horizon_stats(returns)
+
+    for years in (1, 3, 5, 10):
+        begin = returns.index[-1] - pd.DateOffset(years=years)
+        expected = performance_stats(returns[returns.index > begin])[0]
+        for key, value in expected.items():
+            assert abs(stats.loc[f"{years}Y", key] - value) < 1e-12
+
+
+def test_frame_marks_each_series_coverage():
+    long_series = _returns('2015-06-01', '2025-06-02')
+    frame = pd.DataFrame({'long': long_series, 'short': _returns('2022-08-01', '2025-06-02', seed=1)})
+    stats = multi_horizon_stats(frame)
+
+    assert stats.loc['long', ('10Y', 'Annualized Return')] == multi_horizon_stats(long_series).loc['10Y', 'Annualized Return']
+    assert np.isnan(stats.loc['short', ('3Y', 'Annualized Return')])
+    assert not np.isnan(stats.loc['short', ('1Y', 'Annualized Return')])
+
+
+def test_batch_stats_match_performance_stats_with_mixed_starts():
+    returns = pd.DataFrame({'early': _returns('2020-01-01', '2021-06-30'),
+                            'late': _returns('2020-01-01', '2021-06-30', seed=1)})
+    # The late portfolio starts with a loss, below the value it has before its first day
+    returns.loc[:returns.index[99], 'late'] = np.nan
+    returns.loc[returns.index[100], 'late'] = -0.05
+    stats = batch_performance_stats(returns.to_numpy())
+
+    for i, name in enumerate(returns.columns):
+        expected = performance_stats(returns[name].dropna())[0]
+        for key, value in expected.items():
+            assert abs(stats[key][i] - value) < 1e-12
+
+
+def test_fee_grid_rejects_horizons_below_one_year():
+    for horizons in ([0, 5], [-1], []):
+        with pytest.raises(ValueError):
+            project_fee_grid({'US Equities': 1.0}, {'US Equities': 0.08}, [0.01], horizons)
+
+
+def test_fee_scenarios_match_single_fee_calls():
+    returns = pd.DataFrame({'AAA': _returns('2023-01-02', '2024-12-31'),
+                            'BBB': _returns('2023-01-02', '2024-12-31', seed=1)})
+    prices = 100 * (1 + returns).cumprod()
+    weights = {'AAA': 0.6, 'BBB': 0.4}
+    expense_ratios = {'AAA': 0.001, 'BBB': 0.0005}
+    fees = [0.0, 0.005, 0.01]
+
+    scenarios = calculate_portfolio_returns(prices, weights, fees, expense_ratios)
+
+    assert list(scenarios.columns) == fees
+    gross = prices.pct_change().dropna().dot(pd.Series(weights))
+    fund_drag = (1 - 0.001) ** (0.6 / 252) * (1 - 0.0005) ** (0.4 / 252)
+    for fee in fees:
+        single = calculate_portfolio_returns(prices, weights, fee, expense_ratios)
+        assert np.allclose(scenarios[fee], single, rtol=0, atol=1e-15)
+        expected = (1 + gross) * (1 - fee) ** (1 / 252) * fund_drag - 1
+        assert np.allclose(single, expected, rtol=0, atol=1e-14)
+
+
+def test_monte_carlo_depends_on_seed_and_chunk_size_only():
+    args = (ALLOCATION, GROWTH, VOLATILITY, CORRELATIONS, 0.01, 5, 500)
+    values = simulate_portfolio_values(*args, seed=7, chunk_size=200, workers=1)
+
+    assert values.shape == (500, 5)
+    assert np.array_equal(values, simulate_portfolio_values(*args, seed=7, chunk_size=200, workers=2))
+    assert not np.array_equal(values, simulate_portfolio_values(*args, seed=8, chunk_size=200, workers=1))
+
+
+def test_monte_carlo_without_volatility_follows_the_expected_return():
+    values = simulate_portfolio_values(ALLOCATION, GROWTH, {}, CORRELATIONS, 0.01, 5, 100, seed=0)
+
+    expected = ((1 + 0.6 * 0.08 + 0.4 * 0.04) * (1 - 0.01)) ** np.arange(1, 6)
+    assert np.allclose(values, expected, rtol=1e-4)
+
+
+def test_monte_carlo_bands_are_ordered_by_percentile():
+    projection = project_portfolio_monte_carlo(ALLOCATION, GROWTH, VOLATILITY, CORRELATIONS, 0.01,
+                                               years=10, n_paths=2000, seed=0)
+
+    assert projection['years'] == list(range(1, 11))
+    bands = np.array([projection['percentiles'][p] for p in (5, 25, 50, 75, 95)])
+    assert bands.shape == (5, 10)
+    assert (np.diff(bands, axis=0) > 0).all()
+    assert 0 < projection['probability_of_loss'] < 0.5
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+import analytics.cache as cache_module
+import analytics.data as data_module
+from analytics.cache import SingleFlight
+from analytics.cache_backends import TTLCache
+from analytics.data import get_price_data
+
+
+class StubStore:
+    """Stands in for the price store and records every window it is asked for."""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+
+    def get_prices(self, tickers, start, end):
+        self.calls.append((tuple(tickers), start, end))
+        return self.prices.loc[start:pd.Timestamp(end) - pd.Timedelta(days=1), list(tickers)]
+
+    def inception_dates(self, tickers):
+        return {}
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    backend = TTLCache()
+    monkeypatch.setattr(cache_module, '_cache', backend)
+    monkeypatch.setattr(cache_module, '_flights', SingleFlight())
+    return backend
+
+
+@pytest.fixture
+def store(monkeypatch):
+    index = pd.bdate_range('2024-01-02', '2024-12-31')
+    prices = pd.DataFrame({ticker: np.linspace(100, 100 + i, len(index))
+                           for i, ticker in enumerate(['AAA', 'BBB', 'CCC'], start=1)}, index=index)
+    stub = StubStore(prices)
+    monkeypatch.setattr(data_module, 'price_store', stub)
+    return stub
+
+
+def test_reordered_tickers_share_one_cached_frame(store):
+    first = get_price_data(['AAA', 'BBB'], '2024-01-02', '2024-12-31')
+    second = get_price_data(['BBB', 'AAA'], '2024-01-02', '2024-12-31')
+
+    assert len(store.calls) == 1
+    assert list(second.columns) == ['BBB', 'AAA']
+    assert second.equals(first[['BBB', 'AAA']])
+
+
+def test_subsets_and_sub_windows_are_sliced_from_a_cached_frame(store):
+    get_price_data(['AAA', 'BBB'], '2024-01-02', '2024-12-31')
+
+    prices = get_price_data(['AAA'], '2024-03-01', '2024-06-01')
+    assert len(store.calls) == 1
+    # The end date is exclusive, like a provider request
+    assert prices.equals(store.prices.loc['2024-03-01':'2024-05-31', ['AAA']])
+
+    # A ticker outside every cached frame needs a new load
+    get_price_data(['AAA', 'CCC'], '2024-03-01', '2024-06-01')
+    assert len(store.calls) == 2
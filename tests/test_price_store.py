@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+import pytest
+import analytics.data as data_module
+import analytics.price_store as price_store_module
+from analytics.data import get_available_date_range
+from analytics.price_store import PriceStore
+
+
+class StubProvider:
+    """Serves a fixed price frame; tickers listed in failing come back all-NaN like yf.download."""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.failing = set()
+        self.calls = []
+        # Called once, in the middle of the next download
+        self.during_download = None
+
+    def get_price_history(self, tickers, start, end):
+        self.calls.append((tuple(tickers), start, end))
+        hook, self.during_download = self.during_download, None
+        if hook is not None:
+            hook()
+        window = self.prices.loc[start:pd.Timestamp(end) - pd.Timedelta(days=1), list(tickers)].copy()
+        for ticker in self.failing & set(tickers):
+            window[ticker] = np.nan
+        return window
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    index = pd.bdate_range('2023-01-02', '2024-12-31')
+    prices = pd.DataFrame({'AAA': np.linspace(100, 120, len(index)),
+                           'BBB': np.linspace(50, 40, len(index))}, index=index)
+    stub = StubProvider(prices)
+    monkeypatch.setattr(price_store_module, 'get_provider', lambda: stub)
+    return stub
+
+
+def test_failed_backfill_keeps_stored_history(tmp_path, provider):
+    store = PriceStore(str(tmp_path))
+    stored = store.get_prices(['AAA', 'BBB'], '2024-01-02', '2024-12-31')
+
+    provider.failing = {'BBB'}
+    store.get_prices(['AAA', 'BBB'], '2023-01-02', '2024-12-31')
+
+    # BBB's history and manifest entry are untouched, so the backfill is retried
+    assert store.read('BBB').equals(stored['BBB'].rename('BBB'))
+    assert store._load_manifest()['BBB']['start'] == '2024-01-02'
+    assert store._load_manifest()['AAA']['start'] == '2023-01-02'
+
+    # ... but not before the retry interval has passed
+    provider.failing = set()
+    calls = len(provider.calls)
+    store.get_prices(['AAA', 'BBB'], '2023-01-02', '2024-12-31')
+    assert len(provider.calls) == calls
+
+    store.failed_retry_seconds = 0
+    prices = store.get_prices(['AAA', 'BBB'], '2023-01-02', '2024-12-31')
+    assert prices['BBB'].notna().all()
+    assert prices.index[0] == pd.Timestamp('2023-01-02')
+
+
+def test_backfill_merges_with_stored_history(tmp_path, provider):
+    store = PriceStore(str(tmp_path))
+    store.get_prices(['AAA'], '2024-06-03', '2024-12-31')
+    # The backfill window only reaches the stored start; later bars must survive
+    entry = store._merge('AAA', '2023-01-02', '2024-06-04', provider.prices.loc[:'2024-06-03', 'AAA'])
+
+    series = store.read('AAA')
+    assert series.index[0] == pd.Timestamp('2023-01-02')
+    assert series.index[-1] == pd.Timestamp('2024-12-30')
+    assert entry['start'] == '2023-01-02'
+    assert entry['end'] == '2024-12-31'
+
+
+def test_stores_sharing_a_directory_keep_each_others_entries(tmp_path, provider):
+    # Two stores on one directory stand in for two server processes
+    first = PriceStore(str(tmp_path))
+    second = PriceStore(str(tmp_path))
+    first.inception_dates(['AAA'])
+    second.inception_dates(['BBB'])
+
+    first.get_prices(['AAA'], '2024-01-02', '2024-12-31')
+    second.get_prices(['BBB'], '2024-01-02', '2024-12-31')
+
+    assert set(PriceStore(str(tmp_path))._load_manifest()) == {'AAA', 'BBB'}
+    # The first store sees the second's bars instead of downloading them again
+    calls = len(provider.calls)
+    assert first.get_prices(['BBB'], '2024-01-02', '2024-12-31')['BBB'].notna().all()
+    assert len(provider.calls) == calls
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_empty_window_is_not_requested_again(tmp_path, provider):
+    store = PriceStore(str(tmp_path))
+    # Nothing trades in this window, like a weekend or holiday
+    assert store.get_prices(['AAA'], '2025-01-04', '2025-01-06').empty
+    assert store.get_prices(['AAA'], '2025-01-04', '2025-01-06').empty
+    assert len(provider.calls) == 1
+    assert 'AAA' not in store._load_manifest()
+
+
+def test_merge_keeps_a_backfill_stored_by_another_process_during_the_download(tmp_path, provider):
+    first = PriceStore(str(tmp_path))
+    second = PriceStore(str(tmp_path))
+    first.get_prices(['AAA'], '2024-01-02', '2024-06-03')
+
+    # While the first store downloads the newer bars, the second backfills
+    provider.during_download = lambda: second.get_prices(['AAA'], '2023-01-02', '2024-06-03')
+    first.get_prices(['AAA'], '2024-01-02', '2024-12-31')
+
+    series = PriceStore(str(tmp_path)).read('AAA')
+    expected = provider.prices.loc['2023-01-02':'2024-12-30', 'AAA']
+    assert series.index.equals(expected.index)
+    entry = first._load_manifest()['AAA']
+    assert (entry['start'], entry['end']) == ('2023-01-02', '2024-12-31')
+
+
+def test_disjoint_window_stored_meanwhile_is_not_claimed_as_covered(tmp_path, provider):
+    first = PriceStore(str(tmp_path))
+    second = PriceStore(str(tmp_path))
+
+    # The second store keeps a later window while the first downloads an earlier one
+    provider.during_download = lambda: second.get_prices(['AAA'], '2024-01-02', '2024-12-31')
+    first.get_prices(['AAA'], '2023-01-02', '2023-06-01')
+
+    assert first._load_manifest()['AAA']['start'] == '2024-01-02'
+    # The gap is still missing, so the next request fetches and fills it
+    prices = first.get_prices(['AAA'], '2023-01-02', '2024-12-31')
+    assert prices.index.equals(provider.prices.loc['2023-01-02':'2024-12-30'].index)
+
+
+def test_inception_dates_are_read_from_the_manifest(tmp_path, provider, monkeypatch):
+    # CCC lists after the start of the requested window
+    provider.prices['CCC'] = provider.prices['AAA'].where(provider.prices.index >= '2024-03-01')
+    store = PriceStore(str(tmp_path))
+    assert store.inception_dates(['AAA', 'CCC']) == {}
+    store.get_prices(['AAA', 'CCC'], '2023-01-02', '2024-12-31')
+
+    calls = len(provider.calls)
+    # Tickers never downloaded are left out rather than fetched
+    assert PriceStore(str(tmp_path)).inception_dates(['AAA', 'CCC', 'DDD']) == {
+        'AAA': '2023-01-02', 'CCC': '2024-03-01'
+    }
+    monkeypatch.setattr(data_module, 'price_store', store)
+    assert get_available_date_range(['AAA', 'CCC'], '2023-01-02', '2024-12-31') == ('2024-03-01', '2024-12-31')
+    assert len(provider.calls) == calls
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+import analytics.providers as providers_module
+from analytics.providers import MarketDataProvider, ReplayProvider, YFinanceProvider
+
+
+class UpstreamProvider(MarketDataProvider):
+    """A live provider stand-in serving fixed data."""
+
+    name = "upstream"
+
+    def __init__(self):
+        index = pd.bdate_range('2024-01-02', '2024-12-31')
+        self.prices = pd.DataFrame({'AAA': np.linspace(100, 120, len(index)),
+                                    'BBB': np.linspace(50, 40, len(index))}, index=index)
+
+    def get_price_history(self, tickers, start, end):
+        return self.prices.loc[start:pd.Timestamp(end) - pd.Timedelta(days=1), list(tickers)]
+
+    def get_latest_prices(self, tickers):
+        return {ticker: float(self.prices[ticker].iloc[-1]) for ticker in tickers}
+
+    def get_ticker_info(self, ticker):
+        if ticker not in self.prices.columns:
+            raise KeyError(f"Unknown symbol {ticker}")
+        return {'symbol': ticker, 'longName': f"{ticker} Fund"}
+
+
+@pytest.fixture
+def upstream():
+    return UpstreamProvider()
+
+
+def test_recorded_session_replays_offline(tmp_path, upstream):
+    recorder = ReplayProvider(str(tmp_path), upstream=upstream)
+    # Two overlapping windows are merged into one recording per ticker
+    recorder.get_price_history(['AAA', 'BBB'], '2024-01-02', '2024-07-01')
+    recorder.get_price_history(['AAA'], '2024-06-03', '2025-01-01')
+    latest = recorder.get_latest_prices(['AAA'])
+    recorder.get_ticker_info('AAA')
+    with pytest.raises(KeyError):
+        recorder.get_ticker_info('ZZZ')
+
+    replay = ReplayProvider(str(tmp_path))
+    # Any window inside the recorded range replays, whatever was requested
+    prices = replay.get_price_history(['BBB', 'AAA'], '2024-03-01', '2024-06-01')
+    assert prices.equals(upstream.prices.loc['2024-03-01':'2024-05-31', ['BBB', 'AAA']])
+    assert replay.get_price_history(['AAA'], '2024-01-02', '2025-01-01').equals(upstream.prices[['AAA']])
+    assert replay.get_latest_prices(['AAA']) == latest
+    assert replay.get_ticker_info('AAA') == {'symbol': 'AAA', 'longName': 'AAA Fund'}
+    # Failed lookups replay as the same error
+    with pytest.raises(LookupError, match='Unknown symbol ZZZ'):
+        replay.get_ticker_info('ZZZ')
+
+
+def test_replay_refuses_data_that_was_never_recorded(tmp_path, upstream):
+    ReplayProvider(str(tmp_path), upstream=upstream).get_price_history(['AAA'], '2024-01-02', '2025-01-01')
+
+    replay = ReplayProvider(str(tmp_path))
+    with pytest.raises(LookupError):
+        replay.get_price_history(['AAA', 'BBB'], '2024-01-02', '2025-01-01')
+    with pytest.raises(LookupError):
+        replay.get_latest_prices(['AAA'])
+    with pytest.raises(LookupError):
+        replay.get_ticker_info('AAA')
+
+
+class FakeTicker:
+    """yf.Ticker stand-in: BBB has bars, CCC is delisted and DDD times out."""
+
+    def __init__(self, ticker):
+        self.ticker = ticker
+
+    def history(self, **kwargs):
+        if self.ticker == 'BBB':
+            index = pd.DatetimeIndex(['2024-01-03', '2024-01-10'], tz='America/New_York')
+            return pd.DataFrame({'Close': [51.0, 52.0]}, index=index)
+        if self.ticker == 'CCC':
+            raise ValueError("CCC: possibly delisted; no price data found")
+        raise TimeoutError("Read timed out")
+
+
+def test_tickers_missing_from_a_download_are_confirmed_one_by_one(monkeypatch):
+    index = pd.bdate_range('2024-01-02', periods=5)
+    # yf.download leaves failed tickers as all-NaN columns
+    download = pd.concat({'Close': pd.DataFrame({'AAA': np.arange(5.0), 'BBB': np.nan, 'CCC': np.nan},
+                                                index=index)}, axis=1)
+    monkeypatch.setattr(providers_module.yf, 'download', lambda *args, **kwargs: download)
+    monkeypatch.setattr(providers_module.yf, 'Ticker', FakeTicker)
+    provider = YFinanceProvider()
+
+    prices = provider.get_price_history(['AAA', 'BBB', 'CCC'], '2024-01-02', '2024-01-11')
+    assert prices['BBB'].dropna().to_dict() == {pd.Timestamp('2024-01-03'): 51.0, pd.Timestamp('2024-01-10'): 52.0}
+    assert prices['CCC'].isna().all()
+    assert prices['AAA'].dropna().tolist() == list(np.arange(5.0))
+
+    # Connection problems are raised for the governor to retry
+    with pytest.raises(TimeoutError):
+        provider.get_price_history(['AAA', 'DDD'], '2024-01-02', '2024-01-11')
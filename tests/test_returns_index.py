@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+from conftest import random_returns
+from analytics.performance import performance_stats
+from analytics.returns_index import ReturnsIndex
+
+
+def test_stats_match_performance_stats_on_random_windows():
+    returns = random_returns(700, vol=0.012)
+    index = ReturnsIndex(returns)
+    rng = np.random.default_rng(1)
+
+    for _ in range(50):
+        first, last = sorted(rng.choice(len(returns), size=2, replace=False))
+        window = returns.iloc[first:last + 1]
+        expected, cumulative = performance_stats(window)
+        stats = index.stats(window.index[0], window.index[-1])
+        for key, value in expected.items():
+            assert abs(stats[key] - value) < 1e-10
+        assert np.allclose(index.cumulative(window.index[0], window.index[-1]), cumulative, rtol=1e-12)
+
+
+def test_whole_series_and_dates_between_bars():
+    returns = random_returns(300, seed=2, vol=0.012)
+    index = ReturnsIndex(returns)
+    expected = performance_stats(returns)[0]
+    for key, value in index.stats().items():
+        assert abs(value - expected[key]) < 1e-10
+
+    # Calendar dates snap to the returns dated inside the window
+    saturday = pd.Timestamp('2020-03-07')
+    stats = index.stats(saturday, '2020-06-30')
+    window = returns.loc[saturday:'2020-06-30']
+    assert abs(stats['Max Drawdown'] - performance_stats(window)[0]['Max Drawdown']) < 1e-12
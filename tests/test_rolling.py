@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+from conftest import random_returns
+from analytics.performance import performance_stats
+from analytics.rolling import drawdowns, rolling_drawdown, rolling_max, rolling_risk
+
+WINDOWS = (5, 21, 63)
+
+
+def _frame(days=400, seed=0):
+    frame = random_returns(days, ['a', 'b'], seed, mean=0.0004, vol=0.011)
+    # A gap in one series invalidates every window containing it
+    frame.iloc[150, 1] = np.nan
+    return frame
+
+
+def test_rolling_moments_match_pandas():
+    frame = _frame()
+    benchmark = random_returns(len(frame), seed=3)
+    risk = rolling_risk(frame, WINDOWS, benchmark=benchmark)
+
+    for window in WINDOWS:
+        for name in frame.columns:
+            rolling = frame[name].rolling(window)
+            expected_vol = rolling.std() * np.sqrt(252)
+            expected_beta = rolling.cov(benchmark) / benchmark.rolling(window).var()
+            pd.testing.assert_series_equal(risk['Volatility'][window][name], expected_vol,
+                                           check_names=False, rtol=1e-8, atol=1e-12)
+            pd.testing.assert_series_equal(risk['Beta'][window][name], expected_beta,
+                                           check_names=False, rtol=1e-8, atol=1e-12)
+
+
+def test_rolling_sharpe_matches_performance_stats():
+    frame = _frame(days=200, seed=1)
+    risk = rolling_risk(frame['a'], (21,))
+    for end in (20, 57, 120, 199):
+        expected = performance_stats(frame['a'].iloc[end - 20:end + 1])[0]['Sharpe Ratio']
+        assert abs(risk['Sharpe Ratio'][21]['a'].iloc[end] - expected) < 1e-9
+    assert risk['Sharpe Ratio'][21]['a'].iloc[:20].isna().all()
+
+
+def test_rolling_max_matches_pandas():
+    values = np.random.default_rng(4).normal(size=(101, 3))
+    for window in (1, 4, 10, 101, 150):
+        expected = pd.DataFrame(values).rolling(window, min_periods=1).max().to_numpy()
+        assert np.array_equal(rolling_max(values, window), expected)
+
+
+def test_drawdowns_match_running_peak():
+    returns = _frame(seed=2)['a']
+    depth, duration = drawdowns(returns)
+    cumulative = (1 + returns).cumprod()
+    # The path starts at 1 before the first return
+    peak = np.maximum(cumulative.cummax(), 1.0)
+    assert np.allclose(depth, cumulative / peak - 1, rtol=0, atol=1e-12)
+    assert (duration[depth == 0] == 0).all()
+
+    window = 21
+    path = pd.concat([pd.Series([1.0]), cumulative.reset_index(drop=True)])
+    expected = (path / path.rolling(window + 1, min_periods=1).max() - 1).iloc[1:].to_numpy()
+    assert np.allclose(rolling_drawdown(returns, window), expected, rtol=0, atol=1e-12)
@@ -0,0 +1,19 @@
+from analytics.security_master import SecurityMaster
+
+
+def test_usage_counts_from_several_processes_add_up(tmp_path):
+    path = str(tmp_path / 'security_master.sqlite3')
+    # Two instances on one file stand in for two server processes
+    first, second = SecurityMaster(path), SecurityMaster(path)
+    first.record_usage(['AGG', 'VOO', 'BND'], '2026-09-01')
+    second.record_usage(['VOO', 'BND'], '2026-10-01')
+    first.record_usage(['VOO', 'VOO'], '2026-10-02')
+
+    assert second.top_symbols(10, '2026-01-01') == ['VOO', 'BND', 'AGG']
+    # AGG was last requested before the cutoff
+    assert first.top_symbols(10, '2026-09-15') == ['VOO', 'BND']
+    assert first.top_symbols(1, '2026-09-15') == ['VOO']
+
+
+def test_no_usage_without_a_database(tmp_path):
+    assert SecurityMaster(str(tmp_path / 'missing.sqlite3')).top_symbols(5, '2026-01-01') == []
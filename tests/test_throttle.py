@@ -0,0 +1,93 @@
+import time
+import pytest
+from analytics.throttle import (
+    AdaptiveConcurrencyLimiter, CircuitBreaker, CircuitOpenError, Governor, ProviderUnavailable,
+    RateLimitedError, TokenBucket
+)
+
+RESET_TIMEOUT = 0.05
+
+
+def _governor(**kwargs):
+    governor = Governor(bucket=TokenBucket(rate=1000, capacity=100), limiter=AdaptiveConcurrencyLimiter(initial=4),
+                        breaker=CircuitBreaker(failure_threshold=3, reset_timeout=RESET_TIMEOUT), **kwargs)
+    governor.delays = []
+    # Record the backoff instead of sleeping
+    governor.backoff = lambda attempt: governor.delays.append(attempt) or 0.0
+    return governor
+
+
+def _calls(*outcomes):
+    """A provider call returning or raising each outcome in turn."""
+    remaining = list(outcomes)
+
+    def get_latest_prices():
+        outcome = remaining.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    return get_latest_prices
+
+
+def test_breaker_opens_then_half_opens_then_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=RESET_TIMEOUT)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    time.sleep(RESET_TIMEOUT)
+    assert breaker.state == "half-open"
+    breaker.before_call()
+    # Only one trial call at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    # A failed trial re-opens the circuit straight away
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    time.sleep(RESET_TIMEOUT)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_throttled_call_backs_off_and_halves_concurrency():
+    governor = _governor()
+    fn = _calls(RateLimitedError("429 Too Many Requests"), {'VOO': 500.0})
+
+    assert governor.call(fn) == {'VOO': 500.0}
+    assert governor.delays == [0]
+    # Halved from 4 by the 429, then raised by 1/limit on success
+    assert governor.limiter.limit == 2.5
+
+
+def test_persistent_throttling_raises_provider_unavailable():
+    governor = _governor(max_attempts=3)
+    fn = _calls(*[RateLimitedError("Too Many Requests")] * 3)
+
+    with pytest.raises(ProviderUnavailable):
+        governor.call(fn)
+    assert governor.delays == [0, 1]
+    assert governor.breaker.state == "open"
+    # The open circuit fails fast without calling the provider
+    with pytest.raises(CircuitOpenError):
+        governor.call(_calls())
+
+
+def test_rejected_request_is_not_retried():
+    governor = _governor()
+    with pytest.raises(KeyError):
+        governor.call(_calls(KeyError("unknown ticker")))
+    assert governor.delays == []
+    assert governor.breaker.state == "closed"
+
+
+def test_backoff_is_jittered_and_capped():
+    governor = Governor(base_delay=0.5, max_delay=8.0)
+    for attempt in range(8):
+        assert 0 <= governor.backoff(attempt) <= min(8.0, 0.5 * 2 ** attempt)
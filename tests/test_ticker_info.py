@@ -0,0 +1,123 @@
+import threading
+import time
+import pytest
+import analytics.cache as cache_module
+import analytics.data as data_module
+import analytics.providers as providers_module
+from analytics.cache import (
+    TICKER_INFO_NAMESPACE, TICKER_INFO_NEGATIVE_TTL, SingleFlight, get_ticker_info, get_ticker_info_batch
+)
+from analytics.cache_backends import TTLCache
+from analytics.data import classify_investment, get_expense_ratios, get_investment_name, validate_ticker
+from analytics.providers import MarketDataProvider
+from analytics.security_master import Security, SecurityMaster
+from analytics.throttle import ProviderUnavailable
+
+INFOS = {
+    'ACME': {'symbol': 'ACME', 'longName': 'Acme Growth Fund', 'category': 'Large Growth', 'expenseRatio': 0.5},
+    'BOND': {'symbol': 'BOND', 'longName': 'Bond Income Fund', 'category': 'Intermediate Core Bond',
+             'expenseRatio': 0.05},
+}
+
+
+class InfoProvider(MarketDataProvider):
+    """Serves INFOS and records every ticker it is asked about."""
+
+    name = "stub-info"
+
+    def __init__(self):
+        self.calls = []
+        # Raised by the next lookups while set, like a throttled provider
+        self.error = None
+        self._lock = threading.Lock()
+
+    def get_ticker_info(self, ticker):
+        with self._lock:
+            self.calls.append(ticker)
+        if self.error is not None:
+            raise self.error
+        # Unknown symbols come back as a stub payload, like Yahoo's
+        return INFOS.get(ticker, {'trailingPegRatio': None})
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    backend = TTLCache()
+    monkeypatch.setattr(cache_module, '_cache', backend)
+    monkeypatch.setattr(cache_module, '_flights', SingleFlight())
+    return backend
+
+
+@pytest.fixture(autouse=True)
+def master(monkeypatch, tmp_path):
+    master = SecurityMaster(str(tmp_path / 'security_master.sqlite3'))
+    monkeypatch.setattr(cache_module, 'security_master', master)
+    monkeypatch.setattr(data_module, 'security_master', master)
+    return master
+
+
+@pytest.fixture(autouse=True)
+def provider(monkeypatch):
+    provider = InfoProvider()
+    monkeypatch.setattr(providers_module, '_provider', provider)
+    return provider
+
+
+def test_metadata_lookups_share_one_fetch(provider):
+    assert validate_ticker('ACME') == (True, INFOS['ACME'])
+    assert get_investment_name('ACME') == 'Acme Growth Fund'
+    assert classify_investment('ACME') == 'US Equities'
+    assert get_expense_ratios(('ACME',)) == {'ACME': 0.005}
+
+    assert provider.calls == ['ACME']
+
+
+def test_batch_fetches_each_ticker_once(provider):
+    info = get_ticker_info_batch(['ACME', 'BOND', 'ACME'])
+
+    assert info == INFOS
+    assert sorted(provider.calls) == ['ACME', 'BOND']
+    # Later lookups, single or batched, are answered from the cache
+    assert get_ticker_info('BOND') == INFOS['BOND']
+    assert get_ticker_info_batch(['BOND', 'ACME']) == INFOS
+    assert len(provider.calls) == 2
+
+
+def test_unknown_ticker_is_remembered_for_the_negative_ttl(provider, fresh_cache):
+    assert validate_ticker('NOPE') == (False, None)
+    assert get_investment_name('NOPE') == 'NOPE'
+    assert get_ticker_info_batch(['NOPE']) == {'NOPE': None}
+    assert provider.calls == ['NOPE']
+
+    value, expires_at = fresh_cache.get_entry(TICKER_INFO_NAMESPACE, 'NOPE')
+    assert value is None
+    assert expires_at <= time.time() + TICKER_INFO_NEGATIVE_TTL
+    # Once the negative entry expires the ticker is looked up again
+    fresh_cache.set_entry(TICKER_INFO_NAMESPACE, 'NOPE', None, time.time() - 1)
+    assert get_ticker_info('NOPE') is None
+    assert provider.calls == ['NOPE', 'NOPE']
+
+
+def test_provider_outage_is_not_cached_as_an_unknown_ticker(provider, fresh_cache):
+    provider.error = ProviderUnavailable("throttled")
+    with pytest.raises(ProviderUnavailable):
+        get_ticker_info('ACME')
+    assert fresh_cache.get_entry(TICKER_INFO_NAMESPACE, 'ACME') is None
+
+    provider.error = None
+    assert get_ticker_info('ACME') == INFOS['ACME']
+
+
+def test_security_master_is_consulted_before_the_provider(provider, master):
+    master.upsert([Security('ACME', 'Acme Growth Fund (local)', 'ETF', 'Large Growth', 'Alternatives',
+                            0.1, None, '2026-10-01')])
+
+    assert get_ticker_info('ACME') == {'symbol': 'ACME', 'longName': 'Acme Growth Fund (local)',
+                                       'quoteType': 'ETF', 'category': 'Large Growth', 'expenseRatio': 0.1}
+    assert get_investment_name('ACME') == 'Acme Growth Fund (local)'
+    # The stored asset class wins over the category-based rules
+    assert classify_investment('ACME') == 'Alternatives'
+    assert get_expense_ratios(('ACME',)) == {'ACME': 0.001}
+    # Only symbols missing from the table reach the provider
+    assert get_ticker_info_batch(['ACME', 'BOND'])['BOND'] == INFOS['BOND']
+    assert provider.calls == ['BOND']